@@ -0,0 +1,430 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Hashable, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Labels compared between annotators: the category or the subcategory
+LEVELS = ("category", "subcategory")
+# (article, level) statistics kept by AgreementCache, least recently used first out
+AGREEMENT_CACHE_MAX_ENTRIES = int(os.getenv("AGREEMENT_CACHE_MAX_ENTRIES", "20000"))
+# Group and position packed in one int64 key for sorted searches, positions
+# are below 2**32
+_SHIFT = np.int64(2 ** 32)
+
+PAIR_COLUMNS = ["article", "label", "user_a", "user_b", "n11", "n10", "n01", "n00",
+                "spans_a", "matched_a", "spans_b", "matched_b"]
+LABEL_COLUMNS = ["article", "label", "raters", "items", "positives", "sum_c2"]
+
+
+def empty_table(columns: Sequence[str]) -> Dict[str, np.ndarray]:
+    return {name: np.zeros(0, np.int64) for name in columns}
+
+
+def _offsets(counts: np.ndarray) -> np.ndarray:
+    return np.cumsum(counts) - counts
+
+
+def _expand(starts: np.ndarray, counts: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (owner, index) for each of the counts[i] indices from starts[i], e.g.
+    the spans of each row.
+    """
+    owner = np.repeat(np.arange(len(counts)), counts)
+    index = np.repeat(starts, counts) + np.arange(counts.sum()) - np.repeat(_offsets(counts), counts)
+    return owner, index
+
+
+def merge_intervals(group: np.ndarray, start: np.ndarray, end: np.ndarray) -> Tuple[np.ndarray, ...]:
+    """
+    Union of the [start, end) intervals of each group: (group, start, end,
+    covered length before the interval in its group), sorted by group and
+    start.
+    """
+    if len(group) == 0:
+        empty = np.zeros(0, np.int64)
+        return empty, empty, empty, empty
+    order = np.lexsort((start, group))
+    group, start, end = group[order], start[order], end[order]
+    # Running maximum of the end within each group: groups are sorted and
+    # shifted above each other, so the maximum restarts with each group
+    running_end = np.maximum.accumulate(group * _SHIFT + end) - group * _SHIFT
+    first = np.ones(len(group), bool)
+    first[1:] = (group[1:] != group[:-1]) | (start[1:] > running_end[:-1])
+    index = np.flatnonzero(first)
+    m_group, m_start = group[index], start[index]
+    m_end = np.maximum.reduceat(end, index)
+    lengths = m_end - m_start
+    before = np.cumsum(lengths) - lengths
+    group_first = np.ones(len(m_group), bool)
+    group_first[1:] = m_group[1:] != m_group[:-1]
+    base = before[group_first]
+    before -= np.repeat(base, np.diff(np.append(np.flatnonzero(group_first), len(m_group))))
+    return m_group, m_start, m_end, before
+
+
+def covered_before(merged: Tuple[np.ndarray, ...], group: np.ndarray, x: np.ndarray) -> np.ndarray:
+    """
+    Length of the merged intervals of group before position x, 0 for the
+    groups without intervals (e.g. -1).
+    """
+    m_group, m_start, m_end, m_before = merged
+    if len(m_group) == 0:
+        return np.zeros(len(x), np.int64)
+    k = np.searchsorted(m_group * _SHIFT + m_start, group * _SHIFT + x, side="left") - 1
+    k_safe = np.maximum(k, 0)
+    hit = (k >= 0) & (m_group[k_safe] == group)
+    return np.where(hit, m_before[k_safe] + np.minimum(x, m_end[k_safe]) - m_start[k_safe], 0)
+
+
+def _overlaps(merged, spans_group, spans_start, spans_end, rows_group, other_group, counts_by_group, first_by_group):
+    """
+    For each row, the overlap of each interval of rows_group with the
+    coverage of other_group, as (row, overlap) pairs.
+    """
+    counts = np.where(rows_group >= 0, counts_by_group[np.maximum(rows_group, 0)], 0)
+    row, index = _expand(first_by_group[np.maximum(rows_group, 0)], counts)
+    other = other_group[row]
+    overlap = covered_before(merged, other, spans_end[index]) - covered_before(merged, other, spans_start[index])
+    return row, overlap
+
+
+def agreement_stats(
+    article: np.ndarray,
+    user: np.ndarray,
+    label: np.ndarray,
+    start: np.ndarray,
+    end: np.ndarray,
+    length: np.ndarray,
+) -> Tuple[Dict[str, np.ndarray], Dict[str, np.ndarray]]:
+    """
+    Sufficient statistics of the agreement between the annotators of each
+    article, from one row per annotation (length is the length of the text
+    of its article). Each character of an article is an item, present or
+    not for each label an annotator of the article used.
+
+    Returns the pair rows (PAIR_COLUMNS): the 2x2 character counts and the
+    overlap matches of the spans of each pair of annotators of an article,
+    by label; and the label rows (LABEL_COLUMNS) used by Fleiss' kappa. All
+    articles are processed at once, there is no loop over articles, pairs
+    or characters.
+    """
+    article, user = np.asarray(article, np.int64), np.asarray(user, np.int64)
+    start, end, length = (np.asarray(a, np.int64) for a in (start, end, length))
+    label_names, label = np.unique(np.asarray(label, dtype=object).astype(str), return_inverse=True)
+    start = np.maximum(start, 0)
+    keep = end > start
+    article, user, label, start, end, length = (a[keep] for a in (article, user, label, start, end, length))
+    if len(article) == 0:
+        return empty_table(PAIR_COLUMNS), empty_table(LABEL_COLUMNS)
+
+    articles, a = np.unique(article, return_inverse=True)
+    users, u = np.unique(user, return_inverse=True)
+    n_labels, n_users = label.max(initial=0) + 1, len(users)
+    items = np.zeros(len(articles), np.int64)
+    np.maximum.at(items, a, np.maximum(length, end))
+
+    # Annotators and labels of each article, in order
+    raters = np.unique(a * n_users + u)
+    rater_article, rater_user = raters // n_users, raters % n_users
+    n_raters = np.bincount(rater_article, minlength=len(articles))
+    article_labels = np.unique(a * n_labels + label)
+    label_article, label_code = article_labels // n_labels, article_labels % n_labels
+    n_article_labels = np.bincount(label_article, minlength=len(articles))
+
+    # Groups: the spans of an annotator for a label in an article
+    group_keys, g = np.unique((a * n_labels + label) * n_users + u, return_inverse=True)
+    merged = merge_intervals(g, start, end)
+    covered = np.bincount(merged[0], merged[2] - merged[1], minlength=len(group_keys))
+    merged_counts = np.bincount(merged[0], minlength=len(group_keys))
+    merged_first = _offsets(merged_counts)
+    span_order = np.argsort(g, kind="stable")
+    span_group, span_start, span_end = g[span_order], start[span_order], end[span_order]
+    span_counts = np.bincount(g, minlength=len(group_keys))
+    span_first = _offsets(span_counts)
+
+    # One row per pair of annotators and label of each article
+    n_pairs = n_raters * (n_raters - 1) // 2
+    row_counts = n_pairs * n_article_labels
+    row_article = np.repeat(np.arange(len(articles)), row_counts)
+    t = np.arange(row_counts.sum()) - np.repeat(_offsets(row_counts), row_counts)
+    k_row = n_article_labels[row_article]
+    p, k = t // k_row, t % k_row
+    # Pair index p to (i, j), i < j, among the r annotators of the article
+    r = n_raters[row_article]
+    def pairs_before(i):
+        return i * (2 * r - i - 1) // 2
+
+    i = np.floor(((2 * r - 1) - np.sqrt(np.maximum((2 * r - 1) ** 2 - 8 * p, 0))) / 2).astype(np.int64)
+    i = np.clip(i, 0, np.maximum(r - 2, 0))
+    i += pairs_before(i + 1) <= p
+    i -= pairs_before(i) > p
+    j = p - pairs_before(i) + i + 1
+    rater_first = _offsets(n_raters)[row_article]
+    user_a, user_b = rater_user[rater_first + i], rater_user[rater_first + j]
+    row_label = label_code[_offsets(n_article_labels)[row_article] + k]
+
+    def lookup(row_user):
+        key = (row_article * n_labels + row_label) * n_users + row_user
+        index = np.minimum(np.searchsorted(group_keys, key), len(group_keys) - 1)
+        return np.where(group_keys[index] == key, index, -1)
+
+    group_a, group_b = lookup(user_a), lookup(user_b)
+    cov_a = np.where(group_a >= 0, covered[group_a], 0)
+    cov_b = np.where(group_b >= 0, covered[group_b], 0)
+
+    n_rows = len(row_article)
+    row, overlap = _overlaps(merged, merged[0], merged[1], merged[2], group_a, group_b, merged_counts, merged_first)
+    n11 = np.bincount(row, overlap, minlength=n_rows).astype(np.int64)
+    row, overlap = _overlaps(merged, span_group, span_start, span_end, group_a, group_b, span_counts, span_first)
+    matched_a = np.bincount(row, overlap > 0, minlength=n_rows).astype(np.int64)
+    row, overlap = _overlaps(merged, span_group, span_start, span_end, group_b, group_a, span_counts, span_first)
+    matched_b = np.bincount(row, overlap > 0, minlength=n_rows).astype(np.int64)
+    row_items = items[row_article]
+
+    pairs = {
+        "article": articles[row_article],
+        "label": label_names[row_label],
+        "user_a": users[user_a],
+        "user_b": users[user_b],
+        "n11": n11,
+        "n10": cov_a - n11,
+        "n01": cov_b - n11,
+        "n00": row_items - cov_a - cov_b + n11,
+        "spans_a": np.where(group_a >= 0, span_counts[np.maximum(group_a, 0)], 0),
+        "matched_a": matched_a,
+        "spans_b": np.where(group_b >= 0, span_counts[np.maximum(group_b, 0)], 0),
+        "matched_b": matched_b,
+    }
+
+    # Fleiss' kappa needs, per article and label, the sum over characters of
+    # c and c**2, c being the number of annotators marking the character:
+    # sum(c**2) = sum(c) + 2 * sum over pairs of the characters both marked
+    group_label = np.searchsorted(article_labels, group_keys // n_users)
+    row_label_index = np.searchsorted(article_labels, row_article * n_labels + row_label)
+    positives = np.bincount(group_label, covered, minlength=len(article_labels)).astype(np.int64)
+    both = np.bincount(row_label_index, n11, minlength=len(article_labels)).astype(np.int64)
+    labels = {
+        "article": articles[label_article],
+        "label": label_names[label_code],
+        "raters": n_raters[label_article],
+        "items": items[label_article],
+        "positives": positives,
+        "sum_c2": positives + 2 * both,
+    }
+    # Nobody to agree with
+    shared = labels["raters"] > 1
+    return pairs, {name: column[shared] for name, column in labels.items()}
+
+
+def split_by_article(stats: Dict[str, np.ndarray]) -> Dict[int, Dict[str, np.ndarray]]:
+    """
+    Rows of agreement_stats by article, rows being sorted by article.
+    """
+    articles, first = np.unique(stats["article"], return_index=True)
+    bounds = list(first[1:]) + [len(stats["article"])]
+    return {
+        int(article): {name: column[begin:stop] for name, column in stats.items()}
+        for article, begin, stop in zip(articles, first, bounds)
+    }
+
+
+def stats_by_article(rows: Sequence[Tuple], lengths: Dict[int, int]) -> Dict[int, Tuple[Dict, Dict]]:
+    """
+    Pair and label rows of each article of lengths, from (article_id,
+    user_id, start_position, end_position, label) annotation rows.
+    """
+    columns = list(zip(*rows)) if rows else [[]] * 5
+    article, user, start, end, label = (np.asarray(column) for column in columns)
+    length = np.array([lengths[article_id] for article_id in article.tolist()], np.int64)
+    pairs, labels = agreement_stats(article, user, label, start, end, length)
+    pairs, labels = split_by_article(pairs), split_by_article(labels)
+    return {
+        article_id: (pairs.get(article_id, empty_table(PAIR_COLUMNS)), labels.get(article_id, empty_table(LABEL_COLUMNS)))
+        for article_id in lengths
+    }
+
+
+def _ratio(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(denominator > 0, numerator / np.where(denominator > 0, denominator, 1), np.nan)
+
+
+def pair_metrics(sums: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """
+    Cohen's kappa, character F1 and span F1 from summed pair counts.
+    Pooling pairs and labels treats each (character, label, pair) as an item.
+    """
+    n11, n10, n01, n00 = (sums[name].astype(np.float64) for name in ("n11", "n10", "n01", "n00"))
+    total = n11 + n10 + n01 + n00
+    observed = _ratio(n11 + n00, total)
+    expected = _ratio((n11 + n10) * (n11 + n01) + (n01 + n00) * (n10 + n00), total ** 2)
+    precision = _ratio(sums["matched_a"], sums["spans_a"])
+    recall = _ratio(sums["matched_b"], sums["spans_b"])
+    return {
+        "cohen_kappa": _ratio(observed - expected, 1 - expected),
+        "char_f1": _ratio(2 * n11, 2 * n11 + n10 + n01),
+        "span_f1": _ratio(2 * precision * recall, precision + recall),
+    }
+
+
+def fleiss_terms(labels: Dict[str, np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    For each label row, the sum over its characters of the proportion of
+    agreeing pairs of annotators, and the number of ratings. Rows have at
+    least 2 raters.
+    """
+    n = labels["raters"].astype(np.float64)
+    items, positives, sum_c2 = (labels[name].astype(np.float64) for name in ("items", "positives", "sum_c2"))
+    # c annotators of n mark a character: c(c-1) + (n-c)(n-c-1) agreeing ordered pairs
+    agreement = (2 * sum_c2 - 2 * n * positives + items * n * (n - 1)) / (n * (n - 1))
+    return agreement, n * items
+
+
+def _pack(codes: Sequence[np.ndarray], sizes: Sequence[int]) -> np.ndarray:
+    # One int64 key per row of integer codes: 1-d np.unique is far faster
+    # than np.unique(axis=0)
+    if np.prod([float(size) for size in sizes]) < 2 ** 62:
+        key = np.zeros(len(codes[0]), np.int64)
+        for code, size in zip(codes, sizes):
+            key = key * size + code
+        return key
+    return np.unique(np.stack(codes, axis=1), axis=0, return_inverse=True)[1].reshape(-1)
+
+
+def _codes(column: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    values, inverse = np.unique(column, return_inverse=True)
+    return values, inverse.reshape(-1)
+
+
+def _distinct_counts(group: np.ndarray, n_groups: int, columns: Sequence[np.ndarray]) -> np.ndarray:
+    # Number of distinct rows of columns in each group
+    if len(group) == 0:
+        return np.zeros(n_groups, np.int64)
+    codes = [_codes(column) for column in columns]
+    key = _pack([group] + [code for _, code in codes], [n_groups] + [len(values) for values, _ in codes])
+    first = np.unique(key, return_index=True)[1]
+    return np.bincount(group[first], minlength=n_groups)
+
+
+def group_rows(columns: Sequence[np.ndarray]) -> Tuple[np.ndarray, List[Tuple]]:
+    """
+    Group index of each row and the key of each group, for key columns of
+    any dtype.
+    """
+    if not len(columns[0]):
+        return np.zeros(0, np.int64), []
+    codes = [_codes(column) for column in columns]
+    _, first, group = np.unique(
+        _pack([code for _, code in codes], [len(values) for values, _ in codes]),
+        return_index=True, return_inverse=True,
+    )
+    return group.reshape(-1), [tuple(_python(values[code[row]]) for values, code in codes) for row in first]
+
+
+def _python(value):
+    # Group keys as python values, e.g. for JSON
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def aggregate(
+    pairs: Dict[str, np.ndarray],
+    labels: Dict[str, np.ndarray],
+    by: Sequence[str],
+) -> List[Dict]:
+    """
+    Agreement metrics of the pair and label rows grouped by the columns by:
+    article, label, user_a and user_b, or ones added by the caller (e.g.
+    source) to both tables. Fleiss' kappa is only computed when not grouping
+    by annotator. Undefined metrics (e.g. no span of a label) are None.
+    """
+    if by:
+        group, keys = group_rows([pairs[name] for name in by])
+    else:
+        group, keys = np.zeros(len(pairs["article"]), np.int64), [()]
+    n_groups = len(keys)
+    sums = {name: np.bincount(group, pairs[name], minlength=n_groups) for name in PAIR_COLUMNS[4:]}
+    metrics = pair_metrics(sums)
+    articles = _distinct_counts(group, n_groups, [pairs["article"]])
+    annotator_pairs = _distinct_counts(group, n_groups, [pairs["article"], pairs["user_a"], pairs["user_b"]])
+
+    results = []
+    for index, key in enumerate(keys):
+        result = dict(zip(by, key), articles=int(articles[index]), pairs=int(annotator_pairs[index]))
+        for name, values in metrics.items():
+            result[name] = _value(values[index])
+        results.append(result)
+
+    if "user_a" not in by and "user_b" not in by:
+        if by:
+            label_group, label_keys = group_rows([labels[name] for name in by])
+        else:
+            label_group, label_keys = np.zeros(len(labels["article"]), np.int64), [()]
+        agreement, ratings = fleiss_terms(labels)
+        count = len(label_keys)
+        observed = _ratio(np.bincount(label_group, agreement, minlength=count),
+                          np.bincount(label_group, labels["items"], minlength=count))
+        p = _ratio(np.bincount(label_group, labels["positives"], minlength=count),
+                   np.bincount(label_group, ratings, minlength=count))
+        expected = p ** 2 + (1 - p) ** 2
+        kappa = dict(zip(label_keys, _ratio(observed - expected, 1 - expected)))
+        for result, key in zip(results, keys):
+            result["fleiss_kappa"] = _value(kappa.get(key, np.nan))
+    return results
+
+
+def _value(value) -> Optional[float]:
+    return None if np.isnan(value) else round(float(value), 4)
+
+
+class AgreementCache():
+    """
+    Statistics of each article and level, reused until the version of the
+    article (e.g. its last annotation event and its length) changes. Bounded
+    LRU, local to the process.
+    """
+
+    def __init__(self, max_entries: int = AGREEMENT_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[int, str], Tuple[Hashable, Tuple[Dict, Dict]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, level: str, versions: Dict[int, Hashable]) -> Tuple[Dict[int, Tuple[Dict, Dict]], List[int]]:
+        """
+        Cached statistics of the articles still at their version, and the
+        articles to compute.
+        """
+        found, missing = {}, []
+        with self._lock:
+            for article_id, version in versions.items():
+                entry = self._entries.get((article_id, level))
+                if entry is not None and entry[0] == version:
+                    found[article_id] = entry[1]
+                    self._entries.move_to_end((article_id, level))
+                else:
+                    missing.append(article_id)
+        return found, missing
+
+    def set(self, level: str, versions: Dict[int, Hashable], stats: Dict[int, Tuple[Dict, Dict]]):
+        with self._lock:
+            for article_id, version in versions.items():
+                self._entries[(article_id, level)] = (version, stats[article_id])
+                self._entries.move_to_end((article_id, level))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def concat(tables: Iterable[Dict[str, np.ndarray]], columns: Sequence[str]) -> Dict[str, np.ndarray]:
+    tables = list(tables)
+    if not tables:
+        return empty_table(columns)
+    return {name: np.concatenate([table[name] for table in tables]) for name in tables[0]}
+
+
+agreement_cache = AgreementCache()
+
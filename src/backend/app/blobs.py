@@ -0,0 +1,77 @@
+import gzip
+import hashlib
+from typing import Optional, Tuple
+
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from . import models
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Raw article pages live in html_blobs, keyed by the sha256 of the html.
+# Keep in sync with src/scraping/utils/blobs.py, which writes the same table.
+ENCODING = "zstd" if zstandard is not None else "gzip"
+
+
+def html_hash(html: str) -> str:
+    return hashlib.sha256(html.encode("utf-8")).hexdigest()
+
+
+def compress(data: bytes, encoding: str = ENCODING) -> bytes:
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=10).compress(data)
+    if encoding == "gzip":
+        return gzip.compress(data, compresslevel=6)
+    raise ValueError(f"Unknown blob encoding {encoding!r}")
+
+
+def decompress(data: bytes, encoding: str) -> bytes:
+    if encoding == "zstd":
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to read zstd blobs")
+        return zstandard.ZstdDecompressor().decompress(data)
+    if encoding == "gzip":
+        return gzip.decompress(data)
+    if encoding == "identity":
+        return data
+    raise ValueError(f"Unknown blob encoding {encoding!r}")
+
+
+def make_blob(html: Optional[str]) -> Optional[Tuple[str, str, int, bytes]]:
+    """
+    Return the (hash, encoding, size, data) row storing html, None if empty.
+    """
+    if not html:
+        return None
+    raw = html.encode("utf-8")
+    return html_hash(html), ENCODING, len(raw), compress(raw)
+
+
+def put_html(db: Session, html: Optional[str]) -> Optional[str]:
+    """
+    Store html in html_blobs (once per distinct page) and return its hash.
+    Does not commit.
+    """
+    blob = make_blob(html)
+    if blob is None:
+        return None
+    digest, encoding, size, data = blob
+    db.execute(
+        insert(models.HtmlBlob)
+        .values(hash=digest, encoding=encoding, size=size, data=data)
+        .on_conflict_do_nothing(index_elements=["hash"])
+    )
+    return digest
+
+
+def get_html(db: Session, digest: Optional[str]) -> Optional[str]:
+    if not digest:
+        return None
+    blob = db.query(models.HtmlBlob).filter(models.HtmlBlob.hash == digest).first()
+    if blob is None:
+        return None
+    return decompress(blob.data, blob.encoding).decode("utf-8")
@@ -0,0 +1,259 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Tuple
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+try:
+    import redis
+    import redis.asyncio
+except ImportError:
+    redis = None
+
+# CACHE_URL=redis://host:6379/0 shares the cache between workers, the default
+# is a cache local to each process. Either way, every worker invalidates its
+# cache on the notifications of writes made elsewhere (see app/events.py).
+CACHE_URL = os.getenv("CACHE_URL")
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "2048"))
+CACHE_TTL = float(os.getenv("CACHE_TTL", "300"))
+
+
+class CacheBackend():
+    def get(self, key: str) -> Optional[str]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: str, ttl: float):
+        raise NotImplementedError
+
+    def version(self, tag: str) -> int:
+        raise NotImplementedError
+
+    def bump(self, tag: str):
+        raise NotImplementedError
+
+    def clear(self):
+        """
+        Drop the entries that invalidations may have missed (e.g. while the
+        notifications listener was disconnected).
+        """
+
+    # Used by async endpoints, backends doing I/O override them so that the
+    # event loop is never blocked
+    async def get_async(self, key: str) -> Optional[str]:
+        return self.get(key)
+
+    async def set_async(self, key: str, value: str, ttl: float):
+        self.set(key, value, ttl)
+
+    async def version_async(self, tag: str) -> int:
+        return self.version(tag)
+
+    async def bump_async(self, tag: str):
+        self.bump(tag)
+
+
+class InMemoryCache(CacheBackend):
+    """
+    Bounded LRU cache with a TTL per entry, local to the process.
+    """
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def version(self, tag):
+        with self._lock:
+            return self._versions.get(tag, 0)
+
+    def bump(self, tag):
+        with self._lock:
+            self._versions[tag] = self._versions.get(tag, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class RedisCache(CacheBackend):
+    """
+    Cache shared by every worker through Redis. Configure Redis with an
+    eviction policy (e.g. allkeys-lru) and a maxmemory to bound it. Sync
+    endpoints and ingest jobs (run in threads) use a blocking client, async
+    endpoints an asyncio one.
+    """
+
+    def __init__(self, url: str, prefix: str = "mediawatch:"):
+        if redis is None:
+            raise RuntimeError("redis is required to use CACHE_URL")
+        self.client = redis.Redis.from_url(url)
+        self.async_client = redis.asyncio.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return value.decode("utf-8") if value is not None else None
+
+    def set(self, key, value, ttl):
+        self.client.set(self.prefix + key, value, px=int(ttl * 1000))
+
+    def version(self, tag):
+        return int(self.client.get(f"{self.prefix}version:{tag}") or 0)
+
+    def bump(self, tag):
+        self.client.incr(f"{self.prefix}version:{tag}")
+
+    async def get_async(self, key):
+        value = await self.async_client.get(self.prefix + key)
+        return value.decode("utf-8") if value is not None else None
+
+    async def set_async(self, key, value, ttl):
+        await self.async_client.set(self.prefix + key, value, px=int(ttl * 1000))
+
+    async def version_async(self, tag):
+        return int(await self.async_client.get(f"{self.prefix}version:{tag}") or 0)
+
+    async def bump_async(self, tag):
+        await self.async_client.incr(f"{self.prefix}version:{tag}")
+
+
+cache: CacheBackend = RedisCache(CACHE_URL) if CACHE_URL else InMemoryCache()
+
+
+def invalidate(*tags: str):
+    """
+    Invalidate every cached response depending on one of tags. Entries are
+    not deleted: bumping the tag version changes the keys of new lookups,
+    and stale entries age out of the LRU.
+    """
+    for tag in tags:
+        cache.bump(tag)
+
+
+async def invalidate_async(*tags: str):
+    """
+    invalidate for async endpoints.
+    """
+    for tag in tags:
+        await cache.bump_async(tag)
+
+
+def _key(request: Request, versions) -> str:
+    params = sorted(request.query_params.multi_items())
+    raw = json.dumps([request.url.path, params, versions])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def cache_key(request: Request, tags: Iterable[str]) -> str:
+    return _key(request, [(tag, cache.version(tag)) for tag in tags])
+
+
+async def cache_key_async(request: Request, tags: Iterable[str]) -> str:
+    return _key(request, [(tag, await cache.version_async(tag)) for tag in tags])
+
+
+@lru_cache(maxsize=None)
+def _adapter(model: Any) -> TypeAdapter:
+    return TypeAdapter(model)
+
+
+def _make_entry(content, model: Any = None) -> Dict:
+    headers = {}
+    if isinstance(content, tuple):
+        content, headers = content
+    if model is not None:
+        adapter = _adapter(model)
+        body = adapter.dump_json(adapter.validate_python(content)).decode("utf-8")
+    else:
+        body = json.dumps(jsonable_encoder(content), ensure_ascii=False, separators=(",", ":"))
+    return {
+        "body": body,
+        "etag": '"' + hashlib.sha256(body.encode("utf-8")).hexdigest()[:32] + '"',
+        "headers": headers,
+    }
+
+
+def _respond(request: Request, entry: Dict) -> Response:
+    headers = {
+        **entry["headers"],
+        "ETag": entry["etag"],
+        "Cache-Control": "private, no-cache",
+    }
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and entry["etag"] in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry["body"], media_type="application/json", headers=headers)
+
+
+def cached_response(
+    request: Request,
+    tags: Iterable[str],
+    compute: Callable[[], object],
+    ttl: float = CACHE_TTL,
+    model: Any = None,
+) -> Response:
+    """
+    Serve the JSON returned by compute() from the cache, keyed on the request
+    path, its normalized query parameters and the versions of tags. compute
+    may return (content, headers). Responses carry an ETag, a matching
+    If-None-Match gets a 304 without a body.
+
+    The Response bypasses the route's response_model: pass it (or the shape
+    of a projected response) as model, the content is then validated and
+    serialized through it before being cached.
+    """
+    key = cache_key(request, tags)
+    entry = cache.get(key)
+    if entry is not None:
+        entry = json.loads(entry)
+    else:
+        entry = _make_entry(compute(), model)
+        cache.set(key, json.dumps(entry), ttl)
+    return _respond(request, entry)
+
+
+async def cached_response_async(
+    request: Request,
+    tags: Iterable[str],
+    compute: Callable[[], Awaitable[object]],
+    ttl: float = CACHE_TTL,
+    model: Any = None,
+) -> Response:
+    """
+    cached_response for async endpoints, compute is a coroutine function.
+    """
+    key = await cache_key_async(request, tags)
+    entry = await cache.get_async(key)
+    if entry is not None:
+        entry = json.loads(entry)
+    else:
+        entry = _make_entry(await compute(), model)
+        await cache.set_async(key, json.dumps(entry), ttl)
+    return _respond(request, entry)
@@ -1,7 +1,10 @@
 import os
-import time
-from sqlalchemy import create_engine
-from sqlalchemy.exc import OperationalError
+import asyncio
+import logging
+from typing import Dict
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
@@ -14,27 +17,47 @@ POSTGRES_PORT = os.getenv("POSTGRES_PORT", "5432")
 SQLALCHEMY_DATABASE_URL = (
     f"postgresql://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}"
 )
+ASYNC_DATABASE_URL = (
+    f"postgresql+asyncpg://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}"
+)
+
+# Connection pool settings, shared by the sync and the async engine
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+# Server-side limit on a single statement, in milliseconds (0 disables it)
+DB_STATEMENT_TIMEOUT = int(os.getenv("DB_STATEMENT_TIMEOUT", "30000"))
+# Startup probing: attempts and maximum delay between them, in seconds
+DB_CONNECT_RETRIES = int(os.getenv("DB_CONNECT_RETRIES", "8"))
+DB_CONNECT_MAX_DELAY = float(os.getenv("DB_CONNECT_MAX_DELAY", "10"))
+
+logger = logging.getLogger(__name__)
+
+POOL_OPTIONS = dict(
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_recycle=DB_POOL_RECYCLE,
+    pool_pre_ping=True,
+)
 
 Base = declarative_base()
 
-# Retry mechanism for database connection
-max_retries = 5
-retries = 0
-engine = None
+# Engines connect lazily, on first use. wait_for_db() probes the database at startup.
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL,
+    connect_args={"options": f"-c statement_timeout={DB_STATEMENT_TIMEOUT}"},
+    **POOL_OPTIONS
+)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-while retries < max_retries:
-    try:
-        time.sleep(10)
-        engine = create_engine(SQLALCHEMY_DATABASE_URL)
-        SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-        print("Database connection established.")
-        break
-    except OperationalError:
-        retries += 1
-        print(f"Database connection failed. Retrying in 5 seconds... ({retries}/{max_retries})")
-        time.sleep(5)
-else:
-    raise Exception("Failed to connect to the database after multiple attempts.")
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    connect_args={"server_settings": {"statement_timeout": str(DB_STATEMENT_TIMEOUT)}},
+    **POOL_OPTIONS
+)
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
 
 def get_db():
     db = SessionLocal()
@@ -42,3 +65,45 @@ def get_db():
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def ping() -> None:
+    async with async_engine.connect() as connection:
+        await connection.execute(text("SELECT 1"))
+
+async def wait_for_db(retries: int = DB_CONNECT_RETRIES, max_delay: float = DB_CONNECT_MAX_DELAY):
+    """
+    Wait until the database accepts connections. The first attempt is
+    immediate, failures are retried with exponential backoff (0.5s, 1s,
+    2s, ... capped at max_delay), so a healthy database costs one round trip.
+    """
+    delay = 0.5
+    for attempt in range(1, retries + 1):
+        try:
+            await ping()
+            return
+        except (OSError, asyncio.TimeoutError, SQLAlchemyError) as e:
+            if attempt == retries:
+                raise RuntimeError(f"Database unreachable after {retries} attempts") from e
+            logger.warning(f"Database not ready ({e.__class__.__name__}), retrying in {delay:.1f}s ({attempt}/{retries})")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, max_delay)
+
+def pool_status() -> Dict[str, Dict[str, int]]:
+    """
+    Connections of each engine's pool: pool size, idle (checked in),
+    checked out and overflow beyond the pool size.
+    """
+    status = {}
+    for name, pool in (("sync", engine.pool), ("async", async_engine.pool)):
+        status[name] = {
+            "size": pool.size(),
+            "idle": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": max(pool.overflow(), 0),
+        }
+    return status
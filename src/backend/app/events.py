@@ -0,0 +1,303 @@
+import os
+import time
+import asyncio
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, Dict, List, Optional, Set
+
+import asyncpg
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import aliased
+
+from . import models
+from .cache import cache, invalidate_async
+from .database import AsyncSessionLocal, SQLALCHEMY_DATABASE_URL
+
+# Notified on commit by the triggers of migrations/0005_annotation_events.sql,
+# with the id of the article whose annotations or comments changed
+EVENTS_CHANNEL = "annotation_events"
+# Notified on commit by the triggers of migrations/0009_cache_invalidations.sql,
+# with the cache tag to invalidate
+CACHE_CHANNEL = "cache_invalidations"
+# Days of events kept for clients to resume from
+EVENTS_RETENTION_DAYS = float(os.getenv("EVENTS_RETENTION_DAYS", "7"))
+# Events replayed to a resuming client, beyond it the client reloads the article
+EVENTS_REPLAY_LIMIT = int(os.getenv("EVENTS_REPLAY_LIMIT", "1000"))
+# Seconds between keepalives on idle streams, and between listener health checks
+EVENTS_KEEPALIVE = float(os.getenv("EVENTS_KEEPALIVE", "15"))
+# Events queued for a client that doesn't keep up before it is reset
+SUBSCRIBER_QUEUE_SIZE = 1000
+PRUNE_INTERVAL = 3600
+
+RESET = {"kind": "reset"}
+
+logger = logging.getLogger(__name__)
+
+
+def event_message(event: models.AnnotationEvent) -> Dict:
+    return {
+        "seq": event.id,
+        "kind": event.kind,
+        "op": event.op,
+        "id": event.object_id,
+        "article_id": event.article_id,
+        "user_id": event.user_id,
+        "data": event.data,
+        "created_at": event.created_at.isoformat(),
+    }
+
+
+async def read_events(article_id: int, after: int, limit: int = EVENTS_REPLAY_LIMIT) -> List[Dict]:
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(models.AnnotationEvent)
+            .where(models.AnnotationEvent.article_id == article_id, models.AnnotationEvent.id > after)
+            .order_by(models.AnnotationEvent.id)
+            .limit(limit)
+        )
+        return [event_message(event) for event in result.scalars()]
+
+
+async def last_event_seq(article_id: int) -> int:
+    async with AsyncSessionLocal() as db:
+        return await db.scalar(
+            select(func.coalesce(func.max(models.AnnotationEvent.id), 0))
+            .where(models.AnnotationEvent.article_id == article_id)
+        )
+
+
+async def events_pruned_after(article_id: int, seq: int) -> bool:
+    """Whether events of the article following seq have been pruned."""
+    async with AsyncSessionLocal() as db:
+        pruned_seq = await db.scalar(
+            select(models.AnnotationEventHorizon.pruned_seq)
+            .where(models.AnnotationEventHorizon.article_id == article_id)
+        )
+    return pruned_seq is not None and pruned_seq > seq
+
+
+async def prune_events(days: float = EVENTS_RETENTION_DAYS) -> int:
+    """
+    Deletes the events older than days but the newest one of each article,
+    and moves the horizon of their articles to the last one deleted.
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(days=days)
+    newer = aliased(models.AnnotationEvent)
+    pruned = (
+        delete(models.AnnotationEvent)
+        .where(
+            models.AnnotationEvent.created_at < cutoff,
+            select(newer.id)
+            .where(newer.article_id == models.AnnotationEvent.article_id, newer.id > models.AnnotationEvent.id)
+            .exists(),
+        )
+        .returning(models.AnnotationEvent.article_id, models.AnnotationEvent.id)
+        .cte("pruned")
+    )
+    horizon = insert(models.AnnotationEventHorizon).from_select(
+        ["article_id", "pruned_seq"],
+        select(pruned.c.article_id, func.max(pruned.c.id)).group_by(pruned.c.article_id),
+    )
+    horizon = horizon.on_conflict_do_update(
+        index_elements=[models.AnnotationEventHorizon.article_id],
+        set_={"pruned_seq": func.greatest(models.AnnotationEventHorizon.pruned_seq, horizon.excluded.pruned_seq)},
+    )
+    async with AsyncSessionLocal() as db:
+        count = await db.scalar(select(func.count()).select_from(pruned).add_cte(horizon.cte("horizon")))
+        await db.commit()
+    return count
+
+
+class Subscriber():
+    def __init__(self):
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.overflowed = False
+
+    def put(self, events: List[Dict]):
+        if self.overflowed:
+            return
+        if self.queue.qsize() + len(events) > SUBSCRIBER_QUEUE_SIZE:
+            self.overflowed = True
+            self.queue.put_nowait(RESET)
+            return
+        for event in events:
+            self.queue.put_nowait(event)
+
+
+class EventHub():
+    """
+    Fans the events of each article out to the streams of this worker. One
+    connection LISTENs to the notifications, which only carry an article id:
+    the new events of an article are read once per notification, whatever
+    its number of subscribers. It also invalidates the cached responses of
+    this worker on the writes made elsewhere. Started with the app.
+    """
+
+    def __init__(self, dsn: str = SQLALCHEMY_DATABASE_URL):
+        self.dsn = dsn
+        self._subscribers: Dict[int, Set[Subscriber]] = defaultdict(set)
+        # Last event delivered, by subscribed article
+        self._last_seq: Dict[int, int] = {}
+        self._readers: Dict[int, asyncio.Task] = {}
+        # Articles notified while being read, or whose read failed
+        self._pending: Set[int] = set()
+        self._connection: Optional[asyncpg.Connection] = None
+        self._connect_lock = asyncio.Lock()
+        self._maintenance: Optional[asyncio.Task] = None
+        self._invalidations: Set[asyncio.Task] = set()
+
+    async def start(self):
+        await self._listen()
+
+    async def _listen(self):
+        async with self._connect_lock:
+            if self._connection is not None and not self._connection.is_closed():
+                return
+            self._connection = await asyncpg.connect(self.dsn)
+            await self._connection.add_listener(EVENTS_CHANNEL, self._on_notify)
+            await self._connection.add_listener(CACHE_CHANNEL, self._on_invalidate)
+            if self._maintenance is None:
+                self._maintenance = asyncio.create_task(self._maintain())
+            else:
+                # Writes notified while disconnected were not invalidated
+                cache.clear()
+        # Catch up with the notifications missed while disconnected
+        for article_id in list(self._last_seq):
+            self._schedule(article_id)
+
+    def _on_notify(self, connection, pid, channel, payload):
+        try:
+            article_id = int(payload)
+        except ValueError:
+            return
+        self._invalidate(f"annotations:article:{article_id}")
+        if article_id in self._last_seq:
+            self._schedule(article_id)
+
+    def _on_invalidate(self, connection, pid, channel, payload):
+        self._invalidate(payload)
+
+    async def _invalidate_tag(self, tag: str):
+        try:
+            await invalidate_async(tag)
+        except Exception as e:
+            logger.warning(f"Failed to invalidate the cache tag {tag}: {type(e).__name__}: {e}")
+
+    def _invalidate(self, tag: str):
+        task = asyncio.create_task(self._invalidate_tag(tag))
+        self._invalidations.add(task)
+        task.add_done_callback(self._invalidations.discard)
+
+    def _schedule(self, article_id: int):
+        if article_id in self._readers:
+            self._pending.add(article_id)
+        else:
+            self._readers[article_id] = asyncio.create_task(self._read(article_id))
+
+    async def _read(self, article_id: int):
+        try:
+            while article_id in self._last_seq:
+                self._pending.discard(article_id)
+                events = await read_events(article_id, self._last_seq[article_id])
+                if events and article_id in self._last_seq:
+                    self._last_seq[article_id] = events[-1]["seq"]
+                    for subscriber in list(self._subscribers.get(article_id, ())):
+                        subscriber.put(events)
+                if len(events) < EVENTS_REPLAY_LIMIT and article_id not in self._pending:
+                    return
+        except Exception:
+            logger.exception(f"Failed to read the events of article {article_id}")
+            self._pending.add(article_id)
+        finally:
+            self._readers.pop(article_id, None)
+
+    async def _maintain(self):
+        last_prune = 0.0
+        while True:
+            await asyncio.sleep(EVENTS_KEEPALIVE)
+            try:
+                if self._connection is None or self._connection.is_closed():
+                    await self._listen()
+                else:
+                    await asyncio.wait_for(self._connection.execute("SELECT 1"), timeout=5)
+                for article_id in list(self._pending):
+                    if article_id in self._last_seq and article_id not in self._readers:
+                        self._schedule(article_id)
+                if time.monotonic() - last_prune > PRUNE_INTERVAL:
+                    last_prune = time.monotonic()
+                    logger.info(f"Pruned {await prune_events()} annotation events")
+            except Exception as e:
+                logger.warning(f"Annotation events listener unavailable: {type(e).__name__}: {e}")
+                if self._connection is not None:
+                    self._connection.terminate()
+
+    async def subscribe(self, article_id: int) -> Subscriber:
+        await self._listen()
+        subscriber = Subscriber()
+        self._subscribers[article_id].add(subscriber)
+        if article_id not in self._last_seq:
+            seq = await last_event_seq(article_id)
+            if subscriber in self._subscribers.get(article_id, ()):
+                self._last_seq.setdefault(article_id, seq)
+                # Events committed while reading seq were not notified to us
+                self._schedule(article_id)
+        return subscriber
+
+    def unsubscribe(self, article_id: int, subscriber: Subscriber):
+        subscribers = self._subscribers.get(article_id)
+        if subscribers is None:
+            return
+        subscribers.discard(subscriber)
+        if not subscribers:
+            del self._subscribers[article_id]
+            self._last_seq.pop(article_id, None)
+            self._pending.discard(article_id)
+
+    async def stream(self, article_id: int, since: Optional[int] = None) -> AsyncIterator[Optional[Dict]]:
+        """
+        The events of an article following since (or from now), then live
+        ones, in sequence order. Yields None after EVENTS_KEEPALIVE idle
+        seconds, and RESET before ending when the events following since
+        are no longer all available: the client then reloads the article
+        and resumes from its event_seq.
+        """
+        subscriber = await self.subscribe(article_id)
+        try:
+            last = since
+            if since is not None:
+                backlog = await read_events(article_id, since)
+                if len(backlog) >= EVENTS_REPLAY_LIMIT or await events_pruned_after(article_id, since):
+                    yield RESET
+                    return
+                for event in backlog:
+                    last = event["seq"]
+                    yield event
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscriber.queue.get(), timeout=EVENTS_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                if event is RESET:
+                    yield RESET
+                    return
+                if last is not None and event["seq"] <= last:
+                    continue
+                last = event["seq"]
+                yield event
+        finally:
+            self.unsubscribe(article_id, subscriber)
+
+    async def close(self):
+        for task in [self._maintenance, *self._readers.values()]:
+            if task is not None:
+                task.cancel()
+        self._maintenance = None
+        if self._connection is not None and not self._connection.is_closed():
+            await self._connection.close()
+        self._connection = None
+
+
+hub = EventHub()
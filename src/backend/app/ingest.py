@@ -0,0 +1,253 @@
+import io
+import os
+import csv
+import uuid
+import logging
+import threading
+from datetime import datetime, timezone
+from itertools import islice
+from typing import Dict, Optional
+
+from psycopg2.extras import execute_values
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+
+from . import models
+from .blobs import make_blob
+from .cache import invalidate
+from .database import engine
+
+logger = logging.getLogger(__name__)
+
+# Article pages and html can be far larger than csv's default 128kB field limit
+csv.field_size_limit(2 ** 31 - 1)
+
+BATCH_SIZE = 5000
+MAX_ERRORS = 50
+
+REQUIRED_COLUMNS = ['source', 'link', 'author', 'title']
+DATE_COLUMNS = ['published_date', 'modified_date']
+STAGING_COLUMNS = [
+    'source', 'link', 'author', 'title', 'topic', 'abstract', 'html_hash', 'text',
+    'published_date', 'modified_date', 'membership', 'language'
+]
+# Article dates are stored without time zone, as local time of the outlets:
+# dates with an offset are converted to it, dates without are taken as is
+ARTICLES_TIME_ZONE = 'Europe/Zurich'
+
+# Running ingest jobs of this process, by id. Jobs run in the API process
+# that received the upload and save their status to ingest_jobs on every
+# batch, where the other workers read it. A job whose process died stays
+# "running" there.
+JOBS: Dict[str, Dict] = {}
+_jobs_lock = threading.Lock()
+
+
+def _save_job(job: Dict):
+    with _jobs_lock:
+        values = dict(job, errors=list(job["errors"]))
+    statement = insert(models.IngestJob).values(**values)
+    statement = statement.on_conflict_do_update(
+        index_elements=["id"],
+        set_={name: statement.excluded[name] for name in values if name != "id"},
+    )
+    with engine.begin() as connection:
+        connection.execute(statement)
+
+
+def create_job(filename: str) -> Dict:
+    job = {
+        "id": uuid.uuid4().hex,
+        "filename": filename,
+        "status": "queued",
+        "rows": 0,
+        "inserted": 0,
+        "updated": 0,
+        "skipped": 0,
+        "errors": [],
+        "created_at": datetime.now(timezone.utc),
+        "finished_at": None,
+    }
+    _save_job(job)
+    with _jobs_lock:
+        JOBS[job["id"]] = job
+    return dict(job)
+
+
+def get_job(job_id: str) -> Optional[Dict]:
+    with _jobs_lock:
+        job = JOBS.get(job_id)
+        if job is not None:
+            return dict(job, errors=list(job["errors"]))
+    with engine.connect() as connection:
+        row = connection.execute(
+            select(models.IngestJob.__table__).where(models.IngestJob.id == job_id)
+        ).first()
+    return dict(row._mapping) if row else None
+
+
+def _update_job(job: Dict, **values):
+    with _jobs_lock:
+        job.update(values)
+    _save_job(job)
+
+
+def _skip(job: Dict, line: int, reason: str):
+    with _jobs_lock:
+        job["skipped"] += 1
+        if len(job["errors"]) < MAX_ERRORS:
+            job["errors"].append(f"Line {line}: {reason}")
+
+
+def _clean_row(row: Dict) -> Dict:
+    """
+    Strip the values of a csv row, empty values become NULL.
+    Raises ValueError if the row can't be loaded.
+    """
+    row = {key: (value.strip() or None) if isinstance(value, str) else None for key, value in row.items() if key}
+    missing = [column for column in REQUIRED_COLUMNS if not row.get(column)]
+    if missing:
+        raise ValueError(f"missing {', '.join(missing)}")
+    for column in DATE_COLUMNS:
+        if row.get(column):
+            try:
+                datetime.fromisoformat(row[column])
+            except ValueError:
+                raise ValueError(f"invalid {column} {row[column]!r}")
+    # articles.language is VARCHAR(2)
+    if row.get('language') and len(row['language']) > 2:
+        raise ValueError(f"invalid language {row['language']!r}, expected a 2-letter code")
+    return row
+
+
+def _merge_query() -> str:
+    columns = ", ".join(STAGING_COLUMNS)
+    # Columns absent from the upload keep their stored value
+    updates = ",\n".join(
+        f"{column} = COALESCE(EXCLUDED.{column}, articles.{column})"
+        for column in STAGING_COLUMNS if column != 'link'
+    )
+    return f"""
+    INSERT INTO articles ({columns})
+    SELECT DISTINCT ON (link) {", ".join(
+        "COALESCE(language, 'fr')" if column == 'language' else column for column in STAGING_COLUMNS
+    )}
+    FROM staging_upload
+    ORDER BY link, seq DESC
+    ON CONFLICT (link)
+    DO UPDATE SET
+        {updates}
+    RETURNING (xmax = 0) AS inserted;
+    """
+
+
+def ingest_csv(job_id: str, path: str, batch_size: int = BATCH_SIZE):
+    """
+    Load the articles of the csv file at `path` into `articles`, upserting
+    on link. The file is read incrementally; each batch is COPYed into a
+    temporary staging table, merged with INSERT ... ON CONFLICT (link) and
+    committed, so the job status shows progress. Invalid rows are skipped
+    and reported in the job errors. The file is removed afterwards.
+    """
+    job = JOBS[job_id]
+    _update_job(job, status="running")
+    merge_query = _merge_query()
+    copy_query = f"COPY staging_upload ({', '.join(STAGING_COLUMNS)}) FROM STDIN WITH (FORMAT csv)"
+
+    connection = engine.raw_connection()
+    cursor = connection.cursor()
+    try:
+        cursor.execute("""
+        CREATE TEMPORARY TABLE IF NOT EXISTS staging_upload (
+            seq SERIAL,
+            source TEXT,
+            link TEXT,
+            author TEXT,
+            title TEXT,
+            topic TEXT,
+            abstract TEXT,
+            html_hash CHAR(64),
+            text TEXT,
+            published_date TIMESTAMPTZ,
+            modified_date TIMESTAMPTZ,
+            membership TEXT,
+            language VARCHAR(2)
+        ) ON COMMIT DELETE ROWS;
+        """)
+
+        with open(path, newline='', encoding='utf-8-sig') as fp:
+            reader = csv.DictReader(fp)
+            missing = [column for column in REQUIRED_COLUMNS if column not in (reader.fieldnames or [])]
+            if missing:
+                raise ValueError(f"Missing CSV columns: {', '.join(missing)}")
+
+            rows = enumerate(reader, start=2)
+            while True:
+                batch = list(islice(rows, batch_size))
+                if not batch:
+                    break
+
+                blobs = {}
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+                loaded = 0
+                for line, row in batch:
+                    try:
+                        row = _clean_row(row)
+                    except ValueError as e:
+                        _skip(job, line, str(e))
+                        continue
+                    blob = make_blob(row.get('html'))
+                    if blob is not None:
+                        blobs[blob[0]] = blob
+                    row['html_hash'] = blob[0] if blob else None
+                    writer.writerow([row.get(column) for column in STAGING_COLUMNS])
+                    loaded += 1
+
+                if blobs:
+                    execute_values(
+                        cursor,
+                        """
+                        INSERT INTO html_blobs (hash, encoding, size, data) VALUES %s
+                        ON CONFLICT (hash) DO NOTHING
+                        """,
+                        list(blobs.values()),
+                        page_size=1000,
+                    )
+                inserted = updated = 0
+                if loaded:
+                    # Read and stored by the staging TIMESTAMPTZ columns in ARTICLES_TIME_ZONE
+                    cursor.execute("SET LOCAL TIME ZONE %s", (ARTICLES_TIME_ZONE,))
+                    buffer.seek(0)
+                    cursor.copy_expert(copy_query, buffer)
+                    cursor.execute(merge_query)
+                    for (was_inserted,) in cursor.fetchall():
+                        if was_inserted:
+                            inserted += 1
+                        else:
+                            updated += 1
+                connection.commit()
+                invalidate("articles")
+
+                with _jobs_lock:
+                    job["rows"] += len(batch)
+                    job["inserted"] += inserted
+                    job["updated"] += updated
+                _save_job(job)
+                logger.info("Upload %s: merged %d rows", job_id, job["rows"])
+
+        cursor.execute("DROP TABLE IF EXISTS staging_upload")
+        connection.commit()
+        _update_job(job, status="done", finished_at=datetime.now(timezone.utc))
+    except Exception as e:
+        connection.rollback()
+        logger.exception("Upload %s failed", job_id)
+        with _jobs_lock:
+            job["errors"].append(f"{type(e).__name__}: {e}")
+        _update_job(job, status="failed", finished_at=datetime.now(timezone.utc))
+    finally:
+        cursor.close()
+        connection.close()
+        os.remove(path)
+        with _jobs_lock:
+            JOBS.pop(job_id, None)
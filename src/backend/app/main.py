@@ -1,14 +1,34 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from . import models
-from .database import engine
-from .routers import articles, options, annotations, analyze, auth
+from .database import async_engine, engine, ping, pool_status, wait_for_db
+from .events import hub
+from .migrate import run_migrations
+from .routers import articles, options, annotations, analyze, analytics, auth, events, export
 from .routers.auth import get_current_user
 from fastapi.openapi.docs import get_swagger_ui_html
 
-models.Base.metadata.create_all(bind=engine)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await wait_for_db()
+    async with async_engine.begin() as connection:
+        await connection.run_sync(models.Base.metadata.create_all)
+    await asyncio.to_thread(run_migrations)
+    # Listens to the notifications of annotation events and cache invalidations
+    await hub.start()
+    yield
+    await hub.close()
+    await async_engine.dispose()
+    engine.dispose()
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
+
+# Stream tokens travel in URLs, keep them out of the access log
+logging.getLogger("uvicorn.access").addFilter(events.RedactTokens())
 
 # Add CORS middleware
 origins = [
@@ -21,13 +41,38 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 app.include_router(auth.router)
-app.include_router(annotations.router, dependencies=[Depends(get_current_user)])
+app.include_router(annotations.router)
 app.include_router(options.router)
-app.include_router(analyze.router, dependencies=[Depends(get_current_user)])
-app.include_router(articles.router, dependencies=[Depends(get_current_user)])
+app.include_router(analyze.router)
+app.include_router(articles.router)
+app.include_router(export.router)
+app.include_router(analytics.router)
+app.include_router(events.router)
+
+@app.get("/healthz", include_in_schema=False)
+async def healthz():
+    """
+    Liveness: the process is up. Does not touch the database.
+    """
+    return {"status": "ok", "pools": pool_status()}
+
+@app.get("/readyz", include_in_schema=False)
+async def readyz():
+    """
+    Readiness: the database answers within 2 seconds.
+    """
+    try:
+        await asyncio.wait_for(ping(), timeout=2)
+    except Exception as e:
+        return JSONResponse(
+            status_code=503,
+            content={"status": "unavailable", "error": f"{type(e).__name__}: {e}", "pools": pool_status()},
+        )
+    return {"status": "ok", "pools": pool_status()}
 
 # Secure Swagger UI
 @app.get("/docs", include_in_schema=False)
@@ -0,0 +1,95 @@
+import argparse
+import logging
+import re
+from pathlib import Path
+from typing import List, Optional, Set, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+from .database import engine
+
+# Versioned migrations, named <version>_<name>.sql and applied in version
+# order. init.sql and the models describe a fresh database, the migrations
+# bring existing databases up to date, so they must be idempotent
+# (IF NOT EXISTS) and never edited once deployed.
+MIGRATIONS_DIR = Path(__file__).parent / "migrations"
+# Key of the advisory lock serializing workers that start at the same time
+MIGRATION_LOCK_ID = 4262019
+
+logger = logging.getLogger(__name__)
+
+
+def list_migrations(directory: Optional[Path] = None) -> List[Tuple[int, str, Path]]:
+    migrations = []
+    for path in sorted((directory or MIGRATIONS_DIR).glob("*.sql")):
+        match = re.fullmatch(r"(\d+)_(\w+)\.sql", path.name)
+        if match is None:
+            raise ValueError(f"Invalid migration file name {path.name!r}")
+        migrations.append((int(match.group(1)), match.group(2), path))
+    versions = [version for version, _, _ in migrations]
+    if len(versions) != len(set(versions)):
+        raise ValueError("Duplicate migration versions")
+    return sorted(migrations)
+
+
+def applied_versions(connection: Connection) -> Set[int]:
+    connection.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_migrations ("
+        "version INTEGER PRIMARY KEY, "
+        "name TEXT NOT NULL, "
+        "applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)"
+    ))
+    versions = set(connection.execute(text("SELECT version FROM schema_migrations")).scalars())
+    connection.commit()
+    return versions
+
+
+def run_migrations(bind: Engine = engine) -> List[str]:
+    """
+    Apply the pending migrations, each in its own transaction, and return
+    their file names. A failed migration is rolled back and raised, the
+    following ones are not applied.
+    """
+    applied = []
+    with bind.connect() as connection:
+        connection.execute(text("SELECT pg_advisory_lock(:id)"), {"id": MIGRATION_LOCK_ID})
+        try:
+            done = applied_versions(connection)
+            for version, name, path in list_migrations():
+                if version in done:
+                    continue
+                logger.info(f"Applying migration {path.name}")
+                try:
+                    # Straight to the driver, without parameter substitution
+                    with connection.connection.cursor() as cursor:
+                        cursor.execute(path.read_text())
+                    connection.execute(
+                        text("INSERT INTO schema_migrations (version, name) VALUES (:version, :name)"),
+                        {"version": version, "name": name},
+                    )
+                    connection.commit()
+                except Exception:
+                    connection.rollback()
+                    raise
+                applied.append(path.name)
+        finally:
+            connection.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": MIGRATION_LOCK_ID})
+            connection.commit()
+    return applied
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Apply the pending schema migrations.")
+    parser.add_argument("--list", action="store_true", help="Only show the status of each migration")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    if args.list:
+        with engine.connect() as connection:
+            done = applied_versions(connection)
+        for version, name, path in list_migrations():
+            print(f"{'applied' if version in done else 'pending':8} {path.name}")
+    else:
+        for name in run_migrations():
+            print(f"applied {name}")
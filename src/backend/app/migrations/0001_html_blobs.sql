@@ -0,0 +1,41 @@
+-- Raw article pages move from articles.html to the content-addressed
+-- html_blobs table (see app/blobs.py).
+CREATE TABLE IF NOT EXISTS html_blobs (
+    hash CHAR(64) PRIMARY KEY,
+    encoding TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    data BYTEA NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+ALTER TABLE html_blobs ALTER COLUMN data SET STORAGE EXTERNAL;
+
+ALTER TABLE articles ADD COLUMN IF NOT EXISTS html_hash CHAR(64) REFERENCES html_blobs(hash);
+
+DO $$
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = 'articles' AND column_name = 'html'
+    ) THEN
+        -- Existing pages are copied uncompressed ('identity' encoding),
+        -- new pages are compressed by the application.
+        INSERT INTO html_blobs (hash, encoding, size, data)
+        SELECT DISTINCT ON (hash) hash, 'identity', octet_length(data), data
+        FROM (
+            SELECT encode(sha256(convert_to(html, 'UTF8')), 'hex') AS hash, convert_to(html, 'UTF8') AS data
+            FROM articles
+            WHERE html IS NOT NULL AND html <> ''
+        ) pages
+        ON CONFLICT (hash) DO NOTHING;
+
+        -- Moving the column is not a modification of the article
+        ALTER TABLE articles DISABLE TRIGGER update_data_modified_at;
+        UPDATE articles SET html_hash = encode(sha256(convert_to(html, 'UTF8')), 'hex')
+        WHERE html IS NOT NULL AND html <> '';
+        ALTER TABLE articles ENABLE TRIGGER update_data_modified_at;
+
+        ALTER TABLE articles DROP COLUMN html;
+    END IF;
+END
+$$;
@@ -0,0 +1,14 @@
+-- Keyset pagination and full-text search on articles
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+ALTER TABLE articles ADD COLUMN IF NOT EXISTS search_vector TSVECTOR GENERATED ALWAYS AS (
+    setweight(to_tsvector('french', coalesce(title, '')), 'A') ||
+    setweight(to_tsvector('simple', coalesce(author, '') || ' ' || coalesce(topic, '')), 'B') ||
+    setweight(to_tsvector('french', coalesce(abstract, '')), 'B') ||
+    setweight(to_tsvector('french', coalesce(text, '')), 'C')
+) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_articles_published_date_id ON articles (published_date DESC NULLS LAST, id DESC);
+CREATE INDEX IF NOT EXISTS idx_articles_search_vector ON articles USING GIN (search_vector);
+CREATE INDEX IF NOT EXISTS idx_articles_title_trgm ON articles USING GIN (title gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_articles_author_trgm ON articles USING GIN (author gin_trgm_ops);
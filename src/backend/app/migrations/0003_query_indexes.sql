@@ -0,0 +1,13 @@
+-- Indexes for the filters and sort orders of the routers
+
+-- Annotations of an article, oldest first (editor, delete all)
+CREATE INDEX IF NOT EXISTS idx_annotations_article_id_timestamp ON annotations (article_id, timestamp);
+-- Annotations of a user, keyset paginated on (timestamp, id)
+CREATE INDEX IF NOT EXISTS idx_annotations_user_id_timestamp_id ON annotations (user_id, timestamp, id);
+-- Incremental exports (since=)
+CREATE INDEX IF NOT EXISTS idx_annotations_timestamp ON annotations (timestamp);
+CREATE INDEX IF NOT EXISTS idx_articles_modified_at ON articles (modified_at);
+-- Comments of the loaded annotations
+CREATE INDEX IF NOT EXISTS idx_comments_annotation_id ON comments (annotation_id);
+-- source is matched with ILIKE '%...%', which only a trigram index serves
+CREATE INDEX IF NOT EXISTS idx_articles_source_trgm ON articles USING GIN (source gin_trgm_ops);
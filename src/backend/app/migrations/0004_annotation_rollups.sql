@@ -0,0 +1,137 @@
+-- Annotation counts per article source, category, subcategory and week of
+-- publication of the article, for the /analytics endpoints. Kept up to date
+-- by statement-level triggers on annotations and articles, rebuilt from
+-- scratch by refresh_annotation_rollups().
+CREATE TABLE IF NOT EXISTS annotation_rollups (
+    source TEXT NOT NULL,
+    category TEXT NOT NULL,
+    subcategory TEXT NOT NULL,
+    week DATE NOT NULL,
+    annotations INTEGER NOT NULL,
+    PRIMARY KEY (source, category, subcategory, week)
+);
+
+CREATE INDEX IF NOT EXISTS idx_annotation_rollups_week ON annotation_rollups (week);
+
+-- Articles without a publication date count in the week they were added.
+-- Missing categories are counted under ''.
+CREATE OR REPLACE FUNCTION rollup_week(published_date TIMESTAMP, created_at TIMESTAMP)
+RETURNS DATE AS $$
+    SELECT date_trunc('week', coalesce(published_date, created_at, CURRENT_TIMESTAMP))::date;
+$$ LANGUAGE sql STABLE;
+
+CREATE OR REPLACE FUNCTION refresh_annotation_rollups()
+RETURNS VOID AS $$
+BEGIN
+    LOCK TABLE annotation_rollups IN EXCLUSIVE MODE;
+    DELETE FROM annotation_rollups;
+    INSERT INTO annotation_rollups (source, category, subcategory, week, annotations)
+    SELECT a.source, coalesce(n.category, ''), coalesce(n.subcategory, ''),
+           rollup_week(a.published_date, a.created_at), count(*)
+    FROM annotations n JOIN articles a ON a.id = n.article_id
+    GROUP BY 1, 2, 3, 4;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Counts of the changed rows, summed per key in key order (so that
+-- concurrent writers lock rollup rows in the same order), no-ops skipped.
+CREATE OR REPLACE FUNCTION annotation_rollups_on_annotations()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO annotation_rollups AS r (source, category, subcategory, week, annotations)
+        SELECT a.source, coalesce(n.category, ''), coalesce(n.subcategory, ''),
+               rollup_week(a.published_date, a.created_at), count(*)
+        FROM new_rows n JOIN articles a ON a.id = n.article_id
+        GROUP BY 1, 2, 3, 4
+        ORDER BY 1, 2, 3, 4
+        ON CONFLICT (source, category, subcategory, week)
+        DO UPDATE SET annotations = r.annotations + EXCLUDED.annotations;
+    ELSIF TG_OP = 'DELETE' THEN
+        INSERT INTO annotation_rollups AS r (source, category, subcategory, week, annotations)
+        SELECT a.source, coalesce(o.category, ''), coalesce(o.subcategory, ''),
+               rollup_week(a.published_date, a.created_at), -count(*)
+        FROM old_rows o JOIN articles a ON a.id = o.article_id
+        GROUP BY 1, 2, 3, 4
+        ORDER BY 1, 2, 3, 4
+        ON CONFLICT (source, category, subcategory, week)
+        DO UPDATE SET annotations = r.annotations + EXCLUDED.annotations;
+    ELSE
+        INSERT INTO annotation_rollups AS r (source, category, subcategory, week, annotations)
+        SELECT source, category, subcategory, week, sum(delta)
+        FROM (
+            SELECT a.source, coalesce(o.category, '') AS category, coalesce(o.subcategory, '') AS subcategory,
+                   rollup_week(a.published_date, a.created_at) AS week, -1 AS delta
+            FROM old_rows o JOIN articles a ON a.id = o.article_id
+            UNION ALL
+            SELECT a.source, coalesce(n.category, ''), coalesce(n.subcategory, ''),
+                   rollup_week(a.published_date, a.created_at), 1
+            FROM new_rows n JOIN articles a ON a.id = n.article_id
+        ) AS changes
+        GROUP BY 1, 2, 3, 4
+        HAVING sum(delta) <> 0
+        ORDER BY 1, 2, 3, 4
+        ON CONFLICT (source, category, subcategory, week)
+        DO UPDATE SET annotations = r.annotations + EXCLUDED.annotations;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- An article changing source or publication date moves its annotations
+CREATE OR REPLACE FUNCTION annotation_rollups_on_articles()
+RETURNS TRIGGER AS $$
+BEGIN
+    WITH moved AS (
+        SELECT n.id,
+               o.source AS old_source, rollup_week(o.published_date, o.created_at) AS old_week,
+               n.source AS new_source, rollup_week(n.published_date, n.created_at) AS new_week
+        FROM old_articles o JOIN new_articles n ON n.id = o.id
+        WHERE o.source IS DISTINCT FROM n.source
+           OR rollup_week(o.published_date, o.created_at) IS DISTINCT FROM rollup_week(n.published_date, n.created_at)
+    )
+    INSERT INTO annotation_rollups AS r (source, category, subcategory, week, annotations)
+    SELECT source, category, subcategory, week, sum(delta)
+    FROM (
+        SELECT moved.old_source AS source, coalesce(n.category, '') AS category,
+               coalesce(n.subcategory, '') AS subcategory, moved.old_week AS week, -1 AS delta
+        FROM moved JOIN annotations n ON n.article_id = moved.id
+        UNION ALL
+        SELECT moved.new_source, coalesce(n.category, ''), coalesce(n.subcategory, ''), moved.new_week, 1
+        FROM moved JOIN annotations n ON n.article_id = moved.id
+    ) AS changes
+    GROUP BY 1, 2, 3, 4
+    HAVING sum(delta) <> 0
+    ORDER BY 1, 2, 3, 4
+    ON CONFLICT (source, category, subcategory, week)
+    DO UPDATE SET annotations = r.annotations + EXCLUDED.annotations;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS annotation_rollups_insert ON annotations;
+DROP TRIGGER IF EXISTS annotation_rollups_update ON annotations;
+DROP TRIGGER IF EXISTS annotation_rollups_delete ON annotations;
+DROP TRIGGER IF EXISTS annotation_rollups_articles ON articles;
+
+CREATE TRIGGER annotation_rollups_insert
+AFTER INSERT ON annotations
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION annotation_rollups_on_annotations();
+
+CREATE TRIGGER annotation_rollups_update
+AFTER UPDATE ON annotations
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION annotation_rollups_on_annotations();
+
+CREATE TRIGGER annotation_rollups_delete
+AFTER DELETE ON annotations
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT EXECUTE FUNCTION annotation_rollups_on_annotations();
+
+CREATE TRIGGER annotation_rollups_articles
+AFTER UPDATE ON articles
+REFERENCING OLD TABLE AS old_articles NEW TABLE AS new_articles
+FOR EACH STATEMENT EXECUTE FUNCTION annotation_rollups_on_articles();
+
+SELECT refresh_annotation_rollups();
@@ -0,0 +1,119 @@
+-- Log of annotation and comment changes, streamed to the clients of each
+-- article (see app/events.py). id is the sequence clients resume from.
+CREATE TABLE IF NOT EXISTS annotation_events (
+    id BIGSERIAL PRIMARY KEY,
+    article_id INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    op TEXT NOT NULL,
+    object_id INTEGER NOT NULL,
+    user_id INTEGER,
+    data JSONB NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idx_annotation_events_article_id_id ON annotation_events (article_id, id);
+CREATE INDEX IF NOT EXISTS idx_annotation_events_created_at ON annotation_events (created_at);
+
+-- Writers of an article take a lock until commit before logging events, so
+-- that the events of an article commit in id order and a client resuming
+-- after an id never misses one. Locks are taken in article order.
+CREATE OR REPLACE FUNCTION lock_article_events(article_ids INTEGER[])
+RETURNS VOID AS $$
+BEGIN
+    PERFORM pg_advisory_xact_lock(4262024, article_id)
+    FROM (SELECT DISTINCT unnest(article_ids) AS article_id ORDER BY 1) AS articles;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION annotation_events_on_annotations()
+RETURNS TRIGGER AS $$
+DECLARE
+    article_ids INTEGER[];
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        SELECT array_agg(DISTINCT article_id) INTO article_ids FROM old_rows WHERE article_id IS NOT NULL;
+        PERFORM lock_article_events(article_ids);
+        INSERT INTO annotation_events (article_id, kind, op, object_id, user_id, data)
+        SELECT article_id, 'annotation', 'delete', id, user_id, to_jsonb(o) - 'article_metadata'
+        FROM old_rows o WHERE article_id IS NOT NULL ORDER BY id;
+    ELSE
+        SELECT array_agg(DISTINCT article_id) INTO article_ids FROM new_rows WHERE article_id IS NOT NULL;
+        PERFORM lock_article_events(article_ids);
+        INSERT INTO annotation_events (article_id, kind, op, object_id, user_id, data)
+        SELECT article_id, 'annotation', CASE TG_OP WHEN 'INSERT' THEN 'create' ELSE 'update' END, id, user_id, to_jsonb(n) - 'article_metadata'
+        FROM new_rows n WHERE article_id IS NOT NULL ORDER BY id;
+    END IF;
+    -- Delivered on commit, listeners read the events from the table
+    PERFORM pg_notify('annotation_events', article_id::text) FROM unnest(article_ids) AS article_id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Comments are logged under the article of their annotation
+CREATE OR REPLACE FUNCTION annotation_events_on_comments()
+RETURNS TRIGGER AS $$
+DECLARE
+    article_ids INTEGER[];
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        SELECT array_agg(DISTINCT a.article_id) INTO article_ids
+        FROM old_rows c JOIN annotations a ON a.id = c.annotation_id
+        WHERE a.article_id IS NOT NULL;
+        PERFORM lock_article_events(article_ids);
+        INSERT INTO annotation_events (article_id, kind, op, object_id, user_id, data)
+        SELECT a.article_id, 'comment', 'delete', c.id, c.user_id,
+               to_jsonb(c) || jsonb_build_object('article_id', a.article_id)
+        FROM old_rows c JOIN annotations a ON a.id = c.annotation_id
+        WHERE a.article_id IS NOT NULL ORDER BY c.id;
+    ELSE
+        SELECT array_agg(DISTINCT a.article_id) INTO article_ids
+        FROM new_rows c JOIN annotations a ON a.id = c.annotation_id
+        WHERE a.article_id IS NOT NULL;
+        PERFORM lock_article_events(article_ids);
+        INSERT INTO annotation_events (article_id, kind, op, object_id, user_id, data)
+        SELECT a.article_id, 'comment', CASE TG_OP WHEN 'INSERT' THEN 'create' ELSE 'update' END, c.id, c.user_id,
+               to_jsonb(c) || jsonb_build_object('article_id', a.article_id)
+        FROM new_rows c JOIN annotations a ON a.id = c.annotation_id
+        WHERE a.article_id IS NOT NULL ORDER BY c.id;
+    END IF;
+    PERFORM pg_notify('annotation_events', article_id::text) FROM unnest(article_ids) AS article_id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS annotation_events_insert ON annotations;
+DROP TRIGGER IF EXISTS annotation_events_update ON annotations;
+DROP TRIGGER IF EXISTS annotation_events_delete ON annotations;
+DROP TRIGGER IF EXISTS annotation_events_insert ON comments;
+DROP TRIGGER IF EXISTS annotation_events_update ON comments;
+DROP TRIGGER IF EXISTS annotation_events_delete ON comments;
+
+CREATE TRIGGER annotation_events_insert
+AFTER INSERT ON annotations
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION annotation_events_on_annotations();
+
+CREATE TRIGGER annotation_events_update
+AFTER UPDATE ON annotations
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION annotation_events_on_annotations();
+
+CREATE TRIGGER annotation_events_delete
+AFTER DELETE ON annotations
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT EXECUTE FUNCTION annotation_events_on_annotations();
+
+CREATE TRIGGER annotation_events_insert
+AFTER INSERT ON comments
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION annotation_events_on_comments();
+
+CREATE TRIGGER annotation_events_update
+AFTER UPDATE ON comments
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION annotation_events_on_comments();
+
+CREATE TRIGGER annotation_events_delete
+AFTER DELETE ON comments
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT EXECUTE FUNCTION annotation_events_on_comments();
@@ -0,0 +1,12 @@
+-- Last event pruned, by article (see app/events.py): a client resuming
+-- after an earlier event has missed some and reloads the article
+CREATE TABLE IF NOT EXISTS annotation_event_horizons (
+    article_id INTEGER PRIMARY KEY,
+    pruned_seq BIGINT NOT NULL
+);
+
+-- The events pruned so far are not known: resuming before the oldest event
+-- left reloads the article, as before
+INSERT INTO annotation_event_horizons (article_id, pruned_seq)
+SELECT article_id, min(id) - 1 FROM annotation_events GROUP BY article_id
+ON CONFLICT (article_id) DO NOTHING;
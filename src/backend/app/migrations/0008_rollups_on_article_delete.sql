@@ -0,0 +1,26 @@
+-- Annotations deleted with their article (e.g. by an ON DELETE CASCADE)
+-- can't be counted by annotation_rollups_on_annotations(), which finds the
+-- source and week of an annotation in its article. They are counted out
+-- before the article is deleted instead, and no longer match an article
+-- when their own delete trigger runs. A failed delete rolls both back.
+CREATE OR REPLACE FUNCTION annotation_rollups_on_article_delete()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO annotation_rollups AS r (source, category, subcategory, week, annotations)
+    SELECT OLD.source, coalesce(n.category, ''), coalesce(n.subcategory, ''),
+           rollup_week(OLD.published_date, OLD.created_at), -count(*)
+    FROM annotations n
+    WHERE n.article_id = OLD.id
+    GROUP BY 1, 2, 3, 4
+    ORDER BY 1, 2, 3, 4
+    ON CONFLICT (source, category, subcategory, week)
+    DO UPDATE SET annotations = r.annotations + EXCLUDED.annotations;
+    RETURN OLD;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS annotation_rollups_article_delete ON articles;
+
+CREATE TRIGGER annotation_rollups_article_delete
+BEFORE DELETE ON articles
+FOR EACH ROW EXECUTE FUNCTION annotation_rollups_on_article_delete();
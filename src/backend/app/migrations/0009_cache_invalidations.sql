@@ -0,0 +1,17 @@
+-- Invalidates the responses cached by every worker (see app/cache.py) when
+-- articles change, whoever writes them: another worker, a CSV upload, the
+-- scraper's bulk upsert or plain SQL. The payload is the cache tag. Identical
+-- notifications of a transaction are delivered once, on commit.
+CREATE OR REPLACE FUNCTION cache_invalidations_on_articles()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM pg_notify('cache_invalidations', 'articles');
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS cache_invalidations_articles ON articles;
+
+CREATE TRIGGER cache_invalidations_articles
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON articles
+FOR EACH STATEMENT EXECUTE FUNCTION cache_invalidations_on_articles();
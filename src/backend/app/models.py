@@ -1,8 +1,18 @@
-from sqlalchemy import Column, Integer, String, Text, TIMESTAMP, UniqueConstraint, DateTime, ForeignKey, JSON
+from sqlalchemy import BigInteger, Computed, Index, Column, Integer, String, Text, TIMESTAMP, UniqueConstraint, Date, DateTime, ForeignKey, JSON, LargeBinary
 from sqlalchemy.sql import func
-from sqlalchemy.orm import relationship
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR
+from sqlalchemy.orm import deferred, relationship
 from .database import Base
 
+class HtmlBlob(Base):
+    __tablename__ = 'html_blobs'
+
+    hash = Column(String(64), primary_key=True)
+    encoding = Column(Text, nullable=False)
+    size = Column(Integer, nullable=False)
+    data = Column(LargeBinary, nullable=False)
+    created_at = Column(TIMESTAMP, server_default=func.current_timestamp())
+
 class Article(Base):
     __tablename__ = 'articles'
 
@@ -13,7 +23,7 @@ class Article(Base):
     title = Column(Text)
     topic = Column(Text)
     abstract = Column(Text)
-    html = Column(Text)
+    html_hash = Column(String(64), ForeignKey('html_blobs.hash'))
     text = Column(Text)
     published_date = Column(TIMESTAMP)
     modified_date = Column(TIMESTAMP)
@@ -21,10 +31,23 @@ class Article(Base):
     created_at = Column(TIMESTAMP, server_default=func.current_timestamp())
     modified_at = Column(TIMESTAMP, server_default=func.current_timestamp(), onupdate=func.current_timestamp())
     language = Column(String(2), server_default='fr')
+    search_vector = deferred(Column(TSVECTOR, Computed(
+        "setweight(to_tsvector('french', coalesce(title, '')), 'A') || "
+        "setweight(to_tsvector('simple', coalesce(author, '') || ' ' || coalesce(topic, '')), 'B') || "
+        "setweight(to_tsvector('french', coalesce(abstract, '')), 'B') || "
+        "setweight(to_tsvector('french', coalesce(text, '')), 'C')",
+        persisted=True
+    )))
     annotations = relationship('Annotation', back_populates='article')
 
     __table_args__ = (
         UniqueConstraint('link', name='uq_link'),
+        Index('idx_articles_published_date_id', published_date.desc().nulls_last(), id.desc()),
+        Index('idx_articles_search_vector', 'search_vector', postgresql_using='gin'),
+        Index('idx_articles_title_trgm', 'title', postgresql_using='gin', postgresql_ops={'title': 'gin_trgm_ops'}),
+        Index('idx_articles_author_trgm', 'author', postgresql_using='gin', postgresql_ops={'author': 'gin_trgm_ops'}),
+        Index('idx_articles_source_trgm', 'source', postgresql_using='gin', postgresql_ops={'source': 'gin_trgm_ops'}),
+        Index('idx_articles_modified_at', 'modified_at'),
     )
 
 class User(Base):
@@ -56,6 +79,12 @@ class Annotation(Base):
 
     article = relationship('Article', back_populates='annotations')
 
+    __table_args__ = (
+        Index('idx_annotations_article_id_timestamp', 'article_id', 'timestamp'),
+        Index('idx_annotations_user_id_timestamp_id', 'user_id', 'timestamp', 'id'),
+        Index('idx_annotations_timestamp', 'timestamp'),
+    )
+
 class Comment(Base):
     __tablename__ = 'comments'
     id = Column(Integer, primary_key=True, index=True)
@@ -67,3 +96,63 @@ class Comment(Base):
     timestamp = Column(DateTime(timezone=True), server_default=func.now())
 
     annotation = relationship('Annotation', back_populates='comments')
+
+    __table_args__ = (
+        Index('idx_comments_annotation_id', 'annotation_id'),
+    )
+
+# Annotation counts per source, category, subcategory and week, maintained by
+# triggers (migrations/0004_annotation_rollups.sql)
+class AnnotationRollup(Base):
+    __tablename__ = 'annotation_rollups'
+
+    source = Column(Text, primary_key=True)
+    category = Column(Text, primary_key=True)
+    subcategory = Column(Text, primary_key=True)
+    week = Column(Date, primary_key=True)
+    annotations = Column(Integer, nullable=False)
+
+    __table_args__ = (
+        Index('idx_annotation_rollups_week', 'week'),
+    )
+
+# Written by the triggers of migrations/0005_annotation_events.sql, streamed
+# by app/events.py
+class AnnotationEvent(Base):
+    __tablename__ = 'annotation_events'
+
+    id = Column(BigInteger, primary_key=True)
+    article_id = Column(Integer, nullable=False)
+    kind = Column(Text, nullable=False)
+    op = Column(Text, nullable=False)
+    object_id = Column(Integer, nullable=False)
+    user_id = Column(Integer)
+    data = Column(JSONB, nullable=False)
+    created_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=func.now())
+
+    __table_args__ = (
+        Index('idx_annotation_events_article_id_id', 'article_id', 'id'),
+        Index('idx_annotation_events_created_at', 'created_at'),
+    )
+
+# Last event pruned by app/events.py, by article
+class AnnotationEventHorizon(Base):
+    __tablename__ = 'annotation_event_horizons'
+
+    article_id = Column(Integer, primary_key=True)
+    pruned_seq = Column(BigInteger, nullable=False)
+
+# Status of the CSV uploads run by app/ingest.py, readable from every worker
+class IngestJob(Base):
+    __tablename__ = 'ingest_jobs'
+
+    id = Column(Text, primary_key=True)
+    filename = Column(Text, nullable=False)
+    status = Column(Text, nullable=False)
+    rows = Column(Integer, nullable=False, default=0)
+    inserted = Column(Integer, nullable=False, default=0)
+    updated = Column(Integer, nullable=False, default=0)
+    skipped = Column(Integer, nullable=False, default=0)
+    errors = Column(JSONB, nullable=False, default=list)
+    created_at = Column(TIMESTAMP(timezone=True), nullable=False)
+    finished_at = Column(TIMESTAMP(timezone=True))
@@ -0,0 +1,185 @@
+import asyncio
+from typing import List, Optional
+from datetime import date, timedelta
+import numpy as np
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import Integer, any_, bindparam, func, select, text
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
+from .. import models, schemas
+from ..agreement import LABEL_COLUMNS, LEVELS, PAIR_COLUMNS, agreement_cache, aggregate, concat, stats_by_article
+from ..database import get_async_db
+from .auth import get_current_user
+
+router = APIRouter(
+    prefix="/analytics",
+    tags=["analytics"],
+    dependencies=[Depends(get_current_user)]
+)
+
+DIMENSIONS = ["source", "category", "subcategory", "week"]
+
+@router.get("/counts", response_model=List[schemas.AnalyticsCount], response_model_exclude_none=True)
+async def get_annotation_counts(
+    group_by: str = Query("category", description="Comma separated: source, category, subcategory, week"),
+    source: Optional[str] = Query(None),
+    category: Optional[str] = Query(None),
+    subcategory: Optional[str] = Query(None),
+    start_date: Optional[date] = Query(None, description="First week, by publication date of the articles"),
+    end_date: Optional[date] = Query(None, description="Last week, by publication date of the articles"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Annotation counts grouped by any of source, category, subcategory and
+    week (monday of the week of publication of the article). Read from the
+    annotation_rollups table, so the cost does not depend on the number of
+    annotations. Annotations without category or subcategory count under "".
+    """
+    names = [name.strip() for name in group_by.split(",") if name.strip()]
+    unknown = [name for name in names if name not in DIMENSIONS]
+    if unknown or not names:
+        raise HTTPException(status_code=400, detail=f"group_by must be among {', '.join(DIMENSIONS)}")
+    columns = [getattr(models.AnnotationRollup, name) for name in dict.fromkeys(names)]
+    total = func.sum(models.AnnotationRollup.annotations).label("annotations")
+
+    query = select(*columns, total)
+    if source:
+        query = query.where(models.AnnotationRollup.source.ilike(f"%{source}%"))
+    if category is not None:
+        query = query.where(models.AnnotationRollup.category == category)
+    if subcategory is not None:
+        query = query.where(models.AnnotationRollup.subcategory == subcategory)
+    if start_date:
+        # Weeks start on monday
+        query = query.where(models.AnnotationRollup.week >= start_date - timedelta(days=start_date.weekday()))
+    if end_date:
+        query = query.where(models.AnnotationRollup.week <= end_date)
+
+    # Time series in order, other groupings largest first
+    order = [models.AnnotationRollup.week] if "week" in names else []
+    result = await db.execute(
+        query.group_by(*columns)
+        .having(total > 0)
+        .order_by(*order, total.desc(), *columns)
+    )
+    return [dict(row._mapping) for row in result]
+
+@router.post("/refresh")
+async def refresh_rollups(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: schemas.User = Depends(get_current_user)
+):
+    """
+    Rebuild the rollups from the annotations. They are maintained on every
+    write, this is only needed after changing the data outside of Postgres
+    triggers (e.g. restoring a dump with triggers disabled).
+    """
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can refresh analytics")
+    await db.execute(text("SELECT refresh_annotation_rollups()"))
+    await db.commit()
+    rows = await db.scalar(select(func.count()).select_from(models.AnnotationRollup))
+    return {"rows": rows}
+
+# group_by values of /agreement and the columns of the agreement rows they group on
+AGREEMENT_GROUPS = {
+    "article": ["article"],
+    "source": ["source"],
+    "label": ["label"],
+    "annotators": ["user_a", "user_b"],
+}
+
+def agreement_tables(found, sources, article_ids, label):
+    pairs = concat([found[article_id][0] for article_id in article_ids], PAIR_COLUMNS)
+    labels = concat([found[article_id][1] for article_id in article_ids], LABEL_COLUMNS)
+    # Source of each row, repeated per article rather than looked up per row
+    article_sources = np.array([sources[article_id] for article_id in article_ids], dtype=object)
+    for table, index in ((pairs, 0), (labels, 1)):
+        counts = [len(found[article_id][index]["article"]) for article_id in article_ids]
+        table["source"] = np.repeat(article_sources, counts) if article_ids else np.zeros(0, object)
+    if label is not None:
+        pairs = {name: column[pairs["label"] == label] for name, column in pairs.items()}
+        labels = {name: column[labels["label"] == label] for name, column in labels.items()}
+    return pairs, labels
+
+@router.get("/agreement", response_model=List[schemas.AgreementStats], response_model_exclude_none=True)
+async def get_agreement(
+    group_by: str = Query("source", description="Comma separated: article, source, label, annotators. Empty for overall"),
+    level: str = Query("subcategory", description="Labels compared: category or subcategory"),
+    article_id: Optional[int] = Query(None),
+    source: Optional[str] = Query(None),
+    label: Optional[str] = Query(None, description="Only this category or subcategory (per level)"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Inter-annotator agreement over the articles annotated by at least two
+    users. Every character of an article is an item, marked or not with
+    each label used in the article: Cohen's kappa (pooled over pairs of
+    annotators), Fleiss' kappa and F1 are computed on characters, span_f1
+    counts the spans overlapping a span of the other annotator with the
+    same label. Statistics are cached per article, and only recomputed once
+    its annotations (its last annotation event) or its text change.
+    """
+    if level not in LEVELS:
+        raise HTTPException(status_code=400, detail=f"level must be one of {', '.join(LEVELS)}")
+    names = [name.strip() for name in group_by.split(",") if name.strip()]
+    unknown = [name for name in names if name not in AGREEMENT_GROUPS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"group_by must be among {', '.join(AGREEMENT_GROUPS)}")
+    by = [column for name in dict.fromkeys(names) for column in AGREEMENT_GROUPS[name]]
+
+    last_event = (
+        select(func.coalesce(func.max(models.AnnotationEvent.id), 0))
+        .where(models.AnnotationEvent.article_id == models.Article.id)
+        .scalar_subquery()
+    )
+    query = (
+        select(models.Article.id, models.Article.source, func.coalesce(func.char_length(models.Article.text), 0), last_event)
+        .join(models.Annotation, models.Annotation.article_id == models.Article.id)
+        .group_by(models.Article.id)
+        .having(func.count(func.distinct(models.Annotation.user_id)) > 1)
+    )
+    if article_id is not None:
+        query = query.where(models.Article.id == article_id)
+    if source:
+        query = query.where(models.Article.source.ilike(f"%{source}%"))
+    articles = (await db.execute(query)).all()
+    versions = {id: (seq, length) for id, _, length, seq in articles}
+    sources = {id: article_source for id, article_source, _, _ in articles}
+
+    found, missing = agreement_cache.get(level, versions)
+    if missing:
+        label_column = getattr(models.Annotation, level)
+        result = await db.execute(
+            select(
+                models.Annotation.article_id,
+                models.Annotation.user_id,
+                models.Annotation.start_position,
+                models.Annotation.end_position,
+                func.coalesce(label_column, ""),
+            )
+            .where(models.Annotation.article_id == any_(bindparam("article_ids", missing, type_=ARRAY(Integer))))
+        )
+        rows = result.all()
+        computed = await asyncio.to_thread(stats_by_article, rows, {id: versions[id][1] for id in missing})
+        agreement_cache.set(level, {id: versions[id] for id in missing}, computed)
+        found.update(computed)
+
+    def summarize():
+        pairs, labels = agreement_tables(found, sources, sorted(versions), label)
+        return aggregate(pairs, labels, by)
+
+    results = await asyncio.to_thread(summarize)
+
+    usernames = {}
+    if "user_a" in by:
+        user_ids = {result[name] for result in results for name in ("user_a", "user_b")}
+        users = await db.execute(select(models.User.id, models.User.username).where(models.User.id.in_(user_ids)))
+        usernames = dict(users.all())
+    for result in results:
+        if "article" in result:
+            result["article_id"] = result.pop("article")
+        if "user_a" in result:
+            result["annotator_a"] = usernames.get(result.pop("user_a"))
+            result["annotator_b"] = usernames.get(result.pop("user_b"))
+    return results
@@ -1,15 +1,17 @@
 # routers/analyze.py
 import os
 from typing import List
-from datetime import datetime
+from datetime import datetime, timezone
+from functools import lru_cache
 from pydantic import BaseModel
-import openai
 
 from fastapi import APIRouter, HTTPException, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from ..database import SessionLocal
-from .. import models
+from ..cache import invalidate_async
+from ..database import get_db, get_async_db
+from .. import models, schemas
 from .auth import get_current_user
 from ..glossary import DFAE_GLOSSARY
 
@@ -20,23 +22,21 @@ import logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 router = APIRouter(
     prefix="/analyze",
     tags=["analyze"],
     dependencies=[Depends(get_current_user)]
 )
 
-# Set your OpenAI API key
-openai.api_key = os.getenv("OPENAI_API_KEY")
-
-client = openai.OpenAI()
+@lru_cache(maxsize=None)
+def get_openai_client():
+    """
+    Created on first use: importing the app needs no API key, and skips
+    the slow openai import. Async, so that slow completions don't hold a
+    worker thread.
+    """
+    import openai
+    return openai.AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
 # Update the AnnotationBase class to include positions
 class AnnotationBase(BaseModel):
@@ -139,22 +139,25 @@ Example Output:
 """
 
 @router.post("/")
-def analyze_article(
+async def analyze_article(
     article_id: int,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: schemas.User = Depends(get_current_user)
 ):
     # Fetch the article text from the database
-    article = db.query(models.Article).filter(models.Article.id == article_id).first()
+    article = await db.get(models.Article, article_id)
     if not article:
         raise HTTPException(status_code=404, detail="Article not found")
 
     article_text = article.text
+    article_metadata = {"source": article.source, "title": article.title}
+    # Release the connection while waiting for OpenAI
+    await db.commit()
 
     # Call OpenAI's API to analyze the text
     try:
         logger.info("Calling OpenAI's API to analyze the text")
-        response = client.beta.chat.completions.parse(
+        response = await get_openai_client().beta.chat.completions.parse(
             model="gpt-4o-mini",
             temperature=0,
             max_tokens=4092,
@@ -182,25 +185,28 @@ def analyze_article(
     except Exception as e:
         raise HTTPException(status_code=500, detail="Failed to parse LLM response: " + str(e)) from e
 
-    # Save annotations to the database
-    saved_annotations = []
-    for ann in annotations:
-        new_annotation = models.Annotation(
+    # Save annotations to the database, in a single transaction
+    new_annotations = [
+        models.Annotation(
             article_id=article_id,
             highlighted_text=ann.highlighted_text,
             start_position=ann.start_position or 0,
             end_position=ann.end_position or len(ann.highlighted_text),
             category=ann.category,
             subcategory=ann.subcategory,
-            timestamp=datetime.utcnow().isoformat(),
+            timestamp=datetime.now(timezone.utc),
             user_id=current_user.id,
             username=current_user.username,
-            article_metadata={"source": article.source, "title": article.title}
+            article_metadata=article_metadata
         )
-        db.add(new_annotation)
-        db.commit()
-        db.refresh(new_annotation)
+        for ann in annotations
+    ]
+    db.add_all(new_annotations)
+    await db.commit()
+    await invalidate_async(f"annotations:article:{article_id}")
 
+    saved_annotations = []
+    for new_annotation in new_annotations:
         # Update the response dictionary
         annotation_dict = {
             "id": new_annotation.id,
@@ -225,7 +231,7 @@ def analyze_article(
 def analyze_vocabulary(
     article_id: int = Query(..., description="The ID of the article to analyze"),
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    current_user: schemas.User = Depends(get_current_user)
 ):
     # Fetch the article text
     article = db.query(models.Article).filter(models.Article.id == article_id).first()
@@ -1,9 +1,14 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from collections import defaultdict
+from datetime import datetime
+from typing import List, Optional, Tuple
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import DateTime, Integer, String, cast, column, delete, func, insert, literal, select, tuple_, update, values
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 from .. import models, schemas
-from ..database import SessionLocal
-from ..routers.auth import oauth2_scheme, get_user_from_token
+from ..cache import cached_response_async, invalidate_async
+from ..database import get_async_db
+from ..pagination import decode_cursor, encode_cursor
 from .auth import get_current_user
 
 router = APIRouter(
@@ -12,16 +17,46 @@ router = APIRouter(
     dependencies=[Depends(get_current_user)]
 )
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+async def get_annotation(db: AsyncSession, annotation_id: int):
+    """
+    Load an annotation with its comments, which can't be lazy loaded in
+    async code.
+    """
+    result = await db.execute(
+        select(models.Annotation)
+        .options(selectinload(models.Annotation.comments))
+        .where(models.Annotation.id == annotation_id)
+        .execution_options(populate_existing=True)
+    )
+    return result.scalars().first()
+
+async def delete_annotations(db: AsyncSession, *criteria) -> Tuple[List, List]:
+    """
+    Delete the annotations matching criteria and their comments, with one
+    statement per table. Returns the deleted annotation and comment rows.
+    Does not commit.
+    """
+    annotations = models.Annotation.__table__
+    comments = models.Comment.__table__
+    deleted_comments = await db.execute(
+        delete(comments)
+        .where(comments.c.annotation_id.in_(select(annotations.c.id).where(*criteria)))
+        .returning(*comments.c)
+    )
+    deleted_annotations = await db.execute(
+        delete(annotations).where(*criteria).returning(*annotations.c)
+    )
+    return deleted_annotations.all(), deleted_comments.all()
+
+# Operations accepted by a single POST /annotations/batch
+MAX_BATCH_SIZE = 5000
 
 @router.post("/", response_model=schemas.Annotation)
-def create_annotation(annotation: schemas.AnnotationCreate, db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)):
-    current_user = get_user_from_token(token, db)
+async def create_annotation(
+    annotation: schemas.AnnotationCreate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: schemas.User = Depends(get_current_user)
+):
     db_annotation = models.Annotation(
         article_id=annotation.article_id,
         highlighted_text=annotation.highlighted_text,
@@ -34,32 +69,40 @@ def create_annotation(annotation: schemas.AnnotationCreate, db: Session = Depend
         username=current_user.username
     )
     db.add(db_annotation)
-    db.commit()
-    db.refresh(db_annotation)
-    return db_annotation
+    await db.commit()
+    await invalidate_async(f"annotations:article:{db_annotation.article_id}")
+    return await get_annotation(db, db_annotation.id)
 
 @router.delete("/{annotation_id}", response_model=schemas.Annotation)
-def delete_annotation(annotation_id: int, db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)):
-    current_user = get_user_from_token(token, db)
-    annotation = db.query(models.Annotation).filter(models.Annotation.id == annotation_id).first()
+async def delete_annotation(
+    annotation_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: schemas.User = Depends(get_current_user)
+):
+    annotation = await get_annotation(db, annotation_id)
     if not annotation:
         raise HTTPException(status_code=404, detail="Annotation not found")
     if annotation.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized to delete this annotation")
-    db.delete(annotation)
-    db.commit()
+    await db.delete(annotation)
+    await db.commit()
+    await invalidate_async(f"annotations:article:{annotation.article_id}")
     return annotation
 
 @router.put("/{annotation_id}", response_model=schemas.Annotation)
-def update_annotation(annotation_id: int, updated_annotation: schemas.AnnotationUpdate, db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)):
-    current_user = get_user_from_token(token, db)
-    annotation = db.query(models.Annotation).filter(models.Annotation.id == annotation_id).first()
+async def update_annotation(
+    annotation_id: int,
+    updated_annotation: schemas.AnnotationUpdate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: schemas.User = Depends(get_current_user)
+):
+    annotation = await get_annotation(db, annotation_id)
     if not annotation:
         raise HTTPException(status_code=404, detail="Annotation not found")
     if annotation.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized to update this annotation")
 
-    # Update only category, subcategory and timestamp
+    # Update only category, subcategory and timestamp, keep existing positions and text
     if updated_annotation.category is not None:
         annotation.category = updated_annotation.category
     if updated_annotation.subcategory is not None:
@@ -67,25 +110,29 @@ def update_annotation(annotation_id: int, updated_annotation: schemas.Annotation
     if updated_annotation.timestamp is not None:
         annotation.timestamp = updated_annotation.timestamp
 
-    # Keep existing positions and text
-    annotation.start_position = annotation.start_position
-    annotation.end_position = annotation.end_position
-    annotation.highlighted_text = annotation.highlighted_text
-
-    db.commit()
-    db.refresh(annotation)
-    return annotation
+    await db.commit()
+    await invalidate_async(f"annotations:article:{annotation.article_id}")
+    return await get_annotation(db, annotation_id)
 
 @router.get("/article/{article_id}", response_model=List[schemas.Annotation])
-def get_annotations_by_article(article_id: int, db: Session = Depends(get_db)):
-    annotations = db.query(models.Annotation).filter(
-        models.Annotation.article_id == article_id
-    ).order_by(models.Annotation.timestamp.asc()).all()
-    return annotations
+async def get_annotations_by_article(article_id: int, request: Request, db: AsyncSession = Depends(get_async_db)):
+    async def load():
+        result = await db.execute(
+            select(models.Annotation)
+            .options(selectinload(models.Annotation.comments))
+            .where(models.Annotation.article_id == article_id)
+            .order_by(models.Annotation.timestamp.asc())
+        )
+        return [schemas.Annotation.model_validate(annotation) for annotation in result.scalars()]
+
+    return await cached_response_async(request, [f"annotations:article:{article_id}"], load, model=List[schemas.Annotation])
 
 @router.post("/comments/", response_model=schemas.Comment)
-def create_comment(comment: schemas.CommentCreate, db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)):
-    current_user = get_user_from_token(token, db)
+async def create_comment(
+    comment: schemas.CommentCreate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: schemas.User = Depends(get_current_user)
+):
     db_comment = models.Comment(
         annotation_id=comment.annotation_id,
         comment_text=comment.comment_text,
@@ -93,48 +140,285 @@ def create_comment(comment: schemas.CommentCreate, db: Session = Depends(get_db)
         username=current_user.username
     )
     db.add(db_comment)
-    db.commit()
-    db.refresh(db_comment)
+    await db.commit()
+    await db.refresh(db_comment)
+    article_id = await db.scalar(
+        select(models.Annotation.article_id).where(models.Annotation.id == db_comment.annotation_id)
+    )
+    if article_id is not None:
+        await invalidate_async(f"annotations:article:{article_id}")
     return db_comment
 
 @router.delete("/comments/{comment_id}", response_model=schemas.Comment)
-def delete_comment(comment_id: int, db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)):
-    current_user = get_user_from_token(token, db)
-    comment = db.query(models.Comment).filter(models.Comment.id == comment_id).first()
+async def delete_comment(
+    comment_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: schemas.User = Depends(get_current_user)
+):
+    comment = await db.get(models.Comment, comment_id)
 
     if not comment:
         raise HTTPException(status_code=404, detail="Comment not found")
     if comment.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized to delete this comment")
 
-    db.delete(comment)
-    db.commit()
+    article_id = await db.scalar(
+        select(models.Annotation.article_id).where(models.Annotation.id == comment.annotation_id)
+    )
+    await db.delete(comment)
+    await db.commit()
+    if article_id is not None:
+        await invalidate_async(f"annotations:article:{article_id}")
     return comment
 
-@router.get("/user/{user_name}", response_model=List[schemas.Annotation])
-def get_annotations_by_user(user_name: str, db: Session = Depends(get_db)):
-    annotations = db.query(models.Annotation).filter(
-        models.Annotation.user == user_name
-    ).order_by(models.Annotation.timestamp.asc()).all()
-    return annotations
+FEED_COLUMNS = [
+    models.Annotation.id,
+    models.Annotation.article_id,
+    models.Article.title.label("article_title"),
+    models.Article.source.label("article_source"),
+    models.Article.link.label("article_link"),
+    models.Article.published_date.label("article_published_date"),
+    models.Annotation.highlighted_text,
+    models.Annotation.start_position,
+    models.Annotation.end_position,
+    models.Annotation.category,
+    models.Annotation.subcategory,
+    models.Annotation.timestamp,
+    models.Annotation.user_id,
+    models.Annotation.username,
+]
+
+async def annotation_feed(
+    db: AsyncSession,
+    response: Response,
+    user_id=None,
+    category: Optional[str] = None,
+    source: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+):
+    """
+    Annotations newest first, keyset paginated on (timestamp, id), with the
+    title, source and link of their article but no text. With a user the
+    pages are read from the (user_id, timestamp, id) index.
+    """
+    query = select(*FEED_COLUMNS).join(models.Article, models.Article.id == models.Annotation.article_id)
+    if user_id is not None:
+        query = query.where(models.Annotation.user_id == user_id)
+    if category:
+        query = query.where(models.Annotation.category == category)
+    if source:
+        query = query.where(models.Article.source.ilike(f"%{source}%"))
+    if start_date:
+        query = query.where(models.Annotation.timestamp >= start_date)
+    if end_date:
+        query = query.where(models.Annotation.timestamp <= end_date)
+    if cursor:
+        last_timestamp, last_id = decode_cursor(cursor)
+        query = query.where(tuple_(models.Annotation.timestamp, models.Annotation.id) < tuple_(last_timestamp, last_id))
+
+    result = await db.execute(
+        query.order_by(models.Annotation.timestamp.desc(), models.Annotation.id.desc()).limit(limit + 1)
+    )
+    rows = result.all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor(rows[-1].timestamp, rows[-1].id)
+    return [dict(row._mapping) for row in rows]
+
+@router.get("/feed", response_model=List[schemas.AnnotationFeedItem])
+async def get_annotation_feed(
+    response: Response,
+    user: Optional[str] = Query(None, description="Only the annotations of this user"),
+    mine: bool = Query(False, description="Only the annotations of the current user"),
+    category: Optional[str] = Query(None),
+    source: Optional[str] = Query(None),
+    start_date: Optional[datetime] = Query(None, description="Minimum annotation timestamp"),
+    end_date: Optional[datetime] = Query(None, description="Maximum annotation timestamp"),
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor header of the previous page"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: schemas.User = Depends(get_current_user)
+):
+    """
+    Annotation feed, across users for reviewers, of one user with `user`,
+    or the current user's work with `mine=true`. Pass the X-Next-Cursor
+    header of a response as `cursor` to get the next page.
+    """
+    user_id = None
+    if mine:
+        user_id = current_user.id
+    elif user:
+        # Resolved in a subquery, so that the planner can read the user's index
+        user_id = select(models.User.id).where(models.User.username == user).scalar_subquery()
+    return await annotation_feed(db, response, user_id, category, source, start_date, end_date, limit, cursor)
+
+@router.get("/user/{user_name}", response_model=List[schemas.AnnotationFeedItem])
+async def get_annotations_by_user(
+    user_name: str,
+    response: Response,
+    category: Optional[str] = Query(None),
+    source: Optional[str] = Query(None),
+    start_date: Optional[datetime] = Query(None, description="Minimum annotation timestamp"),
+    end_date: Optional[datetime] = Query(None, description="Maximum annotation timestamp"),
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor header of the previous page"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    user_id = select(models.User.id).where(models.User.username == user_name).scalar_subquery()
+    return await annotation_feed(db, response, user_id, category, source, start_date, end_date, limit, cursor)
 
 @router.delete("/article/{article_id}/all", response_model=List[schemas.Annotation])
-def delete_all_article_annotations(article_id: int, db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)):
-    current_user = get_user_from_token(token, db)
-    annotations = db.query(models.Annotation).filter(
+async def delete_all_article_annotations(
+    article_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: schemas.User = Depends(get_current_user)
+):
+    annotations, comments = await delete_annotations(
+        db,
         models.Annotation.article_id == article_id,
         models.Annotation.user_id == current_user.id
-    ).all()
-
+    )
     if not annotations:
         raise HTTPException(status_code=404, detail="No annotations found for this article")
 
-    # Store annotations before deletion for return value
-    deleted_annotations = [annotation for annotation in annotations]
+    await db.commit()
+    await invalidate_async(f"annotations:article:{article_id}")
+
+    comments_by_annotation = defaultdict(list)
+    for comment in comments:
+        comments_by_annotation[comment.annotation_id].append(dict(comment._mapping))
+    return [
+        {**annotation._mapping, "comments": comments_by_annotation[annotation.id]}
+        for annotation in sorted(annotations, key=lambda annotation: annotation.timestamp)
+    ]
+
+@router.post("/batch", response_model=schemas.AnnotationBatchResult)
+async def batch_annotations(
+    batch: schemas.AnnotationBatch,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: schemas.User = Depends(get_current_user)
+):
+    """
+    Apply annotation operations of the current user in one transaction, one
+    statement per kind of operation, in this order: clear_articles (delete
+    all the user's annotations on these articles), delete, update, create.
+    Operations that can't be applied are reported in errors by kind and
+    index, the others are applied. created holds the new ids in the order
+    of create, null for a failed item.
+    """
+    size = len(batch.clear_articles) + len(batch.delete) + len(batch.update) + len(batch.create)
+    if size > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH_SIZE} operations per batch")
+
+    result = schemas.AnnotationBatchResult(created=[None] * len(batch.create))
+    touched_articles = set()
+
+    def fail(op: str, index: int, detail: str):
+        result.errors.append(schemas.BatchError(op=op, index=index, detail=detail))
+
+    # Annotations referenced by id, loaded at once to check their owner
+    referenced = set(batch.delete) | {item.id for item in batch.update}
+    owners = {}
+    if referenced:
+        rows = await db.execute(
+            select(models.Annotation.id, models.Annotation.user_id)
+            .where(models.Annotation.id.in_(referenced))
+        )
+        owners = {row.id: row.user_id for row in rows}
+
+    def owned(op: str, index: int, annotation_id: int) -> bool:
+        if annotation_id not in owners:
+            fail(op, index, "Annotation not found")
+            return False
+        if owners[annotation_id] != current_user.id:
+            fail(op, index, "Not authorized to modify this annotation")
+            return False
+        return True
+
+    if batch.clear_articles:
+        cleared, _ = await delete_annotations(
+            db,
+            models.Annotation.article_id.in_(batch.clear_articles),
+            models.Annotation.user_id == current_user.id
+        )
+        result.cleared = len(cleared)
+        for row in cleared:
+            touched_articles.add(row.article_id)
+            owners.pop(row.id, None)
+
+    delete_ids = {
+        annotation_id for index, annotation_id in enumerate(batch.delete)
+        if owned("delete", index, annotation_id)
+    }
+    if delete_ids:
+        deleted, _ = await delete_annotations(
+            db,
+            models.Annotation.id.in_(delete_ids),
+            models.Annotation.user_id == current_user.id
+        )
+        for row in deleted:
+            result.deleted.append(row.id)
+            touched_articles.add(row.article_id)
+            owners.pop(row.id, None)
+
+    # The last update of an annotation wins
+    changes = {
+        item.id: item for index, item in enumerate(batch.update)
+        if owned("update", index, item.id)
+    }
+    if changes:
+        annotations = models.Annotation.__table__
+        columns = [
+            column("id", Integer),
+            column("category", String),
+            column("subcategory", String),
+            column("timestamp", DateTime(timezone=True)),
+        ]
+        # Every value is cast: Postgres types a VALUES column from its values,
+        # a column of NULLs only would be text
+        rows = values(*columns, name="changes").data([
+            tuple(
+                cast(literal(getattr(item, c.name), c.type), c.type)
+                for c in columns
+            )
+            for item in changes.values()
+        ])
+        updated = await db.execute(
+            update(annotations)
+            .where(annotations.c.id == rows.c.id, annotations.c.user_id == current_user.id)
+            .values(
+                category=func.coalesce(rows.c.category, annotations.c.category),
+                subcategory=func.coalesce(rows.c.subcategory, annotations.c.subcategory),
+                timestamp=func.coalesce(rows.c.timestamp, func.now()),
+            )
+            .returning(annotations.c.id, annotations.c.article_id)
+        )
+        for row in updated:
+            result.updated.append(row.id)
+            touched_articles.add(row.article_id)
 
-    # Delete all annotations
-    for annotation in annotations:
-        db.delete(annotation)
+    if batch.create:
+        article_ids = {item.article_id for item in batch.create}
+        existing = set(await db.scalars(select(models.Article.id).where(models.Article.id.in_(article_ids))))
+        rows, positions = [], []
+        for index, item in enumerate(batch.create):
+            if item.article_id not in existing:
+                fail("create", index, "Article not found")
+            else:
+                rows.append({**item.model_dump(), "user_id": current_user.id, "username": current_user.username})
+                positions.append(index)
+        if rows:
+            created = await db.scalars(
+                insert(models.Annotation).returning(models.Annotation.id, sort_by_parameter_order=True),
+                rows
+            )
+            for index, annotation_id in zip(positions, created):
+                result.created[index] = annotation_id
+            touched_articles.update(row["article_id"] for row in rows)
 
-    db.commit()
-    return deleted_annotations
+    await db.commit()
+    await invalidate_async(*[f"annotations:article:{article_id}" for article_id in touched_articles])
+    return result
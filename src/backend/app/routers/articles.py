@@ -1,10 +1,19 @@
-from typing import Optional, List, Dict
-import csv
-from fastapi import APIRouter, Depends, Query, UploadFile, File, HTTPException
-from sqlalchemy import and_
-from sqlalchemy.orm import Session
+from typing import Optional, List
+from datetime import datetime
+import os
+import tempfile
+from fastapi import APIRouter, BackgroundTasks, Depends, Query, Request, UploadFile, File, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import HTMLResponse
+from sqlalchemy import and_, or_, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, noload, selectinload
 from .. import models, schemas
-from ..database import SessionLocal
+from ..blobs import put_html, get_html
+from ..cache import cached_response_async, invalidate
+from ..database import get_db, get_async_db
+from ..ingest import create_job, get_job, ingest_csv
+from ..pagination import decode_cursor, encode_cursor
 from .auth import get_current_user
 
 
@@ -14,13 +23,6 @@ router = APIRouter(
     dependencies=[Depends(get_current_user)]
 )
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 @router.post("/article", response_model=schemas.Article)
 def create_article(article: schemas.ArticleCreate, db: Session = Depends(get_db)):
     db_article = models.Article(source=article.source,
@@ -29,7 +31,7 @@ def create_article(article: schemas.ArticleCreate, db: Session = Depends(get_db)
                                 title=article.title,
                                 topic=article.topic,
                                 abstract=article.abstract,
-                                html=article.html,
+                                html_hash=put_html(db, article.html),
                                 text=article.text,
                                 published_date=article.published_date,
                                 modified_date=article.modified_date,
@@ -39,29 +41,36 @@ def create_article(article: schemas.ArticleCreate, db: Session = Depends(get_db)
     db.add(db_article)
     db.commit()
     db.refresh(db_article)
+    invalidate("articles")
     return db_article
 
-@router.get("/", response_model=List[schemas.Article])
-def read_articles(
-    q: Optional[str] = Query(None, min_length=1, max_length=50),
-    start_date: Optional[str] = Query(None),
-    end_date: Optional[str] = Query(None),
-    source: Optional[str] = Query(None),
-    db: Session = Depends(get_db)
-):
-    query = db.query(models.Article)
+UPLOAD_CHUNK_SIZE = 1024 * 1024
 
-    if q:
-        query = query.filter(
-            models.Article.source.ilike(f"%{q}%") |
-            models.Article.link.ilike(f"%{q}%") |
-            models.Article.author.ilike(f"%{q}%") |
-            models.Article.title.ilike(f"%{q}%") |
-            models.Article.topic.ilike(f"%{q}%") |
-            models.Article.abstract.ilike(f"%{q}%") |
-            models.Article.text.ilike(f"%{q}%")
-        )
+# Columns that can be requested with `fields=`, the raw html lives in html_blobs
+PROJECTABLE_FIELDS = [
+    column.name for column in models.Article.__table__.columns
+    if column.name not in ("html_hash", "search_vector")
+]
+
+# ts_headline options for search snippets
+HEADLINE_OPTIONS = "MaxFragments=2, MaxWords=30, MinWords=10, FragmentDelimiter= … "
+
+def search_filter(q: str):
+    """
+    Full-text match on the search_vector (french stemming, web search syntax:
+    "exact phrase", -excluded, or), plus fuzzy matching on title and author.
+    Each branch is served by its own GIN index.
+    """
+    return or_(
+        models.Article.search_vector.op("@@")(func.websearch_to_tsquery("french", q)),
+        models.Article.title.ilike(f"%{q}%"),
+        models.Article.author.ilike(f"%{q}%"),
+    )
 
+def filter_articles(query, start_date: Optional[datetime], end_date: Optional[datetime], source: Optional[str]):
+    # published_date has no time zone: like Postgres casting a string, drop any UTC offset
+    start_date = start_date.replace(tzinfo=None) if start_date else None
+    end_date = end_date.replace(tzinfo=None) if end_date else None
     if start_date and end_date:
         query = query.filter(
             and_(
@@ -76,51 +85,233 @@ def read_articles(
 
     if source:
         query = query.filter(models.Article.source.ilike(f"%{source}%"))
+    return query
+
+# Annotation fields that can be requested with `annotation_fields=`
+ANNOTATION_FIELDS = [name for name in schemas.Annotation.model_fields if name != "comments"]
+
+def split_fields(fields: str, allowed: List[str], required=("id",)) -> List[str]:
+    names = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = [name for name in names if name not in allowed]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    for name in required:
+        if name not in names:
+            names.append(name)
+    return names
+
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    if not fields:
+        return None
+    # The cursor is built from the sort key
+    return split_fields(fields, PROJECTABLE_FIELDS, required=("published_date", "id"))
+
+@router.get("/", response_model=List[schemas.ArticleListItem])
+async def read_articles(
+    request: Request,
+    q: Optional[str] = Query(None, min_length=1, max_length=50),
+    start_date: Optional[datetime] = Query(None),
+    end_date: Optional[datetime] = Query(None),
+    source: Optional[str] = Query(None),
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor header of the previous page"),
+    fields: Optional[str] = Query(None, description="Comma separated columns to return, e.g. id,title"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    List articles, newest first, without their text. Pages are keyed on
+    (published_date, id): pass the X-Next-Cursor header of a response as
+    `cursor` to get the next page, the header is absent on the last page.
+    """
+    columns = parse_fields(fields) or list(schemas.ArticleListItem.model_fields)
+    last = decode_cursor(cursor) if cursor else None
+
+    async def load():
+        query = select(*[getattr(models.Article, name) for name in columns])
+
+        if q:
+            query = query.filter(search_filter(q))
+        query = filter_articles(query, start_date, end_date, source)
+
+        if last:
+            last_date, last_id = last
+            if last_date is None:
+                query = query.filter(models.Article.published_date.is_(None), models.Article.id < last_id)
+            else:
+                query = query.filter(or_(
+                    models.Article.published_date < last_date,
+                    and_(models.Article.published_date == last_date, models.Article.id < last_id),
+                    models.Article.published_date.is_(None),
+                ))
+
+        result = await db.execute(query.order_by(
+            models.Article.published_date.desc().nulls_last(),
+            models.Article.id.desc()
+        ).limit(limit + 1))
+        rows = result.all()
+
+        headers = {}
+        if len(rows) > limit:
+            rows = rows[:limit]
+            headers["X-Next-Cursor"] = encode_cursor(rows[-1].published_date, rows[-1].id)
+        return [dict(row._mapping) for row in rows], headers
+
+    model = List[schemas.partial_model(schemas.Article, tuple(columns))] if fields else List[schemas.ArticleListItem]
+    return await cached_response_async(request, ["articles"], load, model=model)
 
-    articles = query.all()
-    return articles
+@router.get("/search", response_model=List[schemas.ArticleSearchResult])
+async def search_articles(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=200),
+    start_date: Optional[datetime] = Query(None),
+    end_date: Optional[datetime] = Query(None),
+    source: Optional[str] = Query(None),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0, le=1000),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Search articles ranked by relevance, with highlighted snippets of the
+    text. Snippets are only computed for the returned page.
+    """
+    async def load():
+        tsquery = func.websearch_to_tsquery("french", q)
+        rank = (
+            func.ts_rank_cd(models.Article.search_vector, tsquery, 32) +
+            func.similarity(func.coalesce(models.Article.title, ""), q)
+        ).label("rank")
+
+        ranked = select(models.Article.id, rank).filter(search_filter(q))
+        ranked = filter_articles(ranked, start_date, end_date, source)
+        ranked = ranked.order_by(rank.desc(), models.Article.id.desc()).limit(limit).offset(offset).subquery()
+
+        list_fields = schemas.ArticleListItem.model_fields
+        result = await db.execute(select(
+            *[getattr(models.Article, name) for name in list_fields],
+            ranked.c.rank,
+            func.ts_headline(
+                "french", func.coalesce(models.Article.text, ""), tsquery, HEADLINE_OPTIONS
+            ).label("snippet"),
+        ).join(ranked, ranked.c.id == models.Article.id).order_by(
+            ranked.c.rank.desc(), models.Article.id.desc()
+        ))
+        return [dict(row._mapping) for row in result]
+
+    return await cached_response_async(request, ["articles"], load, model=List[schemas.ArticleSearchResult])
+
+@router.get("/{article_id}", response_model=schemas.Article)
+async def read_article(article_id: int, db: AsyncSession = Depends(get_async_db)):
+    article = await db.get(models.Article, article_id)
+    if not article:
+        raise HTTPException(status_code=404, detail="Article not found")
+    return article
+
+@router.get("/{article_id}/workspace", response_model=schemas.ArticleWorkspace)
+async def read_article_workspace(
+    article_id: int,
+    request: Request,
+    fields: Optional[str] = Query(None, description="Comma separated article columns to return, e.g. id,title,text"),
+    annotation_fields: Optional[str] = Query(None, description="Comma separated annotation fields to return"),
+    comments: bool = Query(True, description="Include the comments of each annotation"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Everything the editor needs to open an article: the article, its
+    annotations (oldest first) and their comments, whatever the number of
+    annotations in four queries (event_seq, article, annotations, comments),
+    three with comments=false. event_seq is where to resume the article's
+    event stream from.
+    """
+    article_columns = split_fields(fields, PROJECTABLE_FIELDS) if fields else list(schemas.Article.model_fields)
+    annotation_columns = split_fields(annotation_fields, ANNOTATION_FIELDS) if annotation_fields else ANNOTATION_FIELDS
+    if comments:
+        annotation_columns = annotation_columns + ["comments"]
+
+    async def load():
+        # Read before the annotations: events after it may be replayed, none is missed
+        event_seq = await db.scalar(
+            select(func.coalesce(func.max(models.AnnotationEvent.id), 0))
+            .where(models.AnnotationEvent.article_id == article_id)
+        )
+        result = await db.execute(
+            select(*[getattr(models.Article, name) for name in article_columns])
+            .where(models.Article.id == article_id)
+        )
+        article = result.first()
+        if article is None:
+            raise HTTPException(status_code=404, detail="Article not found")
+
+        result = await db.execute(
+            select(models.Annotation)
+            .options(selectinload(models.Annotation.comments) if comments else noload(models.Annotation.comments))
+            .where(models.Annotation.article_id == article_id)
+            .order_by(models.Annotation.timestamp.asc())
+        )
+        return {
+            "article": dict(article._mapping),
+            "annotations": [
+                schemas.Annotation.model_validate(annotation).model_dump(include=set(annotation_columns))
+                for annotation in result.scalars()
+            ],
+            "event_seq": event_seq,
+        }
+
+    model = schemas.workspace_model(tuple(article_columns), tuple(annotation_columns))
+    return await cached_response_async(request, ["articles", f"annotations:article:{article_id}"], load, model=model)
 
 @router.get("/article/{article_id}", response_model=List[schemas.Annotation])
-def get_annotations_by_article(article_id: int, db: Session = Depends(get_db)):
-    annotations = db.query(models.Annotation).filter(
-        models.Annotation.article_id == article_id
-    ).order_by(models.Annotation.timestamp.asc()).all()
-    return annotations
-
-@router.post("/upload-csv", response_model=Dict)
-async def upload_csv(file: UploadFile = File(...), db: Session = Depends(get_db)):
+async def get_annotations_by_article(article_id: int, request: Request, db: AsyncSession = Depends(get_async_db)):
+    async def load():
+        result = await db.execute(
+            select(models.Annotation)
+            .options(selectinload(models.Annotation.comments))
+            .where(models.Annotation.article_id == article_id)
+            .order_by(models.Annotation.timestamp.asc())
+        )
+        return [schemas.Annotation.model_validate(annotation) for annotation in result.scalars()]
+
+    return await cached_response_async(request, [f"annotations:article:{article_id}"], load, model=List[schemas.Annotation])
+
+@router.get("/article/{article_id}/html", response_class=HTMLResponse)
+def get_article_html(article_id: int, db: Session = Depends(get_db)):
+    article = db.query(models.Article).filter(models.Article.id == article_id).first()
+    if not article:
+        raise HTTPException(status_code=404, detail="Article not found")
+    html = get_html(db, article.html_hash)
+    if html is None:
+        raise HTTPException(status_code=404, detail="No HTML stored for this article")
+    return HTMLResponse(content=html)
+
+@router.post("/upload-csv", response_model=schemas.IngestJob, status_code=202)
+async def upload_csv(background_tasks: BackgroundTasks, file: UploadFile = File(...)):
+    """
+    Queue a CSV upload of articles. Articles are upserted on link, follow the
+    returned job with GET /articles/upload-csv/{job_id}, from any worker.
+    """
     if not file.filename.endswith('.csv'):
         raise HTTPException(status_code=400, detail="Invalid file format. Please upload a CSV file.")
 
-    articles = []
-    content = await file.read()
-    decoded_content = content.decode('utf-8').splitlines()
-    reader = csv.DictReader(decoded_content)
-
-    for row in reader:
-        # Validate required fields
-        if not row['source'] or not row['link'] or not row['title']:
-            continue
-
-        article = models.Article(
-            source=row['source'],
-            link=row['link'],
-            author=row.get('author'),
-            title=row['title'],
-            topic=row.get('topic'),
-            abstract=row.get('abstract'),
-            html=row.get('html'),
-            text=row.get('text'),
-            published_date=row.get('published_date'),
-            modified_date=row.get('modified_date'),
-            membership=row.get('membership'),
-            language=row.get('language')
-        )
-        db.add(article)
-        articles.append(article)
-
-    db.commit()
-    for article in articles:
-        db.refresh(article)
+    # Spool the upload to disk without holding it in memory. Once the job
+    # exists, ingest_csv removes the file
+    with tempfile.NamedTemporaryFile(suffix=".csv", delete=False) as fp:
+        try:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                await run_in_threadpool(fp.write, chunk)
+        except BaseException:
+            fp.close()
+            os.remove(fp.name)
+            raise
+    try:
+        job = await run_in_threadpool(create_job, file.filename)
+    except BaseException:
+        os.remove(fp.name)
+        raise
+    background_tasks.add_task(ingest_csv, job["id"], fp.name)
+    return job
 
-    return {"articles": f"Uploaded {len(articles)} articles successfully"}
+@router.get("/upload-csv/{job_id}", response_model=schemas.IngestJob)
+def get_upload_status(job_id: str):
+    job = get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Upload job not found")
+    return job
@@ -1,12 +1,17 @@
-from datetime import timedelta, datetime
+from datetime import timedelta, datetime, timezone
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+import threading
+import time
 
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
+from sqlalchemy import event, select
 from sqlalchemy.orm import Session
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from .. import models, schemas
-from ..database import get_db
+from ..database import AsyncSessionLocal, get_db
 import os
 
 router = APIRouter(
@@ -18,6 +23,13 @@ router = APIRouter(
 SECRET_KEY = os.getenv("JWT_SECRET_KEY")
 ALGORITHM = os.getenv("ALGORITHM")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES"))
+# Seconds an authenticated user is served from memory before being reloaded.
+# Changes made through this worker's ORM session are seen at once; changes by
+# other workers or directly in SQL (role change, deletion) only when the
+# entry expires, so this is also how long a revoked user stays authorized.
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "10"))
+# Lifetime of the article-scoped tokens of the event streams, which travel in URLs
+STREAM_TOKEN_EXPIRE_SECONDS = int(os.getenv("STREAM_TOKEN_EXPIRE_SECONDS", "60"))
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/token")
@@ -39,7 +51,7 @@ def authenticate_user(db, username: str, password: str):
 
 def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode = data.copy()
-    expire = datetime.utcnow() + (expires_delta or timedelta(minutes=15))
+    expire = datetime.now(timezone.utc) + (expires_delta or timedelta(minutes=15))
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
@@ -53,6 +65,7 @@ def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
     db.add(new_user)
     db.commit()
     db.refresh(new_user)
+    invalidate_user(new_user.username)
     return new_user
 
 @router.post("/token", response_model=schemas.Token)
@@ -70,38 +83,95 @@ def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db:
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
-def get_user_from_token(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    credentials_exception = HTTPException(
-        status_code=401,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"}
-    )
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
+_user_cache: Dict[str, Tuple[float, schemas.User]] = {}
+_user_cache_lock = threading.Lock()
+
+def invalidate_user(username: Optional[str] = None):
+    """
+    Drop a user from the cache, or every user when username is None. Other
+    workers pick up the change when their entry expires, within USER_CACHE_TTL.
+    """
+    with _user_cache_lock:
         if username is None:
-            raise credentials_exception
-    except JWTError:
-        raise credentials_exception
-    user = get_user(db, username=username)
+            _user_cache.clear()
+        else:
+            _user_cache.pop(username, None)
+
+@event.listens_for(models.User, "after_update")
+@event.listens_for(models.User, "after_delete")
+def _invalidate_changed_user(mapper, connection, target):
+    # The username itself may have changed, drop every entry
+    invalidate_user()
+
+def create_stream_token(username: str, article_id: int) -> str:
+    """
+    A short-lived token only valid for the event streams of one article.
+    """
+    return create_access_token(
+        data={"sub": username, "scope": "stream", "article_id": article_id},
+        expires_delta=timedelta(seconds=STREAM_TOKEN_EXPIRE_SECONDS),
+    )
+
+@lru_cache(maxsize=1024)
+def decode_token(token: str) -> Tuple[str, float, Optional[str], Optional[int]]:
+    """
+    Subject, expiry, scope and article of a token (scope and article are
+    None for session tokens). The signature is only verified once per
+    token, the expiry is checked by the caller on every use.
+    """
+    payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    username = payload.get("sub")
+    if username is None:
+        raise JWTError("Token has no subject")
+    return username, float(payload.get("exp") or 0), payload.get("scope"), payload.get("article_id")
+
+async def load_user(username: str) -> Optional[schemas.User]:
+    now = time.monotonic()
+    with _user_cache_lock:
+        entry = _user_cache.get(username)
+    if entry is not None and entry[0] > now:
+        return entry[1]
+
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(select(models.User).where(models.User.username == username))
+        user = result.scalars().first()
     if user is None:
-        raise credentials_exception
+        return None
+    user = schemas.User.model_validate(user)
+    with _user_cache_lock:
+        _user_cache[username] = (now + USER_CACHE_TTL, user)
     return user
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+async def user_from_token(token: str, scope: Optional[str] = None, article_id: Optional[int] = None) -> schemas.User:
+    """
+    The user a token was issued to. Session tokens have no scope, stream
+    tokens (create_stream_token) are only accepted with scope="stream" for
+    their article.
+    """
     credentials_exception = HTTPException(
         status_code=401,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
+        username, expires_at, token_scope, token_article_id = decode_token(token)
     except JWTError:
         raise credentials_exception
-    user = get_user(db, username=username)
+    if expires_at and expires_at < time.time():
+        raise credentials_exception
+    if token_scope != scope or (scope is not None and token_article_id != article_id):
+        raise credentials_exception
+    user = await load_user(username)
     if user is None:
         raise credentials_exception
     return user
+
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> schemas.User:
+    """
+    The authenticated user. FastAPI runs it once per request however many
+    dependencies require it, and the user is cached for USER_CACHE_TTL
+    seconds, so most requests don't touch the database to authenticate.
+    A user changed or deleted outside this worker's ORM session keeps its
+    cached rights for at most that long.
+    """
+    return await user_from_token(token)
@@ -0,0 +1,120 @@
+import re
+import json
+import logging
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+
+from .. import schemas
+from ..events import hub
+from .auth import STREAM_TOKEN_EXPIRE_SECONDS, create_stream_token, get_current_user, user_from_token
+
+router = APIRouter(
+    prefix="/events",
+    tags=["events"]
+)
+
+class RedactTokens(logging.Filter):
+    """
+    Masks token query parameters in the uvicorn access log lines.
+    """
+    pattern = re.compile(r"([?&]token=)[^&\s]*")
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if isinstance(record.args, tuple):
+            record.args = tuple(
+                self.pattern.sub(r"\1[redacted]", arg) if isinstance(arg, str) else arg
+                for arg in record.args
+            )
+        return True
+
+@router.post("/articles/{article_id}/token", response_model=schemas.StreamToken)
+async def create_article_stream_token(article_id: int, current_user: schemas.User = Depends(get_current_user)):
+    """
+    A token for the event streams of the article, for clients that can't
+    set headers (EventSource, WebSocket) and pass it in the URL. It expires
+    after STREAM_TOKEN_EXPIRE_SECONDS: open streams are not closed then, but
+    reconnecting takes a new token.
+    """
+    return {
+        "token": create_stream_token(current_user.username, article_id),
+        "expires_in": STREAM_TOKEN_EXPIRE_SECONDS,
+    }
+
+async def get_stream_user(
+    article_id: int,
+    token: Optional[str] = Query(None, description="Stream token of /events/articles/{article_id}/token"),
+    authorization: Optional[str] = Header(None),
+) -> schemas.User:
+    # Session tokens are only accepted in the header, URLs end up in logs
+    if token is not None:
+        return await user_from_token(token, scope="stream", article_id=article_id)
+    if authorization and authorization.lower().startswith("bearer "):
+        return await user_from_token(authorization[len("bearer "):])
+    raise HTTPException(status_code=401, detail="Not authenticated", headers={"WWW-Authenticate": "Bearer"})
+
+def resume_point(since: Optional[int], last_event_id: Optional[str]) -> Optional[int]:
+    # EventSource resends the id of the last event it received on reconnect
+    if last_event_id:
+        try:
+            return int(last_event_id)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid Last-Event-ID")
+    return since
+
+@router.get("/articles/{article_id}")
+async def stream_article_events(
+    article_id: int,
+    since: Optional[int] = Query(None, description="Resume after this event, e.g. the event_seq of /articles/{id}/workspace"),
+    last_event_id: Optional[str] = Header(None),
+    current_user: schemas.User = Depends(get_stream_user),
+):
+    """
+    Server-sent events of the annotations and comments of an article:
+    "annotation" and "comment" events, with the sequence as event id, and
+    "reset" when the client must reload the article. See app/events.py.
+    """
+    since = resume_point(since, last_event_id)
+
+    async def generate():
+        yield "retry: 3000\n\n"
+        async for event in hub.stream(article_id, since):
+            if event is None:
+                yield ": keepalive\n\n"
+            elif "seq" in event:
+                yield f"id: {event['seq']}\nevent: {event['kind']}\ndata: {json.dumps(event)}\n\n"
+            else:
+                yield f"event: {event['kind']}\ndata: {json.dumps(event)}\n\n"
+
+    return StreamingResponse(
+        generate(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.websocket("/articles/{article_id}/ws")
+async def article_events_websocket(
+    websocket: WebSocket,
+    article_id: int,
+    token: str = Query(..., description="Stream token of /events/articles/{article_id}/token"),
+    since: Optional[int] = Query(None),
+):
+    """
+    The events of /events/articles/{article_id} as JSON messages, keepalives
+    being {"kind": "keepalive"}. Reconnect with a new token and since set to
+    the last seq.
+    """
+    try:
+        await user_from_token(token, scope="stream", article_id=article_id)
+    except HTTPException:
+        await websocket.close(code=1008)
+        return
+    await websocket.accept()
+    try:
+        async for event in hub.stream(article_id, since):
+            await websocket.send_json(event if event is not None else {"kind": "keepalive"})
+    except WebSocketDisconnect:
+        return
+    # Ends after a reset
+    await websocket.close()
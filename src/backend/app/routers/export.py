@@ -0,0 +1,141 @@
+from typing import Optional, Iterator
+from datetime import date, datetime
+import json
+import zlib
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from .. import models
+from ..database import SessionLocal
+from .auth import get_current_user
+
+
+router = APIRouter(
+    prefix="/export",
+    tags=["export"],
+    dependencies=[Depends(get_current_user)]
+)
+
+# Rows fetched per round trip from the server-side cursor
+BATCH_SIZE = 1000
+
+ARTICLE_COLUMNS = [
+    column for column in models.Article.__table__.columns if column.name != "search_vector"
+]
+ANNOTATION_COLUMNS = list(models.Annotation.__table__.columns)
+COMMENT_COLUMNS = list(models.Comment.__table__.columns)
+
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def naive(value: Optional[datetime]) -> Optional[datetime]:
+    # Article dates have no time zone: like Postgres casting a string, drop any UTC offset
+    return value.replace(tzinfo=None) if value else None
+
+
+def filter_by_article(statement, source: Optional[str], start_date: Optional[datetime], end_date: Optional[datetime]):
+    start_date, end_date = naive(start_date), naive(end_date)
+    if source:
+        statement = statement.where(models.Article.source.ilike(f"%{source}%"))
+    if start_date:
+        statement = statement.where(models.Article.published_date >= start_date)
+    if end_date:
+        statement = statement.where(models.Article.published_date <= end_date)
+    return statement
+
+
+def stream_rows(statement) -> Iterator[bytes]:
+    """
+    Run statement on a server-side cursor and yield its rows as NDJSON,
+    one batch at a time. The generator opens its own session, since the
+    request's dependencies are closed once the response starts streaming.
+    """
+    with SessionLocal() as db:
+        result = db.execute(statement.execution_options(yield_per=BATCH_SIZE))
+        for rows in result.partitions():
+            yield "".join(
+                json.dumps(dict(row._mapping), default=_default, ensure_ascii=False) + "\n"
+                for row in rows
+            ).encode("utf-8")
+
+
+def gzip_stream(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def ndjson_response(statement, name: str, gzip: bool) -> StreamingResponse:
+    chunks = stream_rows(statement)
+    if gzip:
+        return StreamingResponse(
+            gzip_stream(chunks),
+            media_type="application/gzip",
+            headers={"Content-Disposition": f'attachment; filename="{name}.ndjson.gz"'},
+        )
+    return StreamingResponse(
+        chunks,
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{name}.ndjson"'},
+    )
+
+
+@router.get("/articles")
+def export_articles(
+    source: Optional[str] = Query(None),
+    start_date: Optional[datetime] = Query(None, description="Minimum published_date"),
+    end_date: Optional[datetime] = Query(None, description="Maximum published_date"),
+    since: Optional[datetime] = Query(None, description="Only articles modified since (modified_at)"),
+    gzip: bool = Query(False),
+):
+    """
+    Stream articles as NDJSON, one article per line. The raw html is not
+    exported, use /articles/article/{article_id}/html for that.
+    """
+    statement = filter_by_article(select(*ARTICLE_COLUMNS), source, start_date, end_date)
+    if since:
+        statement = statement.where(models.Article.modified_at >= naive(since))
+    return ndjson_response(statement.order_by(models.Article.id), "articles", gzip)
+
+
+@router.get("/annotations")
+def export_annotations(
+    source: Optional[str] = Query(None),
+    start_date: Optional[datetime] = Query(None, description="Minimum published_date of the article"),
+    end_date: Optional[datetime] = Query(None, description="Maximum published_date of the article"),
+    since: Optional[datetime] = Query(None, description="Only annotations created or modified since"),
+    gzip: bool = Query(False),
+):
+    statement = select(*ANNOTATION_COLUMNS).join(
+        models.Article, models.Article.id == models.Annotation.article_id
+    )
+    statement = filter_by_article(statement, source, start_date, end_date)
+    if since:
+        statement = statement.where(models.Annotation.timestamp >= since)
+    return ndjson_response(statement.order_by(models.Annotation.id), "annotations", gzip)
+
+
+@router.get("/comments")
+def export_comments(
+    source: Optional[str] = Query(None),
+    start_date: Optional[datetime] = Query(None, description="Minimum published_date of the article"),
+    end_date: Optional[datetime] = Query(None, description="Maximum published_date of the article"),
+    since: Optional[datetime] = Query(None, description="Only comments posted since"),
+    gzip: bool = Query(False),
+):
+    statement = select(*COMMENT_COLUMNS).join(
+        models.Annotation, models.Annotation.id == models.Comment.annotation_id
+    ).join(
+        models.Article, models.Article.id == models.Annotation.article_id
+    )
+    statement = filter_by_article(statement, source, start_date, end_date)
+    if since:
+        statement = statement.where(models.Comment.timestamp >= since)
+    return ndjson_response(statement.order_by(models.Comment.id), "comments", gzip)
@@ -1,6 +1,7 @@
-from pydantic import BaseModel
-from typing import Optional, List, Dict, Any
-from datetime import datetime
+from functools import lru_cache
+from pydantic import BaseModel, ConfigDict, create_model, model_validator
+from typing import Optional, List, Dict, Any, Tuple, Type
+from datetime import date, datetime
 
 class ArticleBase(BaseModel):
     source: str
@@ -9,7 +10,6 @@ class ArticleBase(BaseModel):
     title: Optional[str] = None
     topic: Optional[str] = None
     abstract: Optional[str] = None
-    html: Optional[str] = None
     text: Optional[str] = None
     published_date: Optional[datetime] = None
     modified_date: Optional[datetime] = None
@@ -17,15 +17,43 @@ class ArticleBase(BaseModel):
     language: Optional[str] = 'fr'
 
 class ArticleCreate(ArticleBase):
-    pass
+    html: Optional[str] = None
 
 class Article(ArticleBase):
     id: int
+    html_hash: Optional[str] = None
     created_at: datetime
     modified_at: datetime
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
+
+class ArticleListItem(BaseModel):
+    id: int
+    source: str
+    link: str
+    author: str
+    title: Optional[str] = None
+    topic: Optional[str] = None
+    published_date: Optional[datetime] = None
+    language: Optional[str] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+class ArticleSearchResult(ArticleListItem):
+    rank: float
+    snippet: Optional[str] = None
+
+class IngestJob(BaseModel):
+    id: str
+    filename: str
+    status: str
+    rows: int
+    inserted: int
+    updated: int
+    skipped: int
+    errors: List[str] = []
+    created_at: datetime
+    finished_at: Optional[datetime] = None
 
 class CommentBase(BaseModel):
     annotation_id: int
@@ -40,8 +68,7 @@ class Comment(CommentBase):
     username: str
     user_id: int
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 class AnnotationBase(BaseModel):
     article_id: int
@@ -52,8 +79,14 @@ class AnnotationBase(BaseModel):
     subcategory: str
     article_metadata: Optional[Dict[str, Any]] = None
 
+def check_span(annotation):
+    # Spans are [start_position, end_position) of the article text
+    if annotation.start_position > annotation.end_position:
+        raise ValueError("start_position is after end_position")
+    return annotation
+
 class AnnotationCreate(AnnotationBase):
-    pass
+    _check_span = model_validator(mode="after")(check_span)
 
 class Annotation(AnnotationBase):
     id: int
@@ -62,8 +95,48 @@ class Annotation(AnnotationBase):
     user_id: int
     username: str
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
+
+class ArticleWorkspace(BaseModel):
+    article: Article
+    annotations: List[Annotation]
+    # Last event of the article included, stream /events from here
+    event_seq: int = 0
+
+@lru_cache(maxsize=256)
+def partial_model(model: Type[BaseModel], fields: Tuple[str, ...]) -> Type[BaseModel]:
+    """
+    model restricted to fields, the shape of responses projected with fields=.
+    """
+    return create_model(
+        f"{model.__name__}Fields",
+        **{name: (model.model_fields[name].annotation, model.model_fields[name]) for name in fields}
+    )
+
+@lru_cache(maxsize=256)
+def workspace_model(article_fields: Tuple[str, ...], annotation_fields: Tuple[str, ...]) -> Type[BaseModel]:
+    return create_model(
+        "ArticleWorkspaceFields",
+        article=(partial_model(Article, article_fields), ...),
+        annotations=(List[partial_model(Annotation, annotation_fields)], ...),
+        event_seq=(int, 0),
+    )
+
+class AnnotationFeedItem(BaseModel):
+    id: int
+    article_id: int
+    article_title: Optional[str] = None
+    article_source: Optional[str] = None
+    article_link: Optional[str] = None
+    article_published_date: Optional[datetime] = None
+    highlighted_text: Optional[str] = None
+    start_position: int
+    end_position: int
+    category: Optional[str] = None
+    subcategory: Optional[str] = None
+    timestamp: datetime
+    user_id: int
+    username: str
 
 class AnnotationUpdate(BaseModel):
     highlighted_text: Optional[str] = None
@@ -74,8 +147,33 @@ class AnnotationUpdate(BaseModel):
     timestamp: Optional[datetime] = None
     user: Optional[str] = None
 
-    class Config:
-        orm_mode = True
+    _check_span = model_validator(mode="after")(check_span)
+
+    model_config = ConfigDict(from_attributes=True)
+
+class AnnotationBatchUpdate(BaseModel):
+    id: int
+    category: Optional[str] = None
+    subcategory: Optional[str] = None
+    timestamp: Optional[datetime] = None
+
+class AnnotationBatch(BaseModel):
+    clear_articles: List[int] = []
+    delete: List[int] = []
+    update: List[AnnotationBatchUpdate] = []
+    create: List[AnnotationCreate] = []
+
+class BatchError(BaseModel):
+    op: str
+    index: int
+    detail: str
+
+class AnnotationBatchResult(BaseModel):
+    cleared: int = 0
+    deleted: List[int] = []
+    updated: List[int] = []
+    created: List[Optional[int]] = []
+    errors: List[BatchError] = []
 
 class UserBase(BaseModel):
     username: str
@@ -87,12 +185,36 @@ class User(UserBase):
     id: int
     role: Optional[str] = None
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 class Token(BaseModel):
     access_token: str
     token_type: str
 
+class StreamToken(BaseModel):
+    token: str
+    expires_in: int
+
 class TokenData(BaseModel):
     username: Optional[str] = None
+
+class AnalyticsCount(BaseModel):
+    source: Optional[str] = None
+    category: Optional[str] = None
+    subcategory: Optional[str] = None
+    week: Optional[date] = None
+    annotations: int
+
+class AgreementStats(BaseModel):
+    article_id: Optional[int] = None
+    source: Optional[str] = None
+    label: Optional[str] = None
+    annotator_a: Optional[str] = None
+    annotator_b: Optional[str] = None
+    articles: int
+    # Pairs of annotators of an article
+    pairs: int
+    cohen_kappa: Optional[float] = None
+    fleiss_kappa: Optional[float] = None
+    char_f1: Optional[float] = None
+    span_f1: Optional[float] = None
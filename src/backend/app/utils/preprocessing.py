@@ -3,21 +3,35 @@ import argparse
 
 # Set up argument parser
 parser = argparse.ArgumentParser(description='Process some CSV file.')
-parser.add_argument('filename', type=str, help='The path to the CSV file')
+parser.add_argument('filename', type=str, help='The path to the JSON or JSONL (optionally .gz) file')
+parser.add_argument('--chunksize', type=int, default=1000, help='Rows per chunk when streaming a JSONL file')
 
 # Parse the arguments
 args = parser.parse_args()
 
-# Read the CSV file
-df = pd.read_json(args.filename)
 
-df["source"] = "lecourrier.ch"
-df["html"] = None
-df["membership"] = None
-df["language"] = "fr"
-df["published_date"] = df["date"]
-df["modified_date"] = df["date"]
-df.drop(columns=["date"], inplace=True)
+def process(df):
+    df["source"] = "lecourrier.ch"
+    df["html"] = None
+    df["membership"] = None
+    df["language"] = "fr"
+    df["published_date"] = df["date"]
+    df["modified_date"] = df["date"]
+    df.drop(columns=["date"], inplace=True)
+    return df
 
-df.to_csv(f"{args.filename.replace('.json', '')}_processed.csv", index=False)
+
+# JSONL files are streamed chunk by chunk, plain JSON is read at once
+base_name = args.filename
+for extension in ('.gz', '.jsonl', '.json'):
+    base_name = base_name.removesuffix(extension)
+output_path = f"{base_name}_processed.csv"
+
+if '.jsonl' in args.filename:
+    chunks = pd.read_json(args.filename, lines=True, chunksize=args.chunksize, compression='infer')
+else:
+    chunks = [pd.read_json(args.filename)]
+
+for i, df in enumerate(chunks):
+    process(df).to_csv(output_path, index=False, mode='w' if i == 0 else 'a', header=i == 0)
 print(True)
@@ -0,0 +1,309 @@
+"""
+Query plan regression benchmark.
+
+Seeds a synthetic corpus into a scratch database, then runs EXPLAIN ANALYZE
+on the queries issued by the routers. A query fails when it does not use
+its expected index, scans a large table sequentially or exceeds its
+latency budget. Run it before deploying schema or query changes, from
+src/backend with the backend's environment (.env):
+
+    python -m benchmarks.query_plans --database mediawatch_bench
+    python -m benchmarks.query_plans --no-seed    # reuse the seeded corpus
+
+The scratch database is created on the POSTGRES_* server if needed and its
+public schema is reset. Exits with status 1 if a query fails.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from sqlalchemy import create_engine, text
+
+INIT_SQL = Path(__file__).resolve().parents[2] / "db" / "init.sql"
+
+# Tables whose sequential scan is a regression at any size
+LARGE_TABLES = {"articles", "annotations", "comments", "html_blobs"}
+
+WORDS = [
+    "gouvernement", "conseil", "fédéral", "votation", "initiative", "canton", "Genève",
+    "Lausanne", "Berne", "parlement", "réforme", "budget", "santé", "climat", "énergie",
+    "migration", "frontière", "économie", "banque", "salaire", "retraite", "école",
+    "université", "recherche", "hôpital", "police", "justice", "tribunal", "élection",
+    "parti", "socialiste", "libéral", "écologiste", "manifestation", "grève", "syndicat",
+    "entreprise", "marché", "prix", "logement", "transport", "train", "route", "guerre",
+    "paix", "négociation", "accord", "Europe", "neutralité", "armée", "sécurité",
+    "culture", "festival", "sport", "football", "hockey", "montagne", "lac", "ville",
+]
+SOURCES = ["rts.ch", "letemps.ch", "lecourrier.ch", "lematin.ch", "20min.ch", "lemonde.fr"]
+CATEGORIES = ["Framing", "Omission", "Euphemisms", "Loaded Language", "Passive Voice", "False Balance"]
+
+
+def reset_database(args):
+    server = (
+        f"postgresql://{os.getenv('POSTGRES_USER')}:{os.getenv('POSTGRES_PASSWORD')}"
+        f"@{os.getenv('POSTGRES_HOST', 'db')}:{os.getenv('POSTGRES_PORT', '5432')}"
+    )
+    admin = create_engine(f"{server}/postgres", isolation_level="AUTOCOMMIT")
+    with admin.connect() as connection:
+        exists = connection.execute(
+            text("SELECT 1 FROM pg_database WHERE datname = :name"), {"name": args.database}
+        ).scalar()
+        if not exists:
+            connection.exec_driver_sql(f'CREATE DATABASE "{args.database}"')
+    admin.dispose()
+
+
+def create_schema(engine):
+    from app import models
+    from app.migrate import run_migrations
+
+    with engine.begin() as connection:
+        connection.exec_driver_sql("DROP SCHEMA public CASCADE; CREATE SCHEMA public;")
+        connection.exec_driver_sql(INIT_SQL.read_text())
+    models.Base.metadata.create_all(engine)
+    run_migrations(engine)
+
+
+def seed(engine, articles: int, users: int, annotations: int, comments: int):
+    words = "ARRAY[" + ", ".join(f"'{word}'" for word in WORDS) + "]"
+    sources = "ARRAY[" + ", ".join(f"'{source}'" for source in SOURCES) + "]"
+    categories = "ARRAY[" + ", ".join(f"'{category}'" for category in CATEGORIES) + "]"
+
+    def sentence(length: str) -> str:
+        # Correlated on i, so that every row gets its own words
+        return (
+            f"(SELECT string_agg(({words})[1 + floor(random() * {len(WORDS)})::int], ' ') "
+            f"FROM generate_series(1, {length}) AS w(n) WHERE i > 0)"
+        )
+
+    with engine.begin() as connection:
+        connection.execute(text("SELECT setseed(0.42)"))
+        connection.execute(text(
+            "INSERT INTO users (username, hashed_password, role) "
+            "SELECT 'user' || i, 'x', 'user' FROM generate_series(1, :users) AS i"
+        ), {"users": users})
+        connection.execute(text(f"""
+            INSERT INTO articles (source, link, author, title, topic, abstract, text,
+                                  published_date, modified_date, modified_at, language)
+            SELECT ({sources})[1 + i % {len(SOURCES)}],
+                   'https://bench.example/' || i,
+                   'Auteur ' || (i % 500),
+                   {sentence('8')},
+                   ({words})[1 + i % {len(WORDS)}],
+                   {sentence('30')},
+                   {sentence('200 + i % 300')},
+                   published,
+                   published,
+                   published + interval '1 hour' * (i % 48),
+                   'fr'
+            FROM (
+                SELECT i, CASE WHEN i % 50 = 0 THEN NULL
+                               ELSE now() - interval '1 minute' * floor(random() * 2000 * 24 * 60) END AS published
+                FROM generate_series(1, :articles) AS i
+            ) AS generated
+        """), {"articles": articles})
+        connection.execute(text(f"""
+            INSERT INTO annotations (article_id, highlighted_text, start_position, end_position,
+                                     category, subcategory, timestamp, user_id, username)
+            SELECT 1 + floor(random() * :articles)::int,
+                   {sentence('3')},
+                   i % 1000,
+                   i % 1000 + 20,
+                   ({categories})[1 + i % {len(CATEGORIES)}],
+                   NULL,
+                   now() - interval '1 minute' * floor(random() * 365 * 24 * 60),
+                   1 + i % :users,
+                   'user' || (1 + i % :users)
+            FROM generate_series(1, :annotations) AS i
+        """), {"articles": articles, "users": users, "annotations": annotations})
+        connection.execute(text(f"""
+            INSERT INTO comments (annotation_id, user_id, username, comment_text, timestamp)
+            SELECT 1 + floor(random() * :annotations)::int,
+                   1 + i % :users,
+                   'user' || (1 + i % :users),
+                   {sentence('12')},
+                   now() - interval '1 minute' * floor(random() * 365 * 24 * 60)
+            FROM generate_series(1, :comments) AS i
+        """), {"annotations": annotations, "users": users, "comments": comments})
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        connection.exec_driver_sql("VACUUM ANALYZE")
+
+
+def build_cases(engine):
+    """
+    (name, statement, expected indexes, latency budget in ms) for the
+    queries of the routers, with parameters picked from the seeded data.
+    """
+    from sqlalchemy import and_, func, or_, select
+    from app import models, schemas
+    from app.routers.annotations import FEED_COLUMNS
+    from app.routers.articles import HEADLINE_OPTIONS, filter_articles, search_filter
+    from app.routers.export import ANNOTATION_COLUMNS, ARTICLE_COLUMNS, filter_by_article
+
+    Article, Annotation, Comment, User = models.Article, models.Annotation, models.Comment, models.User
+    Rollup = models.AnnotationRollup
+    with engine.connect() as connection:
+        article_id = connection.execute(
+            select(Annotation.article_id).group_by(Annotation.article_id)
+            .order_by(func.count().desc()).limit(1)
+        ).scalar()
+        annotation_ids = connection.execute(
+            select(Annotation.id).where(Annotation.article_id == article_id)
+        ).scalars().all()
+        user_id, username = connection.execute(select(User.id, User.username).limit(1)).one()
+        middle = connection.execute(
+            select(Article.published_date, Article.id)
+            .order_by(Article.published_date.desc().nulls_last(), Article.id.desc())
+            .offset(1000).limit(1)
+        ).one()
+        latest_change = connection.execute(select(func.max(Article.modified_at))).scalar()
+        latest_annotation = connection.execute(select(func.max(Annotation.timestamp))).scalar()
+
+    list_columns = [getattr(Article, name) for name in schemas.ArticleListItem.__fields__]
+    newest_first = (Article.published_date.desc().nulls_last(), Article.id.desc())
+
+    tsquery = func.websearch_to_tsquery("french", "gouvernement réforme")
+    rank = (
+        func.ts_rank_cd(Article.search_vector, tsquery, 32) +
+        func.similarity(func.coalesce(Article.title, ""), "gouvernement réforme")
+    ).label("rank")
+    ranked = select(Article.id, rank).filter(search_filter("gouvernement réforme"))
+    ranked = ranked.order_by(rank.desc(), Article.id.desc()).limit(20).subquery()
+    search = select(
+        *list_columns, ranked.c.rank,
+        func.ts_headline("french", func.coalesce(Article.text, ""), tsquery, HEADLINE_OPTIONS).label("snippet"),
+    ).join(ranked, ranked.c.id == Article.id).order_by(ranked.c.rank.desc(), Article.id.desc())
+
+    return [
+        ("articles: first page",
+         select(*list_columns).order_by(*newest_first).limit(51),
+         {"idx_articles_published_date_id"}, 10),
+        ("articles: next page",
+         select(*list_columns).filter(or_(
+             Article.published_date < middle.published_date,
+             and_(Article.published_date == middle.published_date, Article.id < middle.id),
+             Article.published_date.is_(None),
+         )).order_by(*newest_first).limit(51),
+         {"idx_articles_published_date_id"}, 10),
+        ("articles: source and date filter",
+         filter_articles(select(*list_columns), datetime.now() - timedelta(days=30), None, "temps")
+         .order_by(*newest_first).limit(51),
+         set(), 30),
+        ("articles: search",
+         search, {"idx_articles_search_vector"}, 300),
+        ("articles: by id",
+         select(Article).where(Article.id == article_id),
+         {"articles_pkey"}, 5),
+        ("annotations: by article",
+         select(Annotation).where(Annotation.article_id == article_id).order_by(Annotation.timestamp.asc()),
+         {"idx_annotations_article_id_timestamp"}, 5),
+        ("comments: of annotations",
+         select(Comment).where(Comment.annotation_id.in_(annotation_ids)),
+         {"idx_comments_annotation_id"}, 5),
+        ("annotations: feed of a user",
+         select(*FEED_COLUMNS).join(Article, Article.id == Annotation.article_id)
+         .where(Annotation.user_id == select(User.id).where(User.username == username).scalar_subquery())
+         .order_by(Annotation.timestamp.desc(), Annotation.id.desc()).limit(50),
+         {"idx_annotations_user_id_timestamp_id"}, 10),
+        ("annotations: of a user on an article",
+         select(Annotation).where(Annotation.article_id == article_id, Annotation.user_id == user_id),
+         {"idx_annotations_article_id_timestamp"}, 5),
+        ("users: by username",
+         select(User).where(User.username == username),
+         set(), 5),
+        ("analytics: counts per source and week",
+         select(Rollup.source, Rollup.week, func.sum(Rollup.annotations))
+         .where(Rollup.category == CATEGORIES[0]).group_by(Rollup.source, Rollup.week),
+         set(), 20),
+        ("export: articles since",
+         select(*ARTICLE_COLUMNS).where(Article.modified_at >= latest_change - timedelta(hours=6))
+         .order_by(Article.id),
+         {"idx_articles_modified_at"}, 50),
+        ("export: annotations since",
+         filter_by_article(
+             select(*ANNOTATION_COLUMNS).join(Article, Article.id == Annotation.article_id), "temps", None, None
+         ).where(Annotation.timestamp >= latest_annotation - timedelta(hours=6)).order_by(Annotation.id),
+         {"idx_annotations_timestamp"}, 20),
+    ]
+
+
+def walk(node):
+    yield node
+    for child in node.get("Plans", []):
+        yield from walk(child)
+
+
+def explain(engine, statement, repeat: int):
+    compiled = statement.compile(dialect=engine.dialect, compile_kwargs={"render_postcompile": True})
+    timings = []
+    with engine.connect() as connection:
+        for _ in range(repeat):
+            result = connection.exec_driver_sql(
+                "EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + str(compiled), compiled.params
+            ).scalar()
+            plan = (result if isinstance(result, list) else json.loads(result))[0]
+            timings.append(plan["Planning Time"] + plan["Execution Time"])
+        connection.rollback()
+    return plan["Plan"], statistics.median(timings)
+
+
+def check(engine, cases, repeat: int, budget_factor: float) -> bool:
+    ok = True
+    for name, statement, expected, budget in cases:
+        plan, elapsed = explain(engine, statement, repeat)
+        nodes = list(walk(plan))
+        used = {node["Index Name"] for node in nodes if "Index Name" in node}
+        seq_scans = {
+            node["Relation Name"] for node in nodes
+            if node["Node Type"] == "Seq Scan" and node.get("Relation Name") in LARGE_TABLES
+        }
+        problems = []
+        if expected - used:
+            problems.append(f"missing index {', '.join(sorted(expected - used))}")
+        if seq_scans:
+            problems.append(f"seq scan on {', '.join(sorted(seq_scans))}")
+        if elapsed > budget * budget_factor:
+            problems.append(f"over budget ({budget * budget_factor:g} ms)")
+        ok = ok and not problems
+        print(f"{'FAIL' if problems else 'ok':4} {name:40} {elapsed:8.2f} ms  "
+              f"{', '.join(sorted(used)) or '-'}" + (f"  <- {'; '.join(problems)}" if problems else ""))
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Seed a scratch database and check the query plans of the routers.")
+    parser.add_argument("--database", default="mediawatch_bench", help="Scratch database, its schema is reset")
+    parser.add_argument("--articles", type=int, default=20000)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--annotations", type=int, default=100000)
+    parser.add_argument("--comments", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per query, the median is reported")
+    parser.add_argument("--budget-factor", type=float, default=1.0, help="Scale every latency budget")
+    parser.add_argument("--no-seed", action="store_true", help="Reuse the corpus of a previous run")
+    args = parser.parse_args()
+
+    if args.database == os.getenv("POSTGRES_DB"):
+        sys.exit(f"Refusing to reset the application database {args.database!r}, use a scratch database")
+
+    if not args.no_seed:
+        reset_database(args)
+    # app.database builds its engines from the environment on import
+    os.environ["POSTGRES_DB"] = args.database
+    from app.database import engine
+
+    if not args.no_seed:
+        print(f"Seeding {args.articles} articles, {args.annotations} annotations, {args.comments} comments")
+        create_schema(engine)
+        seed(engine, args.articles, args.users, args.annotations, args.comments)
+
+    ok = check(engine, build_cases(engine), args.repeat, args.budget_factor)
+    engine.dispose()
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+from app.agreement import AgreementCache
+
+
+def stats(article_id):
+    return ({"article": article_id}, {})
+
+
+def test_cache_hits_current_versions_only():
+    cache = AgreementCache(max_entries=10)
+    cache.set("category", {1: (5, 100), 2: (7, 100)}, {1: stats(1), 2: stats(2)})
+
+    found, missing = cache.get("category", {1: (5, 100), 2: (8, 100), 3: (1, 10)})
+    assert found == {1: stats(1)}
+    assert missing == [2, 3]
+    assert cache.get("subcategory", {1: (5, 100)}) == ({}, [1])
+
+
+def test_cache_evicts_least_recently_used():
+    cache = AgreementCache(max_entries=3)
+    cache.set("category", {1: 1, 2: 1, 3: 1}, {1: stats(1), 2: stats(2), 3: stats(3)})
+    # A hit makes 1 the most recently used entry
+    cache.get("category", {1: 1})
+    cache.set("category", {4: 1}, {4: stats(4)})
+
+    found, missing = cache.get("category", {1: 1, 2: 1, 3: 1, 4: 1})
+    assert sorted(found) == [1, 3, 4]
+    assert missing == [2]
+    assert len(cache._entries) == 3
+
+    # A single batch larger than the cache keeps its most recent entries
+    cache.set("subcategory", {id: 1 for id in range(10, 20)}, {id: stats(id) for id in range(10, 20)})
+    found, missing = cache.get("subcategory", {id: 1 for id in range(10, 20)})
+    assert sorted(found) == [17, 18, 19]
+
+
+# (article_id, user_id, start_position, end_position, label), articles of 10 characters:
+# 1 perfect agreement, 2 complete disagreement, 3 partial overlap, 4 a label
+# used by one annotator only, 5 a single annotator
+ROWS = [
+    (1, 1, 0, 5, "x"), (1, 2, 0, 5, "x"),
+    (2, 1, 0, 5, "x"), (2, 2, 5, 10, "x"),
+    (3, 1, 0, 2, "x"), (3, 1, 4, 6, "x"), (3, 2, 5, 10, "x"),
+    (4, 1, 0, 5, "x"), (4, 1, 0, 5, "y"), (4, 2, 0, 5, "x"),
+    (5, 1, 0, 5, "x"),
+]
+SOURCES = {1: "a", 2: "a", 3: "b", 4: "b", 5: "b"}
+
+
+def tables(label=None):
+    from app.agreement import stats_by_article
+    from app.routers.analytics import agreement_tables
+
+    found = stats_by_article(ROWS, {article_id: 10 for article_id in SOURCES})
+    return agreement_tables(found, SOURCES, sorted(SOURCES), label)
+
+
+def metrics(results):
+    return {
+        tuple(result[name] for name in ("article", "label", "source") if name in result): {
+            name: result.get(name) for name in ("cohen_kappa", "fleiss_kappa", "char_f1", "span_f1")
+        }
+        for result in results
+    }
+
+
+def test_metrics_by_article_and_label():
+    from app.agreement import aggregate
+
+    assert metrics(aggregate(*tables(), by=["article", "label"])) == {
+        # 5 characters marked by both, 5 by none
+        (1, "x"): {"cohen_kappa": 1.0, "fleiss_kappa": 1.0, "char_f1": 1.0, "span_f1": 1.0},
+        # Each marks the characters the other doesn't: no span matches
+        (2, "x"): {"cohen_kappa": -1.0, "fleiss_kappa": -1.0, "char_f1": 0.0, "span_f1": None},
+        # n11 = 1, n10 = 3, n01 = 4, n00 = 2; one of the 2 spans of user 1 matches
+        (3, "x"): {"cohen_kappa": -0.4, "fleiss_kappa": -0.4141, "char_f1": 0.2222, "span_f1": 0.6667},
+        (4, "x"): {"cohen_kappa": 1.0, "fleiss_kappa": 1.0, "char_f1": 1.0, "span_f1": 1.0},
+        # Only user 1 marks y: observed and expected agreement are both 0.5
+        (4, "y"): {"cohen_kappa": 0.0, "fleiss_kappa": -0.3333, "char_f1": 0.0, "span_f1": None},
+    }
+
+
+def test_metrics_pool_articles_by_source():
+    from app.agreement import aggregate
+
+    results = aggregate(*tables(), by=["source"])
+    assert [(result["source"], result["articles"], result["pairs"]) for result in results] == [("a", 2, 2), ("b", 2, 2)]
+    # Articles 1 and 2 together: n11 = n10 = n01 = n00 = 5
+    assert metrics(results)[("a",)] == {"cohen_kappa": 0.0, "fleiss_kappa": 0.0, "char_f1": 0.5, "span_f1": 0.5}
+
+
+def test_metrics_of_one_label_and_by_annotators():
+    from app.agreement import aggregate
+
+    [result] = aggregate(*tables(label="y"), by=["label"])
+    assert (result["articles"], result["cohen_kappa"], result["fleiss_kappa"]) == (1, 0.0, -0.3333)
+
+    [result] = aggregate(*tables(), by=["user_a", "user_b"])
+    assert (result["user_a"], result["user_b"], result["articles"]) == (1, 2, 4)
+    # Fleiss' kappa is not defined per pair of annotators
+    assert "fleiss_kappa" not in result
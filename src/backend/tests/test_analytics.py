@@ -0,0 +1,40 @@
+from sqlalchemy import text
+
+from conftest import requires_db
+
+pytestmark = requires_db
+
+ROLLUPS = "SELECT source, category, subcategory, week, annotations FROM annotation_rollups WHERE annotations <> 0"
+COUNTS = """
+SELECT a.source, coalesce(n.category, ''), coalesce(n.subcategory, ''),
+       rollup_week(a.published_date, a.created_at), count(*)
+FROM annotations n JOIN articles a ON a.id = n.article_id
+GROUP BY 1, 2, 3, 4
+"""
+
+
+def test_rollups_follow_articles_deleted_with_their_annotations(client, headers, make_article):
+    from app.database import engine
+
+    article = make_article(source="https://rollups.ch", published_date="2024-03-01T10:00:00")
+    client.post("/annotations/batch", headers=headers, json={"create": [
+        {"article_id": article["id"], "highlighted_text": "test", "start_position": 10, "end_position": 14,
+         "category": category, "subcategory": "tone"}
+        for category in ("framing", "framing", "bias")
+    ]})
+
+    with engine.connect() as connection:
+        transaction = connection.begin()
+        try:
+            assert sorted(connection.execute(text(ROLLUPS)).all()) == sorted(connection.execute(text(COUNTS)).all())
+            # As a schema deleting annotations with their article would
+            connection.execute(text(
+                "ALTER TABLE annotations DROP CONSTRAINT annotations_article_id_fkey, "
+                "ADD CONSTRAINT annotations_article_id_fkey FOREIGN KEY (article_id) "
+                "REFERENCES articles (id) ON DELETE CASCADE"
+            ))
+            connection.execute(text("DELETE FROM articles WHERE id = :id"), {"id": article["id"]})
+            assert connection.scalar(text("SELECT count(*) FROM annotations WHERE article_id = :id"), {"id": article["id"]}) == 0
+            assert sorted(connection.execute(text(ROLLUPS)).all()) == sorted(connection.execute(text(COUNTS)).all())
+        finally:
+            transaction.rollback()
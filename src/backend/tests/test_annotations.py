@@ -0,0 +1,97 @@
+from conftest import requires_db
+
+pytestmark = requires_db
+
+
+def annotation(article_id, **values):
+    return {
+        "article_id": article_id,
+        "highlighted_text": "presse",
+        "start_position": 29,
+        "end_position": 35,
+        "category": "framing",
+        "subcategory": "tone",
+        **values,
+    }
+
+
+def test_batch(client, headers, make_article):
+    article = make_article()
+    response = client.post("/annotations/batch", headers=headers, json={
+        "create": [annotation(article["id"]), annotation(article["id"]), annotation(-1)],
+    })
+    assert response.status_code == 200, response.text
+    result = response.json()
+    first, second, missing = result["created"]
+    assert missing is None
+    assert result["errors"] == [{"op": "create", "index": 2, "detail": "Article not found"}]
+
+    response = client.post("/annotations/batch", headers=headers, json={
+        "delete": [second],
+        "update": [{"id": first, "category": "bias"}],
+    })
+    assert response.status_code == 200, response.text
+    assert response.json()["deleted"] == [second]
+    assert response.json()["updated"] == [first]
+
+    [saved] = client.get(f"/annotations/article/{article['id']}", headers=headers).json()
+    assert (saved["id"], saved["category"], saved["subcategory"]) == (first, "bias", "tone")
+
+
+def test_batch_update_without_timestamps(client, headers, make_article):
+    article = make_article()
+    created = client.post("/annotations/batch", headers=headers, json={
+        "create": [annotation(article["id"]), annotation(article["id"])],
+    }).json()["created"]
+
+    # No update carries a timestamp or a subcategory: their VALUES columns are all NULL
+    response = client.post("/annotations/batch", headers=headers, json={
+        "update": [{"id": annotation_id, "category": "bias"} for annotation_id in created],
+    })
+    assert response.status_code == 200, response.text
+    assert sorted(response.json()["updated"]) == sorted(created)
+
+    response = client.post("/annotations/batch", headers=headers, json={
+        "update": [{"id": created[0], "timestamp": "2024-03-01T10:00:00+00:00"}],
+    })
+    assert response.status_code == 200, response.text
+
+    saved = {item["id"]: item for item in client.get(f"/annotations/article/{article['id']}", headers=headers).json()}
+    assert {item["category"] for item in saved.values()} == {"bias"}
+    assert saved[created[0]]["timestamp"].startswith("2024-03-01T10:00:00")
+
+
+def test_batch_is_limited_to_own_annotations(client, headers, make_user, make_article):
+    article = make_article()
+    [annotation_id] = client.post("/annotations/batch", headers=headers, json={
+        "create": [annotation(article["id"])],
+    }).json()["created"]
+
+    _, other = make_user("other")
+    response = client.post("/annotations/batch", headers=other, json={
+        "update": [{"id": annotation_id, "category": "bias"}],
+        "delete": [annotation_id],
+    })
+    assert response.status_code == 200, response.text
+    assert response.json()["updated"] == response.json()["deleted"] == []
+    assert len(response.json()["errors"]) == 2
+
+
+def test_spans_end_after_they_start(client, headers, make_article):
+    article = make_article()
+    reversed_span = annotation(article["id"], start_position=35, end_position=29)
+
+    for response in (
+        client.post("/annotations/", headers=headers, json=reversed_span),
+        client.post("/annotations/batch", headers=headers, json={"create": [annotation(article["id"]), reversed_span]}),
+    ):
+        assert response.status_code == 422
+        assert "start_position is after end_position" in response.text
+    assert client.get(f"/annotations/article/{article['id']}", headers=headers).json() == []
+
+    response = client.post("/annotations/", headers=headers, json=annotation(article["id"]))
+    assert response.status_code == 200, response.text
+    response = client.put(f"/annotations/{response.json()['id']}", headers=headers, json={
+        "start_position": 35, "end_position": 29, "category": "bias",
+    })
+    assert response.status_code == 422
@@ -0,0 +1,99 @@
+import uuid
+
+from conftest import requires_db
+
+pytestmark = requires_db
+
+
+def test_date_filters_are_datetimes(client, headers, make_article):
+    source = f"https://dates-{uuid.uuid4().hex[:8]}.ch"
+    make_article(source=source, published_date="2024-03-01T10:00:00")
+    make_article(source=source, published_date="2024-03-05T10:00:00")
+
+    for path in ("/articles/", "/articles/search"):
+        params = {"source": source, "start_date": "2024-03-02", "end_date": "2024-03-31T00:00:00+01:00"}
+        if path == "/articles/search":
+            params["q"] = "presse"
+        response = client.get(path, params=params, headers=headers)
+        assert response.status_code == 200, response.text
+        assert [article["published_date"] for article in response.json()] == ["2024-03-05T10:00:00"]
+
+
+def test_invalid_dates_are_rejected(client, headers):
+    for path in ("/articles/", "/articles/search?q=presse"):
+        response = client.get(path, params={"start_date": "not-a-date"}, headers=headers)
+        assert response.status_code == 422
+
+
+def test_cached_responses_follow_their_model(client, headers, make_article):
+    source = f"https://model-{uuid.uuid4().hex[:8]}.ch"
+    article = make_article(source=source, published_date="2024-03-01T10:00:00")
+
+    for _ in range(2):  # computed, then served from the cache
+        [item] = client.get("/articles/", params={"source": source}, headers=headers).json()
+        assert set(item) == {"id", "source", "link", "author", "title", "topic", "published_date", "language"}
+        [item] = client.get("/articles/", params={"source": source, "fields": "title"}, headers=headers).json()
+        assert item == {"title": article["title"], "published_date": "2024-03-01T10:00:00", "id": article["id"]}
+
+    workspace = client.get(
+        f"/articles/{article['id']}/workspace",
+        params={"fields": "title", "comments": False},
+        headers=headers,
+    ).json()
+    assert workspace == {"article": {"title": article["title"], "id": article["id"]}, "annotations": [], "event_seq": 0}
+
+
+def test_workspace_query_count(client, headers, make_article):
+    from sqlalchemy import event
+    from app.database import async_engine
+
+    article = make_article()
+    annotations = [
+        {"article_id": article["id"], "highlighted_text": "test", "start_position": 10, "end_position": 14,
+         "category": "framing", "subcategory": "tone"}
+    ] * 5
+    created = client.post("/annotations/batch", json={"create": annotations}, headers=headers).json()["created"]
+    for annotation_id in created:
+        client.post("/annotations/comments/", json={"annotation_id": annotation_id, "comment_text": "ok"}, headers=headers)
+
+    statements = []
+
+    def record(connection, cursor, statement, parameters, context, executemany):
+        if "FROM users" not in statement:
+            statements.append(statement)
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", record)
+    try:
+        for comments, expected in ((True, 4), (False, 3)):
+            statements.clear()
+            workspace = client.get(
+                f"/articles/{article['id']}/workspace", params={"comments": comments}, headers=headers
+            ).json()
+            assert len(workspace["annotations"]) == 5
+            assert len(statements) == expected, statements
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", record)
+    assert all(len(annotation["comments"]) == 1 for annotation in client.get(
+        f"/articles/{article['id']}/workspace", headers=headers
+    ).json()["annotations"])
+
+
+def test_cache_follows_writes_made_elsewhere(client, headers):
+    import time
+    from sqlalchemy import text
+    from app.database import engine
+
+    source = f"https://elsewhere-{uuid.uuid4().hex[:8]}.ch"
+    assert client.get("/articles/", params={"source": source}, headers=headers).json() == []
+
+    # As the scraper's bulk upsert or another worker would, bypassing this worker's invalidate()
+    with engine.begin() as connection:
+        connection.execute(text(
+            "INSERT INTO articles (source, link, author, title) VALUES (:source, :link, 'Anne', 'Ailleurs')"
+        ), {"source": source, "link": f"{source}/1"})
+    for _ in range(50):
+        articles = client.get("/articles/", params={"source": source}, headers=headers).json()
+        if articles:
+            break
+        time.sleep(0.1)
+    assert [article["title"] for article in articles] == ["Ailleurs"]
@@ -0,0 +1,23 @@
+import time
+
+from sqlalchemy import text
+
+from conftest import requires_db
+
+pytestmark = requires_db
+
+
+def test_out_of_band_changes_apply_within_the_ttl(client, make_user, monkeypatch):
+    from app.database import engine
+    from app.routers import auth
+
+    monkeypatch.setattr(auth, "USER_CACHE_TTL", 0.5)
+    username, headers = make_user("revoked")
+    assert client.get("/articles/", params={"limit": 1}, headers=headers).status_code == 200
+
+    # Deleted behind the ORM's back: the cached user is served until it expires
+    with engine.begin() as connection:
+        connection.execute(text("DELETE FROM users WHERE username = :username"), {"username": username})
+    assert client.get("/articles/", params={"limit": 1}, headers=headers).status_code == 200
+    time.sleep(0.6)
+    assert client.get("/articles/", params={"limit": 1}, headers=headers).status_code == 401
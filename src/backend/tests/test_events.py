@@ -0,0 +1,66 @@
+import logging
+
+from conftest import requires_db
+
+from app.routers.events import RedactTokens
+
+
+def test_access_log_redacts_tokens():
+    record = logging.LogRecord(
+        "uvicorn.access", logging.INFO, __file__, 0, '%s - "%s %s HTTP/%s" %d',
+        ("127.0.0.1:5000", "GET", "/events/articles/1?since=3&token=eyJhbGci.payload.sig", "1.1", 200), None,
+    )
+    assert RedactTokens().filter(record)
+    assert record.getMessage() == '127.0.0.1:5000 - "GET /events/articles/1?since=3&token=[redacted] HTTP/1.1" 200'
+
+
+@requires_db
+def test_streams_take_article_scoped_tokens(client, headers, make_article):
+    article = make_article()
+    other = make_article()
+    response = client.post(f"/events/articles/{article['id']}/token", headers=headers)
+    assert response.status_code == 200
+    token = response.json()["token"]
+
+    session_token = headers["Authorization"].split()[1]
+    # Session tokens are refused in URLs, stream tokens anywhere else than their article's streams
+    assert client.get(f"/events/articles/{article['id']}", params={"token": session_token}).status_code == 401
+    assert client.get(f"/events/articles/{other['id']}", params={"token": token}).status_code == 401
+    assert client.get("/articles/", headers={"Authorization": f"Bearer {token}"}).status_code == 401
+
+    annotation = {
+        "article_id": article["id"], "highlighted_text": "test", "start_position": 10, "end_position": 14,
+        "category": "framing", "subcategory": "tone",
+    }
+    client.post("/annotations/batch", headers=headers, json={"create": [annotation]})
+    since = client.get(f"/articles/{article['id']}/workspace", headers=headers).json()["event_seq"]
+
+    with client.websocket_connect(f"/events/articles/{article['id']}/ws?token={token}&since={since}") as websocket:
+        client.post("/annotations/batch", headers=headers, json={"create": [dict(annotation, category="bias")]})
+        event = websocket.receive_json()
+    assert event["seq"] > since
+    assert (event["kind"], event["op"], event["data"]["category"]) == ("annotation", "create", "bias")
+
+
+@requires_db
+def test_resets_follow_pruning(client, headers, make_article):
+    from app import events
+
+    annotation = {
+        "article_id": None, "highlighted_text": "test", "start_position": 10, "end_position": 14,
+        "category": "framing", "subcategory": "tone",
+    }
+    pruned, kept = make_article(), make_article()
+    for article in (pruned, kept):
+        client.post("/annotations/batch", headers=headers, json={"create": [dict(annotation, article_id=article["id"])]})
+    client.post("/annotations/batch", headers=headers, json={"create": [dict(annotation, article_id=pruned["id"])]})
+    first, last = [event["seq"] for event in client.portal.call(events.read_events, pruned["id"], 0)]
+
+    # An article's first events are not a sign of pruning
+    assert not client.portal.call(events.events_pruned_after, pruned["id"], 0)
+    assert client.portal.call(events.prune_events, -1) >= 1
+    assert client.portal.call(events.events_pruned_after, pruned["id"], 0)
+    assert not client.portal.call(events.events_pruned_after, pruned["id"], first)
+    assert [event["seq"] for event in client.portal.call(events.read_events, pruned["id"], 0)] == [last]
+    # The newest event of each article is kept
+    assert not client.portal.call(events.events_pruned_after, kept["id"], 0)
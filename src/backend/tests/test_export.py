@@ -0,0 +1,30 @@
+import gzip
+import json
+import uuid
+
+from conftest import requires_db
+
+pytestmark = requires_db
+
+
+def test_export_articles(client, headers, make_article):
+    source = f"https://export-{uuid.uuid4().hex[:8]}.ch"
+    make_article(source=source, published_date="2024-03-01T10:00:00", html="<p>page</p>")
+    make_article(source=source, published_date="2024-03-05T10:00:00")
+
+    response = client.get("/export/articles", params={
+        "source": source, "start_date": "2024-03-02T00:00:00+01:00", "gzip": True,
+    }, headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/gzip"
+    lines = gzip.decompress(response.content).decode("utf-8").splitlines()
+    [article] = [json.loads(line) for line in lines]
+    assert article["published_date"] == "2024-03-05T10:00:00"
+    assert "html" not in article and "search_vector" not in article
+
+
+def test_invalid_dates_are_rejected_before_streaming(client, headers):
+    for path in ("/export/articles", "/export/annotations", "/export/comments"):
+        for name in ("start_date", "end_date", "since"):
+            response = client.get(path, params={name: "2024-13-45"}, headers=headers)
+            assert response.status_code == 422, (path, name)
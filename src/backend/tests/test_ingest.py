@@ -0,0 +1,90 @@
+import csv
+import io
+import uuid
+
+import pytest
+
+from conftest import requires_db
+
+pytestmark = requires_db
+
+
+def upload(client, headers, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(["source", "link", "author", "title", "html", "published_date"])
+    writer.writerows(rows)
+    return client.post("/articles/upload-csv", files={"file": ("articles.csv", buffer.getvalue().encode())}, headers=headers)
+
+
+def test_upload_csv(client, headers):
+    from app import ingest
+
+    link = f"https://upload/{uuid.uuid4().hex}"
+    response = upload(client, headers, [
+        ["s", link, "Anne", "Premier", "<p>page</p>", "2024-03-01T10:00:00"],
+        ["s", link, "Anne", "Dernier", "", ""],
+        ["s", "", "Anne", "Sans lien", "", ""],
+        ["s", f"{link}/2", "Anne", "Date", "", "1er mars"],
+    ])
+    assert response.status_code == 202
+    job_id = response.json()["id"]
+
+    # Finished jobs are read back from ingest_jobs, as another worker would
+    assert job_id not in ingest.JOBS
+    job = client.get(f"/articles/upload-csv/{job_id}", headers=headers).json()
+    assert (job["status"], job["rows"], job["inserted"], job["updated"], job["skipped"]) == ("done", 4, 1, 0, 2)
+    assert [error.split(":")[0] for error in job["errors"]] == ["Line 4", "Line 5"]
+    assert job["finished_at"] is not None
+
+    [article] = client.get("/articles/search", params={"q": "Dernier", "source": "s"}, headers=headers).json()
+    assert article["link"] == link
+
+
+def test_failed_upload(client, headers):
+    response = client.post("/articles/upload-csv", files={"file": ("bad.csv", b"foo,bar\n1,2\n")}, headers=headers)
+    job = client.get(f"/articles/upload-csv/{response.json()['id']}", headers=headers).json()
+    assert job["status"] == "failed"
+    assert job["errors"] == ["ValueError: Missing CSV columns: source, link, author, title"]
+    assert client.get("/articles/upload-csv/nope", headers=headers).status_code == 404
+
+
+def test_upload_csv_skips_rows_postgres_would_reject(client, headers):
+    link = f"https://upload/{uuid.uuid4().hex}"
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(["source", "link", "author", "title", "language", "published_date"])
+    writer.writerows([
+        ["s", f"{link}/1", "Anne", "Langue", "fra", ""],
+        ["s", f"{link}/2", "Anne", "Heure d'hiver", "de", "2024-03-01T14:30:00+01:00"],
+        ["s", f"{link}/3", "Anne", "UTC", "", "2024-07-01T12:00:00+00:00"],
+        ["s", f"{link}/4", "Anne", "Locale", "", "2024-07-01T12:00:00"],
+    ])
+    response = client.post("/articles/upload-csv", files={"file": ("articles.csv", buffer.getvalue().encode())}, headers=headers)
+    job = client.get(f"/articles/upload-csv/{response.json()['id']}", headers=headers).json()
+    assert (job["status"], job["inserted"], job["skipped"]) == ("done", 3, 1)
+    assert job["errors"] == ["Line 2: invalid language 'fra', expected a 2-letter code"]
+
+    articles = client.get("/articles/", params={"source": "s", "fields": "link,language"}, headers=headers).json()
+    dates = {article["link"]: article for article in articles if article["link"].startswith(link)}
+    # Offsets are converted to the local time of the outlets, Europe/Zurich
+    assert {link_: article["published_date"] for link_, article in dates.items()} == {
+        f"{link}/2": "2024-03-01T14:30:00",
+        f"{link}/3": "2024-07-01T14:00:00",
+        f"{link}/4": "2024-07-01T12:00:00",
+    }
+    assert dates[f"{link}/2"]["language"] == "de"
+
+
+def test_upload_removes_its_file_when_the_job_cannot_be_created(client, headers, monkeypatch, tmp_path):
+    import tempfile
+    from app.routers import articles
+
+    def create_job(filename):
+        raise RuntimeError("database unavailable")
+
+    monkeypatch.setattr(articles, "create_job", create_job)
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+    with pytest.raises(RuntimeError):
+        upload(client, headers, [["s", "https://upload/none", "Anne", "Titre", "", ""]])
+    assert list(tmp_path.iterdir()) == []
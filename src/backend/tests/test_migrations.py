@@ -0,0 +1,119 @@
+import pytest
+from sqlalchemy import create_engine, inspect, text
+
+from conftest import requires_db
+
+pytestmark = requires_db
+
+SCHEMA = "migration_test"
+
+# The articles table as created by init.sql before the migrations existed
+BASELINE_SCHEMA = """
+CREATE TABLE articles (
+    id SERIAL PRIMARY KEY,
+    source TEXT NOT NULL,
+    link TEXT NOT NULL UNIQUE,
+    author TEXT NOT NULL,
+    title TEXT,
+    topic TEXT,
+    abstract TEXT,
+    html TEXT,
+    text TEXT,
+    published_date TIMESTAMP,
+    modified_date TIMESTAMP,
+    membership TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    modified_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    language VARCHAR(2) DEFAULT 'fr'
+);
+
+CREATE OR REPLACE FUNCTION update_modified_at()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.modified_at = CURRENT_TIMESTAMP;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER update_data_modified_at
+BEFORE UPDATE ON articles
+FOR EACH ROW
+EXECUTE FUNCTION update_modified_at();
+"""
+
+
+@pytest.fixture(scope="module")
+def upgraded(client):
+    """
+    A baseline database, with rows, brought up to date the way the app does
+    at startup: create_all (new tables only), then the migrations. It lives
+    in its own schema of the test database.
+    """
+    from app import migrate, models
+    from app.database import SQLALCHEMY_DATABASE_URL
+
+    engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"options": f"-c search_path={SCHEMA},public"})
+    with engine.begin() as connection:
+        connection.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        connection.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+        connection.execute(text(BASELINE_SCHEMA))
+        connection.execute(text(
+            "INSERT INTO articles (source, link, author, title, html, text, modified_at) VALUES "
+            "('s', 'https://a', 'Anne', 'Guerre à Gaza', '<p>page</p>', 'Les négociations reprennent', '2020-01-01'), "
+            "('s', 'https://b', 'Bob', 'Copie', '<p>page</p>', 'Même page', '2020-01-01'), "
+            "('s', 'https://c', 'Chris', 'Sans page', NULL, NULL, '2020-01-01')"
+        ))
+    models.Base.metadata.create_all(engine)
+    applied = migrate.run_migrations(engine)
+    yield engine, applied
+    with engine.begin() as connection:
+        connection.execute(text(f"DROP SCHEMA {SCHEMA} CASCADE"))
+    engine.dispose()
+
+
+def test_migrations_apply_once(upgraded):
+    from app import migrate
+
+    engine, applied = upgraded
+    assert applied == [path.name for _, _, path in migrate.list_migrations()]
+    assert migrate.run_migrations(engine) == []
+
+
+def test_html_moves_to_blobs(upgraded):
+    engine, _ = upgraded
+    columns = {column["name"] for column in inspect(engine).get_columns("articles", schema=SCHEMA)}
+    assert "html_hash" in columns and "html" not in columns
+
+    with engine.connect() as connection:
+        rows = connection.execute(text(
+            "SELECT a.link, a.modified_at, b.encoding, convert_from(b.data, 'UTF8') AS html "
+            "FROM articles a LEFT JOIN html_blobs b ON b.hash = a.html_hash ORDER BY a.link"
+        )).all()
+        blobs = connection.scalar(text("SELECT count(*) FROM html_blobs"))
+    assert [(row.link, row.html) for row in rows] == [
+        ("https://a", "<p>page</p>"), ("https://b", "<p>page</p>"), ("https://c", None)
+    ]
+    assert {row.encoding for row in rows[:2]} == {"identity"}
+    # One blob per distinct page, and moving the column is not a modification
+    assert blobs == 1
+    assert {row.modified_at.year for row in rows} == {2020}
+
+
+def test_search_vector_and_indexes(upgraded):
+    engine, _ = upgraded
+    indexes = {index["name"] for index in inspect(engine).get_indexes("articles", schema=SCHEMA)}
+    assert {
+        "idx_articles_published_date_id",
+        "idx_articles_search_vector",
+        "idx_articles_title_trgm",
+        "idx_articles_author_trgm",
+        "idx_articles_source_trgm",
+    } <= indexes
+
+    with engine.begin() as connection:
+        # Generated for the rows that predate the column, and kept up to date
+        connection.execute(text("UPDATE articles SET title = 'Votations fédérales' WHERE link = 'https://c'"))
+        matches = connection.execute(text(
+            "SELECT link FROM articles WHERE search_vector @@ websearch_to_tsquery('french', :q) ORDER BY link"
+        ), {"q": "négociation or votation"}).scalars().all()
+    assert matches == ["https://a", "https://c"]
@@ -1,3 +1,23 @@
+-- Fresh databases start from this file, users, annotations and comments are
+-- created by the backend. Existing databases are upgraded by the backend's
+-- versioned migrations (src/backend/app/migrations).
+
+-- Trigram matching for fuzzy title/author search
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- Raw article pages, content-addressed by the sha256 of the html and stored
+-- compressed (zstd or gzip). Identical pages are stored once.
+CREATE TABLE html_blobs (
+    hash CHAR(64) PRIMARY KEY,
+    encoding TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    data BYTEA NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Data is already compressed, skip TOAST compression
+ALTER TABLE html_blobs ALTER COLUMN data SET STORAGE EXTERNAL;
+
 CREATE TABLE articles (
     id SERIAL PRIMARY KEY,
     source TEXT NOT NULL,
@@ -6,16 +26,31 @@ CREATE TABLE articles (
     title TEXT,
     topic TEXT,
     abstract TEXT,
-    html TEXT,
+    html_hash CHAR(64) REFERENCES html_blobs(hash),
     text TEXT,
     published_date TIMESTAMP,
     modified_date TIMESTAMP,
     membership TEXT,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     modified_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    language VARCHAR(2) DEFAULT 'fr'
+    language VARCHAR(2) DEFAULT 'fr',
+    -- Full-text search document, kept up to date by Postgres
+    search_vector TSVECTOR GENERATED ALWAYS AS (
+        setweight(to_tsvector('french', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(author, '') || ' ' || coalesce(topic, '')), 'B') ||
+        setweight(to_tsvector('french', coalesce(abstract, '')), 'B') ||
+        setweight(to_tsvector('french', coalesce(text, '')), 'C')
+    ) STORED
 );
 
+-- Article lists are paginated newest first on (published_date, id)
+CREATE INDEX idx_articles_published_date_id ON articles (published_date DESC NULLS LAST, id DESC);
+CREATE INDEX idx_articles_search_vector ON articles USING GIN (search_vector);
+CREATE INDEX idx_articles_title_trgm ON articles USING GIN (title gin_trgm_ops);
+CREATE INDEX idx_articles_author_trgm ON articles USING GIN (author gin_trgm_ops);
+CREATE INDEX idx_articles_source_trgm ON articles USING GIN (source gin_trgm_ops);
+CREATE INDEX idx_articles_modified_at ON articles (modified_at);
+
 CREATE OR REPLACE FUNCTION update_modified_at()
 RETURNS TRIGGER AS $$
 BEGIN
@@ -29,6 +64,6 @@ BEFORE UPDATE ON articles
 FOR EACH ROW
 EXECUTE FUNCTION update_modified_at();
 
--- INSERT INTO articles (source, link, author, title, topic, abstract, html, text, published_date, language) VALUES
--- ('EXAMPLE SOURCE', 'https://example.html', 'EXAMPLE AUTHOR', 'EXAMPLE TITLE', 'EXAMPLE TOPIC', 'EXAMPLE ABSTRACT', 'EXAMPLE HTML', 'EXAMPLE TEXT',
+-- INSERT INTO articles (source, link, author, title, topic, abstract, text, published_date, language) VALUES
+-- ('EXAMPLE SOURCE', 'https://example.html', 'EXAMPLE AUTHOR', 'EXAMPLE TITLE', 'EXAMPLE TOPIC', 'EXAMPLE ABSTRACT', 'EXAMPLE TEXT',
 -- '01-01-2001 HH:MM:SS', 'fr');
\ No newline at end of file
@@ -49,6 +49,11 @@ function AnnotationItem({ annotation, onDelete, onUpdate }) {
   const [categories, setCategories] = useState([]);
   const [subcategories, setSubcategories] = useState({});
 
+  // Comments added or deleted elsewhere arrive through the annotation
+  useEffect(() => {
+    setComments(annotation.comments || []);
+  }, [annotation.comments]);
+
   // Fetch categories when component mounts
   useEffect(() => {
     axios.get('http://localhost:8000/options/categories')
@@ -308,6 +313,8 @@ function App() {
 
   const [highlightData, setHighlightData] = useState(null);
   const [annotations, setAnnotations] = useState([]);
+  // Sequence of the last annotation event reflected in annotations
+  const [eventSeq, setEventSeq] = useState(null);
   const [exportMenuOpen, setExportMenuOpen] = useState(false);
 
   const editorRef = useRef();
@@ -350,23 +357,31 @@ function App() {
   };
 
   const handleArticleSelect = (article) => {
-    setSelectedArticle(article);
     setArticles([]);
     setClearSearchTrigger(true);
     setTimeout(() => setClearSearchTrigger(false), 0);
+    loadWorkspace(article.id);
+  };
 
-    // Clear editor content and highlights
-    if (editorRef.current && editorRef.current.setContent) {
-      editorRef.current.setContent(article.text);
-    }
-
-    // Fetch and display annotations with exact positions
-    axios.get(`http://localhost:8000/annotations/article/${article.id}`)
+  const loadWorkspace = (articleId) => {
+    // The search results only carry article metadata, load the full article
+    // with its annotations and their comments in one request
+    axios.get(`http://localhost:8000/articles/${articleId}/workspace`)
       .then(response => {
-        setAnnotations(response.data);
+        const { article: fullArticle, annotations, event_seq } = response.data;
+        setSelectedArticle(fullArticle);
+        setEventSeq(event_seq);
+
+        // Clear editor content and highlights
+        if (editorRef.current && editorRef.current.setContent) {
+          editorRef.current.setContent(fullArticle.text);
+        }
+
+        // Display annotations with exact positions
+        setAnnotations(annotations);
 
         if (editorRef.current && editorRef.current.addHighlight) {
-          response.data.forEach(annotation => {
+          annotations.forEach(annotation => {
             const color = getColorForCategory(annotation.category);
             editorRef.current.addHighlight(
               annotation.start_position,
@@ -378,10 +393,119 @@ function App() {
         }
       })
       .catch(error => {
-        console.error('Error fetching annotations:', error);
+        console.error('Error fetching article:', error);
       });
   };
 
+  const showHighlight = (annotation) => {
+    if (editorRef.current && editorRef.current.addHighlight) {
+      editorRef.current.removeHighlight(annotation.id);
+      editorRef.current.addHighlight(
+        annotation.start_position,
+        annotation.end_position,
+        getColorForCategory(annotation.category),
+        annotation.id
+      );
+    }
+  };
+
+  // Apply the changes other users (and our other tabs) make to the article.
+  // Our own changes come back too, applying them again is harmless.
+  const handleAnnotationEvent = (event) => {
+    if (event.op === 'delete') {
+      setAnnotations(prevAnnotations => prevAnnotations.filter(a => a.id !== event.id));
+      if (editorRef.current && editorRef.current.removeHighlight) {
+        editorRef.current.removeHighlight(event.id);
+      }
+      return;
+    }
+    setAnnotations(prevAnnotations => {
+      const existing = prevAnnotations.find(a => a.id === event.id);
+      if (!existing) {
+        return [...prevAnnotations, { ...event.data, comments: [] }];
+      }
+      return prevAnnotations.map(a => a.id === event.id ? { ...a, ...event.data, comments: a.comments } : a);
+    });
+    showHighlight(event.data);
+  };
+
+  const handleCommentEvent = (event) => {
+    const comment = event.data;
+    setAnnotations(prevAnnotations =>
+      prevAnnotations.map(annotation => {
+        if (annotation.id !== comment.annotation_id) {
+          return annotation;
+        }
+        const comments = (annotation.comments || []).filter(c => c.id !== comment.id);
+        if (event.op !== 'delete') {
+          comments.push(comment);
+          comments.sort((a, b) => a.id - b.id);
+        }
+        return { ...annotation, comments };
+      })
+    );
+  };
+
+  // Stream the changes to the selected article, from the state it was loaded in.
+  // The stream authenticates with a short-lived token scoped to the article,
+  // fetched again on every (re)connection.
+  useEffect(() => {
+    if (!token || !selectedArticle || eventSeq === null) {
+      return;
+    }
+    const articleId = selectedArticle.id;
+    let source = null;
+    let retry = null;
+    let closed = false;
+    let lastSeq = eventSeq;
+
+    const apply = (handler) => (message) => {
+      lastSeq = Number(message.lastEventId) || lastSeq;
+      handler(JSON.parse(message.data));
+    };
+    const connect = () => {
+      axios.post(`http://localhost:8000/events/articles/${articleId}/token`)
+        .then(response => {
+          if (closed) {
+            return;
+          }
+          source = new EventSource(
+            `http://localhost:8000/events/articles/${articleId}?since=${lastSeq}&token=${encodeURIComponent(response.data.token)}`
+          );
+          source.addEventListener('annotation', apply(handleAnnotationEvent));
+          source.addEventListener('comment', apply(handleCommentEvent));
+          // Missed events are no longer available, reload the article
+          source.addEventListener('reset', () => {
+            closed = true;
+            source.close();
+            setEventSeq(null);
+            loadWorkspace(articleId);
+          });
+          // The token has expired by the time the browser reconnects on its own
+          source.onerror = () => {
+            source.close();
+            reconnect();
+          };
+        })
+        .catch(reconnect);
+    };
+    const reconnect = () => {
+      if (!closed) {
+        retry = setTimeout(connect, 3000);
+      }
+    };
+
+    connect();
+    return () => {
+      closed = true;
+      clearTimeout(retry);
+      if (source) {
+        source.close();
+      }
+    };
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [token, selectedArticle && selectedArticle.id, eventSeq]);
+
   const handleAnalyze = () => {
     if (selectedArticle && selectedArticle.id) {
       axios.post(`http://localhost:8000/analyze?article_id=${selectedArticle.id}`)
@@ -506,18 +630,24 @@ function App() {
     downloadCsv(csvData, `${selectedArticle.title || 'article'}_annotations.csv`);
   };
 
-  const exportAllUserAnnotations = () => {
-    const userName = 'placeholder_user'; // Replace with actual user name when authentication is implemented
-
-    axios.get(`http://localhost:8000/annotations/user/${userName}`)
-      .then(response => {
-        const userAnnotations = response.data;
-        const csvData = annotationsToCsv(userAnnotations);
-        downloadCsv(csvData, `all_annotations_${userName}.csv`);
-      })
-      .catch(error => {
-        console.error('Error fetching user annotations:', error);
-      });
+  const exportAllUserAnnotations = async () => {
+    // Follow the feed pages of the current user's annotations
+    try {
+      const userAnnotations = [];
+      let cursor = null;
+      do {
+        const response = await axios.get('http://localhost:8000/annotations/feed', {
+          params: { mine: true, limit: 500, ...(cursor ? { cursor } : {}) }
+        });
+        userAnnotations.push(...response.data);
+        cursor = response.headers['x-next-cursor'];
+      } while (cursor);
+
+      const csvData = annotationsToCsv(userAnnotations);
+      downloadCsv(csvData, 'all_annotations.csv');
+    } catch (error) {
+      console.error('Error fetching user annotations:', error);
+    }
   };
 
   const annotationsToCsv = (annotations, articleMetadata = null) => {
@@ -546,12 +676,18 @@ function App() {
     rows.push(headers);
 
     annotations.forEach(annotation => {
-      const article = articleMetadata || annotation.article_metadata;
+      // Feed rows carry the article's title, source, link and date, not its text
+      const article = articleMetadata || annotation.article_metadata || {
+        title: annotation.article_title,
+        source: annotation.article_source,
+        link: annotation.article_link,
+        published_date: annotation.article_published_date
+      };
       const row = [
         annotation.id,
         annotation.article_id,
         article.title || '',
-        annotation.user,
+        annotation.username,
         new Date(annotation.timestamp).toLocaleString(),
         annotation.category,
         annotation.subcategory,
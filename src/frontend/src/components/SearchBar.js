@@ -58,7 +58,9 @@ function SearchBar({ onArticlesFetched, onClearSearchTrigger, onArticleSelect })
     if (endDate) params.append('end_date', endDate);
     if (source) params.append('source', source);
 
-    axios.get(`http://localhost:8000/articles?${params.toString()}`)
+    // Free text queries go through the ranked full-text search
+    const endpoint = query ? 'articles/search' : 'articles';
+    axios.get(`http://localhost:8000/${endpoint}?${params.toString()}`)
       .then(response => {
         setArticles(response.data);
         onArticlesFetched(response.data);
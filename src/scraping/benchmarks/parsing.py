@@ -0,0 +1,94 @@
+"""
+Micro-benchmark of the HTML parser backends over saved pages.
+
+Pages are read from a directory of .html files and/or from the "html" field of
+JSONL scraper outputs (e.g. aug_content_<topic>.jsonl). Each backend parses
+every page and runs the source's declarative selectors on it.
+
+    python benchmarks/parsing.py --pages ../../data/scraping/pages --source lecourrier
+    python benchmarks/parsing.py --jsonl ../../data/scraping/lecourrier/aug_content_hamas.jsonl
+"""
+import os
+import sys
+import glob
+import gzip
+import json
+import time
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from utils import get_scraper  # noqa: E402
+from utils.parsing import PARSERS, get_parser  # noqa: E402
+
+
+def load_pages(pages_dir, jsonl_paths):
+    pages = []
+    if pages_dir:
+        for path in sorted(glob.glob(os.path.join(pages_dir, "*.html"))):
+            with open(path, "rb") as fp:
+                pages.append(fp.read())
+    for path in jsonl_paths:
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rt", encoding="utf-8") as fp:
+            for line in fp:
+                record = json.loads(line)
+                if record.get("html"):
+                    pages.append(record["html"].encode("utf-8"))
+    return pages
+
+
+def run_selectors(document, selectors):
+    cards = document.select(selectors["card"])
+    for card in cards:
+        for css, value in selectors["fields"].values():
+            node = card.select_one(css)
+            if node is not None:
+                node.text() if value == "text" else node.attr(value)
+    content = document.select_one(selectors["content"])
+    return len(cards), content.text(strip=True) if content is not None else ""
+
+
+def benchmark(backend, pages, selectors, repeat):
+    parser = get_parser(backend)
+    best = float("inf")
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        for page in pages:
+            run_selectors(parser.parse(page), selectors)
+        best = min(best, time.perf_counter() - started_at)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark HTML parser backends.")
+    parser.add_argument("--pages", default=None, help="Directory of saved .html pages")
+    parser.add_argument("--jsonl", action="append", default=[], help="JSONL scraper output with an html field")
+    parser.add_argument("--source", default="lecourrier", help="Scraper whose selectors are used")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    pages = load_pages(args.pages, args.jsonl)
+    if not pages:
+        parser.error("No pages found, pass --pages and/or --jsonl")
+    selectors = get_scraper(args.source).selectors
+
+    # Sanity check: every backend must extract the same content
+    reference = [run_selectors(get_parser("html.parser").parse(page), selectors) for page in pages]
+    for backend in PARSERS:
+        extracted = [run_selectors(get_parser(backend).parse(page), selectors) for page in pages]
+        mismatches = sum(a != b for a, b in zip(reference, extracted))
+        if mismatches:
+            print(f"warning: {backend} differs from html.parser on {mismatches}/{len(pages)} pages")
+
+    size = sum(len(page) for page in pages) / 1e6
+    baseline = benchmark("html.parser", pages, selectors, args.repeat)
+    print(f"{len(pages)} pages, {size:.1f} MB, best of {args.repeat}")
+    print(f"{'backend':<12} {'seconds':>9} {'pages/s':>9} {'speedup':>8}")
+    for backend in PARSERS:
+        seconds = baseline if backend == "html.parser" else benchmark(backend, pages, selectors, args.repeat)
+        print(f"{backend:<12} {seconds:>9.3f} {len(pages) / seconds:>9.0f} {baseline / seconds:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
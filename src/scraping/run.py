@@ -0,0 +1,167 @@
+"""
+Run registered scrapers over (source, topic) jobs in parallel.
+
+    python run.py --source lecourrier --topic hamas --topic ukraine --save-path ../../data/scraping
+    python run.py --all --topic hamas --every 24   # nightly sweep of every outlet
+"""
+import os
+import json
+import time
+import logging
+import argparse
+import traceback
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime, timezone
+
+from utils import SCRAPERS, get_scraper
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+def run_job(source, topic, save_path, options):
+    """
+    Run one scraper end to end in a worker process and return its report.
+    """
+    started_at = time.time()
+    report = {
+        "source": source,
+        "topic": topic,
+        "started_at": datetime.fromtimestamp(started_at, timezone.utc).isoformat(),
+    }
+    try:
+        source_path = os.path.join(save_path, source)
+        os.makedirs(source_path, exist_ok=True)
+        with get_scraper(source)(topic=topic, save_path=source_path, **options) as scraper:
+            report["stats"] = scraper.run()
+        report["status"] = "ok"
+    except Exception as e:
+        report["status"] = "failed"
+        report["error"] = f"{type(e).__name__}: {e}"
+        report["traceback"] = traceback.format_exc()
+    report["duration"] = time.time() - started_at
+    return report
+
+
+def schedule(jobs):
+    """
+    Order jobs round-robin across sources, so that every source gets started
+    early and the sweep is bounded by the slowest source.
+    """
+    by_source = {}
+    for source, topic in jobs:
+        by_source.setdefault(source, deque()).append((source, topic))
+    ordered = []
+    while by_source:
+        for source in list(by_source):
+            ordered.append(by_source[source].popleft())
+            if not by_source[source]:
+                del by_source[source]
+    return ordered
+
+
+def run_sweep(jobs, save_path, options, workers):
+    """
+    Run jobs on a process pool, never running more jobs of a source at once
+    than its scraper's max_concurrency. Returns the consolidated run report.
+    """
+    pending = deque(schedule(jobs))
+    running = {}
+    active = Counter()
+    reports = []
+    started_at = time.time()
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        while pending or running:
+            # Submit every pending job whose source has a free slot
+            for _ in range(len(pending)):
+                if len(running) >= workers:
+                    break
+                source, topic = pending.popleft()
+                if active[source] >= get_scraper(source).max_concurrency:
+                    pending.append((source, topic))
+                    continue
+                future = executor.submit(run_job, source, topic, save_path, options)
+                running[future] = source
+                active[source] += 1
+                logger.info(f"Started {source}/{topic}")
+
+            if not running:
+                # Only reachable if nothing could be submitted, which the
+                # registry's max_concurrency >= 1 check rules out
+                raise RuntimeError(f"No job could be started out of {len(pending)} pending")
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                source = running.pop(future)
+                active[source] -= 1
+                report = future.result()
+                reports.append(report)
+                logger.info(
+                    f"Finished {report['source']}/{report['topic']}: "
+                    f"{report['status']} in {report['duration']:.0f}s"
+                )
+
+    return {
+        "started_at": datetime.fromtimestamp(started_at, timezone.utc).isoformat(),
+        "duration": time.time() - started_at,
+        "jobs": len(reports),
+        "failed": sum(report["status"] != "ok" for report in reports),
+        "scraped": sum(report.get("stats", {}).get("scraped", 0) for report in reports),
+        "indexed": sum(report.get("stats", {}).get("indexed", 0) for report in reports),
+        "reports": reports,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run registered scrapers in parallel.")
+    parser.add_argument("--source", action="append", default=[], help=f"Source to scrape, one of {sorted(SCRAPERS)}")
+    parser.add_argument("--all", action="store_true", help="Scrape every registered source")
+    parser.add_argument("--topic", action="append", required=True, help="Search topic (repeatable)")
+    parser.add_argument("--save-path", default="../../data/scraping", help="Directory for scraper outputs")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Parallel scraper processes")
+    parser.add_argument("--pool-size", type=int, default=2, help="Browsers per scraper process")
+    parser.add_argument("--fetch-mode", default="http", choices=["http", "selenium"])
+    parser.add_argument("--save", action="append", default=[], help="Extra exports (json, csv)")
+    parser.add_argument("--every", type=float, default=None, help="Run as a daemon, sweeping every N hours")
+    parser.add_argument("--report", default=None, help="Path of the JSON run report")
+    args = parser.parse_args()
+
+    sources = sorted(SCRAPERS) if args.all else args.source
+    if not sources:
+        parser.error("Pass --source at least once, or --all")
+    for source in sources:
+        get_scraper(source)
+
+    jobs = [(source, topic) for source in sources for topic in args.topic]
+    options = {
+        "save": args.save,
+        "headless": True,
+        "fetch_mode": args.fetch_mode,
+        "pool_size": args.pool_size,
+    }
+
+    while True:
+        run_report = run_sweep(jobs, args.save_path, options, args.workers)
+        report_path = args.report or os.path.join(
+            args.save_path, f"run_report_{datetime.now(timezone.utc):%Y%m%dT%H%M%S}.json"
+        )
+        with open(report_path, "w", encoding="utf-8") as fp:
+            json.dump(run_report, fp, ensure_ascii=False, indent=4)
+        logger.info(
+            f"Sweep done in {run_report['duration']:.0f}s: {run_report['jobs']} jobs, "
+            f"{run_report['failed']} failed, {run_report['indexed']} articles indexed. "
+            f"Report saved to {report_path}"
+        )
+
+        if args.every is None:
+            break
+        time.sleep(args.every * 3600)
+
+
+if __name__ == "__main__":
+    main()
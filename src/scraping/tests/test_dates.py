@@ -0,0 +1,28 @@
+from datetime import datetime
+
+import pytest
+
+from utils.dates import TIMEZONE, normalize_dates, parse_date
+
+
+@pytest.mark.parametrize("date_string, expected", [
+    ("lundi 9 octobre 2023", datetime(2023, 10, 9)),
+    ("1er mars 2024 à 14h30", datetime(2024, 3, 1, 14, 30)),
+    ("Montag, 9. Oktober 2023", datetime(2023, 10, 9)),
+    ("1° marzo 2024", datetime(2024, 3, 1)),
+    ("1º marzo 2024 alle 14:30", datetime(2024, 3, 1, 14, 30)),
+    ("09.10.2023", datetime(2023, 10, 9)),
+    ("2024-03-01", datetime(2024, 3, 1)),
+])
+def test_parse_date_is_zurich_local(date_string, expected):
+    assert parse_date(date_string) == expected.replace(tzinfo=TIMEZONE)
+
+
+def test_parse_date_converts_offsets_to_zurich():
+    date_object = parse_date("2024-07-01T10:00:00+00:00")
+    assert date_object.tzinfo is TIMEZONE
+    assert date_object.replace(tzinfo=None) == datetime(2024, 7, 1, 12, 0)
+
+
+def test_normalize_dates():
+    assert normalize_dates(["1° marzo 2024", "", "not a date"]) == ["2024-03-01T00:00:00+01:00", None, None]
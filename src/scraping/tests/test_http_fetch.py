@@ -0,0 +1,210 @@
+import json
+import os
+import sqlite3
+import threading
+import urllib.error
+import urllib.request
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from utils.fetching import HttpFetcher
+from utils.ratelimit import RateLimiter
+from utils.scraping import LeCourrierScraper
+from utils.webdriver_pool import WebDriverPool
+
+PAGES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pages")
+
+
+def read_page(name):
+    with open(os.path.join(PAGES, name), encoding="utf-8") as fp:
+        return fp.read()
+
+
+class LeCourrierStandIn(BaseHTTPRequestHandler):
+    """
+    Serves the saved pages the way the site does:
+      /?s=...        search results,
+      /article/n     an article,
+      /throttled/n   429 with Retry-After on the first request, then the article,
+      /unavailable/n 503 on every request,
+      /error/n       500,
+      /client/n      an article rendered client-side (no <article> in the HTML).
+    """
+    hits = Counter()
+    cookies = []
+
+    def do_GET(self):
+        kind = self.path.strip("/").split("/")[0]
+        type(self).hits[self.path] += 1
+        type(self).cookies.append(self.headers.get("Cookie"))
+        base = f"http://{self.headers['Host']}"
+        if self.path.startswith("/?s="):
+            self.respond(200, read_page("lecourrier_search.html").replace("{base}", base))
+        elif kind == "article" or (kind == "throttled" and self.hits[self.path] > 1):
+            self.respond(200, read_page("lecourrier_article.html"))
+        elif kind == "throttled":
+            self.respond(429, "Too Many Requests", {"Retry-After": "0"})
+        elif kind == "unavailable":
+            self.respond(503, "Service Unavailable")
+        elif kind == "client":
+            self.respond(200, read_page("lecourrier_client.html"))
+        elif kind == "":
+            self.respond(200, "<html><body></body></html>")
+        else:
+            self.respond(500, "Internal Server Error")
+
+    def respond(self, status, body, headers=None):
+        body = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeDriver():
+    """
+    The WebDriver calls the scraper makes, answered by plain HTTP requests:
+    the Selenium path then parses the same bytes the HTTP path receives.
+    """
+
+    def __init__(self):
+        self.page_source = ""
+        self.status = None
+
+    def get(self, url):
+        try:
+            with urllib.request.urlopen(url) as response:
+                self.status, body = response.status, response.read()
+        except urllib.error.HTTPError as e:
+            self.status, body = e.code, e.read()
+        self.page_source = body.decode("utf-8")
+
+    def execute_script(self, script):
+        return self.status if "navigation" in script else 1
+
+    def add_cookie(self, cookie):
+        pass
+
+    def quit(self):
+        pass
+
+
+@pytest.fixture
+def server():
+    LeCourrierStandIn.hits = Counter()
+    LeCourrierStandIn.cookies = []
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), LeCourrierStandIn)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def scraper(server, tmp_path):
+    cookies_path = tmp_path / "cookies.json"
+    cookies_path.write_text(json.dumps([{"name": "session", "value": "s3cr3t", "domain": "127.0.0.1"}]))
+    scraper = LeCourrierScraper(
+        topic="hamas",
+        save_path=str(tmp_path),
+        save=[],
+        fetch_mode="http",
+        cookies_path=str(cookies_path),
+        incremental=False,
+        driver_pool=WebDriverPool(size=1, factory=FakeDriver),
+        rate_limiter=RateLimiter(rate=100, burst=100, base_delay=0.01, max_retries=2),
+    )
+    scraper.base_url = server
+    scraper.url = f"{server}/?s=hamas"
+    yield scraper
+    scraper.close()
+
+
+def search_cards(scraper):
+    with scraper.borrow_driver() as driver:
+        scraper.browse(driver, scraper.url)
+        return scraper.scrap_articles(scraper.parse_html(driver.page_source))
+
+
+def test_cards_extracted_like_selenium(scraper):
+    selenium_cards = search_cards(scraper)
+    [result] = HttpFetcher(rate_limiter=scraper.rate_limiter).fetch_all([scraper.url])
+    http_cards = scraper.scrap_articles(scraper.parse_html(result.body))
+
+    assert http_cards == selenium_cards
+    assert [card["title"] for card in http_cards] == [
+        "Gaza: la trêve vacille",
+        "L’aide humanitaire bloquée",
+        "Manifestation à Genève",
+        "Analyse: un conflit régional?",
+    ]
+    assert http_cards[1]["published_date"] == "2024-03-01T14:30:00+01:00"
+    assert all(card["source"] == scraper.base_url for card in http_cards)
+
+
+def test_content_extracted_like_selenium(scraper):
+    articles = search_cards(scraper)
+    fetched, fallback, not_modified = scraper.fetch_content_http([dict(article) for article in articles])
+
+    assert [article["link"].split("/")[-2] for article in fetched] == ["article", "throttled"]
+    assert [article["link"].split("/")[-2] for article in fallback] == ["error", "client"]
+    assert not_modified == []
+    # The session cookies of the browser are carried by the HTTP fetcher
+    assert "session=s3cr3t" in LeCourrierStandIn.cookies[-1]
+
+    with scraper.borrow_driver() as driver:
+        for article in fetched:
+            selenium_article = scraper.fetch_page_selenium(driver, {"link": article["link"]})
+            assert article["text"] == selenium_article["text"]
+            assert article["html"] == selenium_article["html"]
+    assert fetched[0]["text"].startswith("Gaza: la trêve vacille")
+    assert "« Rien n’est encore décidé »" in fetched[0]["text"]
+
+
+def test_throttled_fetch_is_retried(scraper, server):
+    fetched, fallback, _ = scraper.fetch_content_http([{"link": f"{server}/throttled/1"}])
+
+    assert [article["link"] for article in fetched] == [f"{server}/throttled/1"]
+    assert fallback == []
+    assert LeCourrierStandIn.hits["/throttled/1"] == 2
+    assert scraper.rate_limiter.metrics()[server[len("http://"):]]["throttled"] == 1
+
+
+def test_unavailable_and_failing_fetches_fall_back(scraper, server):
+    links = [f"{server}/unavailable/1", f"{server}/error/2"]
+    fetched, fallback, _ = scraper.fetch_content_http([{"link": link} for link in links])
+
+    assert fetched == []
+    assert [article["link"] for article in fallback] == links
+    # 503 is retried up to max_retries, 500 is not retried
+    assert LeCourrierStandIn.hits["/unavailable/1"] == scraper.rate_limiter.max_retries + 1
+    assert LeCourrierStandIn.hits["/error/2"] == 1
+
+
+def test_selenium_reports_throttling(scraper, server):
+    with scraper.borrow_driver() as driver:
+        article = scraper.fetch_page_selenium(driver, {"link": f"{server}/throttled/1"})
+
+    assert article["text"].startswith("Gaza: la trêve vacille")
+    assert LeCourrierStandIn.hits["/throttled/1"] == 2
+    assert scraper.rate_limiter.metrics()[server[len("http://"):]]["throttled"] == 1
+
+
+def test_failed_run_releases_resources(scraper, monkeypatch):
+    def fail():
+        raise RuntimeError("search page changed")
+
+    monkeypatch.setattr(scraper, "run_article_scraping", fail)
+    with pytest.raises(RuntimeError):
+        scraper.run()
+    with pytest.raises(sqlite3.ProgrammingError):
+        scraper.state.conn.execute("SELECT 1")
@@ -0,0 +1,48 @@
+import pytest
+
+from run import run_job
+from utils.base import BaseScraper
+from utils.registry import SCRAPERS, register_scraper
+
+
+class FailingScraper(BaseScraper):
+    closed = 0
+
+    def __init__(self, save_path, topic, **options):
+        super().__init__(save_path, topic)
+
+    def scrap_articles(self):
+        pass
+
+    def scrap_article_content(self):
+        pass
+
+    def run_article_scraping(self):
+        pass
+
+    def run_content_scraping(self):
+        pass
+
+    def index(self):
+        pass
+
+    def run(self):
+        raise RuntimeError("search page changed")
+
+    def close(self):
+        type(self).closed += 1
+
+
+@pytest.fixture
+def failing_source():
+    register_scraper("failing")(FailingScraper)
+    yield "failing"
+    del SCRAPERS["failing"]
+
+
+def test_failed_job_closes_its_scraper(failing_source, tmp_path):
+    report = run_job(failing_source, "hamas", str(tmp_path), {})
+
+    assert report["status"] == "failed"
+    assert report["error"] == "RuntimeError: search page changed"
+    assert FailingScraper.closed == 1
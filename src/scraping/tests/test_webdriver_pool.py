@@ -0,0 +1,64 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from utils.webdriver_pool import WebDriverPool
+
+
+class Driver():
+    def __init__(self):
+        self.quit_calls = 0
+
+    def execute_script(self, script):
+        return 1
+
+    def quit(self):
+        self.quit_calls += 1
+
+
+def test_waiter_gets_the_capacity_of_a_recycled_driver():
+    pool = WebDriverPool(size=1, factory=Driver)
+    first = pool.acquire()
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        waiting = executor.submit(pool.acquire)
+        with pytest.raises(TimeoutError):
+            waiting.result(timeout=0.1)
+        # Nothing goes back to the idle drivers, but a new one can be started
+        pool.release(first, broken=True)
+        second = waiting.result(timeout=5)
+    assert second is not first and first.quit_calls == 1
+    pool.release(second)
+    pool.close()
+    assert second.quit_calls == 1
+
+
+def test_acquire_times_out():
+    pool = WebDriverPool(size=1, factory=Driver)
+    pool.acquire()
+    with pytest.raises(queue.Empty):
+        pool.acquire(timeout=0.05)
+
+
+def test_map_recycles_at_max_uses():
+    created = []
+
+    def factory():
+        created.append(Driver())
+        return created[-1]
+
+    pool = WebDriverPool(size=3, max_uses=5, factory=factory)
+    barrier = threading.Barrier(3)
+
+    def work(driver, item):
+        if item < 3:
+            barrier.wait(timeout=5)
+        return item * 2
+
+    results = list(pool.map(work, range(60)))
+    pool.close()
+    assert results == [(item, item * 2, None) for item in range(60)]
+    # Every driver served at most max_uses pages, and all of them were quit
+    assert len(created) >= 60 // 5
+    assert all(driver.quit_calls == 1 for driver in created)
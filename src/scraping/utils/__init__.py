@@ -1,3 +1,4 @@
 from .db import Database
 from .article import Article
-from .scraping import LeCourrierScraper
\ No newline at end of file
+from .scraping import LeCourrierScraper
+from .registry import SCRAPERS, register_scraper, get_scraper
\ No newline at end of file
@@ -2,6 +2,9 @@ import os
 import logging
 from typing import Optional
 import csv
+import psycopg2
+
+from utils.blobs import make_blob
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -40,8 +43,14 @@ class Article():
 
     def upsert(self, db):
 
+        blob_query = """
+        INSERT INTO html_blobs (hash, encoding, size, data)
+        VALUES (%s, %s, %s, %s)
+        ON CONFLICT (hash) DO NOTHING;
+        """
+
         query = """
-        INSERT INTO articles (source, link, author, title, html, text, published_date, topic, abstract)
+        INSERT INTO articles (source, link, author, title, html_hash, text, published_date, topic, abstract)
         VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
         ON CONFLICT (link)
         DO UPDATE SET
@@ -49,7 +58,7 @@ class Article():
             link = EXCLUDED.link,
             author = EXCLUDED.author,
             title = EXCLUDED.title,
-            html = EXCLUDED.html,
+            html_hash = EXCLUDED.html_hash,
             text = EXCLUDED.text,
             published_date = EXCLUDED.published_date,
             topic = EXCLUDED.topic,
@@ -57,17 +66,21 @@ class Article():
         RETURNING id;
         """
 
-        values = (self.source, self.link, self.author, self.title, self.html, self.text, self.published_date, self.topic, self.abstract)
+        blob = make_blob(self.html)
+        values = (self.source, self.link, self.author, self.title, blob[0] if blob else None, self.text, self.published_date, self.topic, self.abstract)
 
+        cursor = db.cursor()
         try:
             # Execute the query with the provided db connection/cursor
-            cursor = db.cursor()
+            if blob:
+                h, encoding, size, data = blob
+                cursor.execute(blob_query, (h, encoding, size, psycopg2.Binary(data)))
             cursor.execute(query, values)
 
             # Commit the transaction
             db.commit()
 
-            logger.info("Upserted article: %s", values)
+            logger.info("Upserted article: %s", self.link)
         except Exception as e:
             db.rollback()
             logger.info("Error during upsert: %s", e)
@@ -1,10 +1,46 @@
 from abc import ABC, abstractmethod
-from typing import final
+from typing import final, Dict, Iterable, Iterator
+from itertools import chain
+from contextlib import contextmanager
 import os
+import gzip
 import json
 import csv
+import logging
+
+from utils.ratelimit import RateLimiter, THROTTLE_STATUSES
+from utils.parsing import get_parser
+
+logger = logging.getLogger(__name__)
+
+
+def navigation_status(driver):
+    """
+    HTTP status of the page loaded in driver, None if the browser doesn't
+    expose it.
+    """
+    try:
+        return driver.execute_script(
+            "const entry = performance.getEntriesByType('navigation')[0];"
+            "return entry && entry.responseStatus ? entry.responseStatus : null;"
+        )
+    except Exception:
+        return None
+
 
 class BaseScraper(ABC):
+    # WebDriverPool shared by the scraper's browser-based stages
+    driver_pool = None
+    # RateLimiter pacing every request the scraper sends
+    rate_limiter = None
+    # HTML parser backend (see utils.parsing.PARSERS), None picks the fastest installed
+    parser_backend = None
+    # Declarative CSS selectors for the source's pages:
+    #   "card": selector of a search result card,
+    #   "fields": {field: (selector relative to the card, "text" or an attribute name)},
+    #   "content": selector of the article body on an article page.
+    selectors = {}
+
     def __init__(self, save_path, topic):
         self.save_path = save_path
         self.topic = topic
@@ -45,25 +81,196 @@ class BaseScraper(ABC):
         Run the scraping and indexing process (run_article_scraping, run_content_scraping, index).
         """
 
+    def close(self):
+        """
+        Release the resources the scraper holds (browsers, connections). Safe
+        to call more than once.
+        """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
     @final
-    def save_json(self, articles, filename):
+    def save_json(self, articles: Iterable[Dict], filename):
         """
-        Save articles to a JSON file.
+        Save articles to a JSON file. Articles can be any iterable (e.g. the
+        read_jsonl generator), they are written one at a time.
         """
         file_path = os.path.join(self.save_path, f"{filename}_{self.topic}.json")
         with open(file_path, "w", encoding="utf-8") as fp:
-            json.dump(articles, fp, ensure_ascii=False, indent=4)
+            fp.write("[")
+            for i, article in enumerate(articles):
+                fp.write(",\n" if i else "\n")
+                json.dump(article, fp, ensure_ascii=False)
+            fp.write("\n]\n")
 
     @final
-    def save_csv(self, articles, filename):
+    def save_csv(self, articles: Iterable[Dict], filename):
         """
-        Save articles to a CSV file.
+        Save articles to a CSV file. Articles can be any iterable, the header
+        is taken from the first one.
         """
+        articles = iter(articles)
+        first = next(articles, None)
+        if first is None:
+            return
         file_path = os.path.join(self.save_path, f"{filename}_{self.topic}.csv")
         with open(file_path, "w", newline="", encoding="utf-8") as fp:
-            writer = csv.DictWriter(fp, fieldnames=articles[0].keys())
+            writer = csv.DictWriter(fp, fieldnames=first.keys())
             writer.writeheader()
-            writer.writerows(articles)
+            writer.writerows(chain([first], articles))
+
+    @final
+    def jsonl_path(self, filename):
+        """
+        Path of the JSONL file for filename, gzip compressed if self.compress.
+        """
+        extension = "jsonl.gz" if getattr(self, "compress", False) else "jsonl"
+        return os.path.join(self.save_path, f"{filename}_{self.topic}.{extension}")
+
+    @final
+    def _open_jsonl(self, file_path, mode):
+        if file_path.endswith(".gz"):
+            return gzip.open(file_path, f"{mode}t", encoding="utf-8")
+        return open(file_path, mode, encoding="utf-8")
+
+    @final
+    def truncate_jsonl(self, filename):
+        """
+        Start filename over with an empty file.
+        """
+        with self._open_jsonl(self.jsonl_path(filename), "w"):
+            pass
+
+    @final
+    def append_jsonl(self, articles: Iterable[Dict], filename):
+        """
+        Append articles to a JSONL file, one record per line. The file is
+        flushed on return so that records survive a crash of the run.
+        """
+        with self._open_jsonl(self.jsonl_path(filename), "a") as fp:
+            for article in articles:
+                fp.write(json.dumps(article, ensure_ascii=False))
+                fp.write("\n")
+
+    @final
+    def read_jsonl(self, filename) -> Iterator[Dict]:
+        """
+        Stream articles back from a JSONL file. A truncated last line (run
+        killed mid-write) is skipped.
+        """
+        file_path = self.jsonl_path(filename)
+        if not os.path.exists(file_path):
+            return
+        with self._open_jsonl(file_path, "r") as fp:
+            lines = iter(fp)
+            while True:
+                try:
+                    line = next(lines, None)
+                except EOFError:
+                    # Incomplete gzip member left by an interrupted append
+                    return
+                if line is None:
+                    return
+                if not line.strip():
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    if line.endswith("\n"):
+                        raise
+                    return
+
+    @final
+    @contextmanager
+    def borrow_driver(self):
+        """
+        Borrow a WebDriver from the scraper's driver pool.
+        """
+        if self.driver_pool is None:
+            raise RuntimeError(f"{type(self).__name__} has no driver pool")
+        with self.driver_pool.driver() as driver:
+            yield driver
+
+    @final
+    def parse_html(self, html):
+        """
+        Parse a page with the scraper's parser backend.
+        """
+        if getattr(self, "_parser", None) is None:
+            self._parser = get_parser(self.parser_backend)
+        return self._parser.parse(html)
+
+    @final
+    def extract_cards(self, document):
+        """
+        Extract one dict per search result card using self.selectors. Cards
+        missing a field are logged and skipped.
+        """
+        records = []
+        for card in document.select(self.selectors["card"]):
+            record = {}
+            try:
+                for field, (css, value) in self.selectors["fields"].items():
+                    node = card.select_one(css)
+                    if node is None:
+                        raise ValueError(f"no match for {field} selector {css!r}")
+                    record[field] = node.text().strip() if value == "text" else node.attr(value)
+            except ValueError as e:
+                logger.error(f"Error scraping article: {e}")
+                continue
+            records.append(record)
+        return records
+
+    @final
+    def extract_content(self, document) -> str:
+        """
+        Text of the article body, empty if the content selector has no match.
+        """
+        node = document.select_one(self.selectors["content"])
+        return node.text(strip=True) if node is not None else ""
+
+    @final
+    def throttle(self, url):
+        """
+        Wait until the politeness scheduler allows a request to url's host.
+        """
+        if self.rate_limiter is None:
+            self.rate_limiter = RateLimiter()
+        self.rate_limiter.wait(url)
+
+    @final
+    def browse(self, driver, url):
+        """
+        Load url in a browser, paced and adapted by the rate limiter like the
+        HTTP fetches: the status of the page is reported to it, and throttled
+        loads are retried up to its max_retries once the host's backoff is over.
+        """
+        for _ in range(self.rate_limiter.max_retries if self.rate_limiter else 0):
+            self.throttle(url)
+            driver.get(url)
+            if not self.record_status(driver, url):
+                return
+        self.throttle(url)
+        driver.get(url)
+        if self.record_status(driver, url):
+            logger.info(f"Still throttled after {self.rate_limiter.max_retries} retries: {url}")
+
+    @final
+    def record_status(self, driver, url) -> bool:
+        """
+        Report the status of the page loaded in driver to the rate limiter,
+        returns whether it was throttled.
+        """
+        status = navigation_status(driver)
+        if status in THROTTLE_STATUSES:
+            self.rate_limiter.record_throttle(url)
+            return True
+        self.rate_limiter.record_success(url)
+        return False
 
     def convert_timestamp(self):
         """
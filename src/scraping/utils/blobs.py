@@ -0,0 +1,45 @@
+import gzip
+import hashlib
+from typing import Optional, Tuple
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Pages are stored once in html_blobs, keyed by the sha256 of the raw html
+ENCODING = "zstd" if zstandard is not None else "gzip"
+
+
+def html_hash(html: str) -> str:
+    return hashlib.sha256(html.encode("utf-8")).hexdigest()
+
+
+def compress(data: bytes, encoding: str = ENCODING) -> bytes:
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=10).compress(data)
+    if encoding == "gzip":
+        return gzip.compress(data, compresslevel=6)
+    raise ValueError(f"Unknown blob encoding {encoding!r}")
+
+
+def decompress(data: bytes, encoding: str) -> bytes:
+    if encoding == "zstd":
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to read zstd blobs")
+        return zstandard.ZstdDecompressor().decompress(data)
+    if encoding == "gzip":
+        return gzip.decompress(data)
+    if encoding == "identity":
+        return data
+    raise ValueError(f"Unknown blob encoding {encoding!r}")
+
+
+def make_blob(html: Optional[str]) -> Optional[Tuple[str, str, int, bytes]]:
+    """
+    Return the (hash, encoding, size, data) row storing html, None if empty.
+    """
+    if not html:
+        return None
+    raw = html.encode("utf-8")
+    return html_hash(html), ENCODING, len(raw), compress(raw)
@@ -0,0 +1,110 @@
+import re
+import unicodedata
+from datetime import datetime
+from functools import lru_cache
+from typing import Iterable, List, Optional
+from zoneinfo import ZoneInfo
+
+# Month names and abbreviations used by Swiss outlets (fr, de, it), without
+# accents. Parsing never touches the process locale, so it is thread-safe and
+# works on hosts without fr_FR/de_CH/it_CH locales installed.
+MONTHS = {
+    # French
+    "janvier": 1, "janv": 1, "fevrier": 2, "fevr": 2, "fev": 2, "mars": 3,
+    "avril": 4, "avr": 4, "mai": 5, "juin": 6, "juillet": 7, "juil": 7,
+    "aout": 8, "septembre": 9, "sept": 9, "octobre": 10, "oct": 10,
+    "novembre": 11, "nov": 11, "decembre": 12, "dec": 12,
+    # German
+    "januar": 1, "jan": 1, "janner": 1, "februar": 2, "feb": 2, "marz": 3,
+    "maerz": 3, "mrz": 3, "april": 4, "apr": 4, "juni": 6, "jun": 6,
+    "juli": 7, "jul": 7, "august": 8, "aug": 8, "september": 9, "sep": 9,
+    "oktober": 10, "okt": 10, "dezember": 12, "dez": 12,
+    # Italian
+    "gennaio": 1, "gen": 1, "febbraio": 2, "marzo": 3, "mar": 3, "aprile": 4,
+    "maggio": 5, "mag": 5, "giugno": 6, "giu": 6, "luglio": 7, "lug": 7,
+    "agosto": 8, "ago": 8, "settembre": 9, "set": 9, "ottobre": 10, "ott": 10,
+    "dicembre": 12, "dic": 12,
+}
+
+# Outlets publish in Swiss local time, naive dates are taken to be in it
+TIMEZONE = ZoneInfo("Europe/Zurich")
+
+# "lundi 9 octobre 2023", "Montag, 9. Oktober 2023", "1er mars 2024 à 14h30",
+# "1° marzo 2024" (º folds to o)
+TEXT_DATE = re.compile(
+    r"(?P<day>\d{1,2})(?:er|\.|°|o)?\s+(?P<month>[a-z]+)\.?,?\s+(?P<year>\d{4})"
+)
+# "09.10.2023", "9/10/2023 14:30"
+NUMERIC_DATE = re.compile(r"(?P<day>\d{1,2})[./](?P<month>\d{1,2})[./](?P<year>\d{4})")
+TIME = re.compile(r"(?P<hour>\d{1,2})\s*[:h]\s*(?P<minute>\d{2})")
+
+
+def _fold(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text.lower())
+    return "".join(c for c in text if not unicodedata.combining(c))
+
+
+@lru_cache(maxsize=16384)
+def parse_date(date_string: str) -> Optional[datetime]:
+    """
+    Parse a French, German or Italian date string, or an ISO 8601 one, into
+    an aware datetime in Europe/Zurich. Returns None if the string holds no
+    recognizable date. Results are memoized, search pages repeat the same
+    few dates over and over.
+    """
+    date_string = date_string.strip()
+    try:
+        date_object = datetime.fromisoformat(date_string)
+    except ValueError:
+        pass
+    else:
+        if date_object.tzinfo is None:
+            return date_object.replace(tzinfo=TIMEZONE)
+        return date_object.astimezone(TIMEZONE)
+
+    text = _fold(date_string)
+    match = TEXT_DATE.search(text)
+    if match and match.group("month") in MONTHS:
+        month = MONTHS[match.group("month")]
+    else:
+        match = NUMERIC_DATE.search(text)
+        if not match:
+            return None
+        month = int(match.group("month"))
+
+    hour = minute = 0
+    time_match = TIME.search(text, match.end())
+    if time_match:
+        hour, minute = int(time_match.group("hour")), int(time_match.group("minute"))
+
+    try:
+        return datetime(
+            int(match.group("year")), month, int(match.group("day")), hour, minute, tzinfo=TIMEZONE
+        )
+    except ValueError:
+        return None
+
+
+def normalize_date(date_string: str) -> str:
+    """
+    Convert a date string to isoformat, raising ValueError if it can't be parsed.
+    """
+    date_object = parse_date(date_string)
+    if date_object is None:
+        raise ValueError(f"Unrecognized date: {date_string!r}")
+    return date_object.isoformat()
+
+
+def normalize_dates(date_strings: Iterable[str]) -> List[Optional[str]]:
+    """
+    Batch version of normalize_date for a page of cards: each distinct string
+    is parsed once, unparseable ones map to None.
+    """
+    parsed = {}
+    results = []
+    for date_string in date_strings:
+        if date_string not in parsed:
+            date_object = parse_date(date_string) if date_string else None
+            parsed[date_string] = date_object.isoformat() if date_object else None
+        results.append(parsed[date_string])
+    return results
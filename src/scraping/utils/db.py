@@ -1,6 +1,12 @@
 import os
+import logging
+from itertools import islice
 import psycopg2
+from psycopg2.extras import execute_values
 from dotenv import load_dotenv
+
+from utils.blobs import make_blob
+from utils.dates import TIMEZONE
 load_dotenv()
 
 POSTGRES_USER = os.environ.get("POSTGRES_USER", None)
@@ -8,6 +14,12 @@ POSTGRES_PASSWORD = os.environ.get("POSTGRES_PASSWORD", None)
 POSTGRES_PORT = os.environ.get("POSTGRES_PORT", None)
 POSTGRES_DB = os.environ.get("POSTGRES_DB", None)
 
+# Setup logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+ARTICLE_COLUMNS = ['source', 'link', 'author', 'title', 'html_hash', 'text', 'published_date', 'topic', 'abstract']
+
 class Database():
 
     def __init__(self):
@@ -43,6 +55,96 @@ class Database():
             finally:
                 cursor.close()  # Close the cursor
 
+    def bulk_upsert_articles(self, articles, batch_size=1000):
+        """
+        Upsert articles (dicts with ARTICLE_COLUMNS keys, plus the raw `html`)
+        in batches. The html of a batch is compressed into html_blobs, where
+        identical pages are stored once. Each batch is then loaded into a
+        temporary staging table with a multi-row VALUES insert and merged into
+        `articles` with a single INSERT ... ON CONFLICT (link). Everything runs
+        in one transaction.
+
+        Returns a dict with the number of inserted and updated rows.
+        """
+        columns = ", ".join(ARTICLE_COLUMNS)
+        updates = ",\n".join(
+            f"{column} = EXCLUDED.{column}" for column in ARTICLE_COLUMNS if column != 'link'
+        )
+        merge_query = f"""
+        INSERT INTO articles ({columns})
+        SELECT DISTINCT ON (link) {columns}
+        FROM staging_articles
+        ORDER BY link, seq DESC
+        ON CONFLICT (link)
+        DO UPDATE SET
+            {updates}
+        RETURNING (xmax = 0) AS inserted;
+        """
+
+        counts = {"inserted": 0, "updated": 0}
+        articles = iter(articles)
+        cursor = self.db.cursor()
+        try:
+            # Dates are aware, articles.published_date is the outlets' local
+            # time: the staging TIMESTAMPTZ is stored converted to it
+            cursor.execute("SET LOCAL TIME ZONE %s", (TIMEZONE.key,))
+            cursor.execute("""
+            CREATE TEMPORARY TABLE staging_articles (
+                seq SERIAL,
+                source TEXT,
+                link TEXT,
+                author TEXT,
+                title TEXT,
+                html_hash CHAR(64),
+                text TEXT,
+                published_date TIMESTAMPTZ,
+                topic TEXT,
+                abstract TEXT
+            ) ON COMMIT DROP;
+            """)
+            while True:
+                batch = list(islice(articles, batch_size))
+                if not batch:
+                    break
+                blobs = {}
+                rows = []
+                for article in batch:
+                    blob = make_blob(article.get('html'))
+                    if blob is not None:
+                        blobs[blob[0]] = blob
+                    article = {**article, 'html_hash': blob[0] if blob else None}
+                    rows.append(tuple(article.get(column) for column in ARTICLE_COLUMNS))
+                if blobs:
+                    execute_values(
+                        cursor,
+                        """
+                        INSERT INTO html_blobs (hash, encoding, size, data) VALUES %s
+                        ON CONFLICT (hash) DO NOTHING
+                        """,
+                        [(h, encoding, size, psycopg2.Binary(data)) for h, encoding, size, data in blobs.values()],
+                        page_size=batch_size,
+                    )
+                execute_values(
+                    cursor,
+                    f"INSERT INTO staging_articles ({columns}) VALUES %s",
+                    rows,
+                    page_size=batch_size,
+                )
+                cursor.execute(merge_query)
+                for (inserted,) in cursor.fetchall():
+                    counts["inserted" if inserted else "updated"] += 1
+                cursor.execute("TRUNCATE staging_articles")
+                logger.info("Merged batch of %d articles", len(batch))
+            self.db.commit()
+        except Exception as e:
+            self.db.rollback()
+            raise e
+        finally:
+            cursor.close()
+
+        logger.info("Bulk upsert done: %(inserted)d inserted, %(updated)d updated", counts)
+        return counts
+
     def close(self):
         if self.db:
             self.db.close()
@@ -0,0 +1,110 @@
+import asyncio
+import logging
+from collections import namedtuple
+from typing import Dict, Iterable, List, Optional
+
+import aiohttp
+
+from utils.ratelimit import RateLimiter, THROTTLE_STATUSES, parse_retry_after
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+DEFAULT_HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (X11; Linux x86_64; rv:128.0) Gecko/20100101 Firefox/128.0"
+    ),
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "fr-CH,fr;q=0.9,de;q=0.7,it;q=0.6",
+}
+
+FetchResult = namedtuple("FetchResult", ["url", "status", "headers", "body", "error"])
+
+
+class HttpFetcher():
+    """
+    Browserless page fetcher: an aiohttp session shared by a bounded pool of
+    workers, carrying the cookies of an authenticated browser session.
+    """
+
+    def __init__(
+        self,
+        cookies: Optional[List[Dict]] = None,
+        concurrency: int = 8,
+        timeout: float = 30,
+        headers: Optional[Dict[str, str]] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+    ):
+        self.cookies = cookies or []
+        self.rate_limiter = rate_limiter
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.headers = {**DEFAULT_HEADERS, **(headers or {})}
+
+    def _session_cookies(self) -> Dict[str, str]:
+        # Selenium cookies are dicts with name/value/domain/path/... keys,
+        # the session only needs the name/value pairs.
+        return {cookie["name"]: cookie["value"] for cookie in self.cookies}
+
+    async def _fetch(self, session, semaphore, url, headers=None) -> FetchResult:
+        async with semaphore:
+            attempt = 0
+            while True:
+                if self.rate_limiter is not None:
+                    await self.rate_limiter.wait_async(url)
+                try:
+                    async with session.get(url, headers=headers) as response:
+                        body = await response.read()
+                        result = FetchResult(url, response.status, dict(response.headers), body, None)
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    return FetchResult(url, None, {}, None, e)
+
+                if self.rate_limiter is None:
+                    return result
+                if result.status not in THROTTLE_STATUSES:
+                    self.rate_limiter.record_success(url)
+                    return result
+
+                # Throttled: back off and retry
+                delay = self.rate_limiter.record_throttle(
+                    url, parse_retry_after(result.headers.get("Retry-After"))
+                )
+                if attempt >= self.rate_limiter.max_retries:
+                    return result
+                attempt += 1
+                logger.info(
+                    f"Got {result.status} for {url}, retrying in {delay:.1f}s "
+                    f"({attempt}/{self.rate_limiter.max_retries})"
+                )
+
+    async def _fetch_all(
+        self, urls: Iterable[str], headers: Optional[Dict[str, Dict]] = None
+    ) -> List[FetchResult]:
+        headers = headers or {}
+        semaphore = asyncio.Semaphore(self.concurrency)
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        connector = aiohttp.TCPConnector(limit=self.concurrency)
+        async with aiohttp.ClientSession(
+            headers=self.headers,
+            cookies=self._session_cookies(),
+            timeout=timeout,
+            connector=connector,
+        ) as session:
+            tasks = [
+                self._fetch(session, semaphore, url, headers.get(url)) for url in urls
+            ]
+            return await asyncio.gather(*tasks)
+
+    def fetch_all(
+        self, urls: Iterable[str], headers: Optional[Dict[str, Dict]] = None
+    ) -> List[FetchResult]:
+        """
+        Fetch all urls concurrently (at most `concurrency` in flight) and
+        return one FetchResult per url, in input order. `headers` maps a url
+        to extra request headers (e.g. conditional request validators).
+        """
+        return asyncio.run(self._fetch_all(urls, headers))
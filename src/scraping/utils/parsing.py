@@ -0,0 +1,171 @@
+from typing import List, Optional, Union
+
+from bs4 import BeautifulSoup
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:
+    LexborHTMLParser = None
+
+try:
+    import lxml.html
+    import lxml.etree
+    import cssselect  # noqa: F401, needed by lxml's cssselect()
+except ImportError:
+    lxml = None
+
+Html = Union[str, bytes]
+
+# Elements whose content is never article text
+IGNORED_TAGS = ("script", "style", "noscript")
+
+
+class Node():
+    """
+    Backend-independent view on a parsed element, exposing the handful of
+    operations scrapers need: CSS selection, text and attributes.
+    """
+
+    def select(self, css: str) -> List["Node"]:
+        raise NotImplementedError
+
+    def select_one(self, css: str) -> Optional["Node"]:
+        nodes = self.select(css)
+        return nodes[0] if nodes else None
+
+    def text(self, strip: bool = False) -> str:
+        """
+        Text content of the node. With strip=True every text fragment is
+        stripped and the fragments are joined without separator, like
+        BeautifulSoup's get_text(strip=True).
+        """
+        raise NotImplementedError
+
+    def attr(self, name: str) -> Optional[str]:
+        raise NotImplementedError
+
+
+class SoupNode(Node):
+    def __init__(self, element):
+        self.element = element
+
+    def select(self, css):
+        return [SoupNode(element) for element in self.element.select(css)]
+
+    def select_one(self, css):
+        element = self.element.select_one(css)
+        return SoupNode(element) if element is not None else None
+
+    def text(self, strip=False):
+        return self.element.get_text(strip=True) if strip else self.element.get_text()
+
+    def attr(self, name):
+        return self.element.get(name)
+
+
+class LxmlNode(Node):
+    def __init__(self, element):
+        self.element = element
+
+    def select(self, css):
+        return [LxmlNode(element) for element in self.element.cssselect(css)]
+
+    def text(self, strip=False):
+        if strip:
+            return "".join(fragment.strip() for fragment in self.element.itertext())
+        return self.element.text_content()
+
+    def attr(self, name):
+        return self.element.get(name)
+
+
+class LexborNode(Node):
+    def __init__(self, element):
+        self.element = element
+
+    def select(self, css):
+        return [LexborNode(element) for element in self.element.css(css)]
+
+    def select_one(self, css):
+        element = self.element.css_first(css)
+        return LexborNode(element) if element is not None else None
+
+    def text(self, strip=False):
+        return self.element.text(deep=True, separator="", strip=strip)
+
+    def attr(self, name):
+        return self.element.attributes.get(name)
+
+
+class HtmlParser():
+    name = None
+
+    def parse(self, html: Html) -> Node:
+        raise NotImplementedError
+
+
+class SoupParser(HtmlParser):
+    name = "html.parser"
+
+    def parse(self, html):
+        return SoupNode(BeautifulSoup(html, features="html.parser"))
+
+
+class LxmlParser(HtmlParser):
+    name = "lxml"
+
+    def parse(self, html):
+        # libxml2 assumes latin-1 for bytes without a meta charset
+        if isinstance(html, bytes):
+            try:
+                html = html.decode("utf-8")
+            except UnicodeDecodeError:
+                pass
+        document = lxml.html.document_fromstring(html)
+        lxml.etree.strip_elements(document, *IGNORED_TAGS, with_tail=False)
+        return LxmlNode(document)
+
+
+class LexborParser(HtmlParser):
+    name = "selectolax"
+
+    def parse(self, html):
+        tree = LexborHTMLParser(html)
+        tree.strip_tags(list(IGNORED_TAGS))
+        return LexborNode(tree.root)
+
+
+PARSERS = {
+    parser.name: parser
+    for parser, available in (
+        (LexborParser, LexborHTMLParser is not None),
+        (LxmlParser, lxml is not None),
+        (SoupParser, True),
+    )
+    if available
+}
+
+
+def get_parser(name: Optional[str] = None) -> HtmlParser:
+    """
+    Return the parser backend called `name`, or the fastest one installed
+    (selectolax, then lxml, then BeautifulSoup's html.parser).
+    """
+    if name is None:
+        name = next(iter(PARSERS))
+    if name not in PARSERS:
+        raise ValueError(f"Parser backend {name!r} is not available, installed: {list(PARSERS)}")
+    return PARSERS[name]()
+
+
+def decode_html(body: bytes, content_type: Optional[str] = None) -> str:
+    """
+    Decode a response body using the charset of its Content-Type header.
+    """
+    charset = "utf-8"
+    if content_type and "charset=" in content_type:
+        charset = content_type.split("charset=")[-1].split(";")[0].strip().strip('"') or charset
+    try:
+        return body.decode(charset, errors="replace")
+    except LookupError:
+        return body.decode("utf-8", errors="replace")
@@ -0,0 +1,164 @@
+import time
+import random
+import asyncio
+import threading
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+THROTTLE_STATUSES = (429, 503)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Parse a Retry-After header (delay in seconds or HTTP date) into seconds.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket():
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated_at = time.monotonic()
+
+    def reserve(self, now: float) -> float:
+        """
+        Take one token and return how long to wait before using it. The
+        balance may go negative, so concurrent callers queue up behind each
+        other instead of all waking at the same time.
+        """
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+
+class HostState():
+    def __init__(self, rate: float, burst: float):
+        self.bucket = TokenBucket(rate, burst)
+        self.blocked_until = 0.0
+        self.failures = 0
+        self.requests = 0
+        self.throttled = 0
+        self.wait_time = 0.0
+        self.first_request_at = None
+
+
+class RateLimiter():
+    """
+    Per-host politeness scheduler shared by scrapers, threads and coroutines.
+
+    Each host gets a token bucket. Its rate grows additively on successful
+    responses, up to max_rate, and is halved on 429/503, down to min_rate.
+    A Retry-After header, or failing that exponential backoff with jitter,
+    blocks the host until the server is willing to answer again.
+    """
+
+    def __init__(
+        self,
+        rate: float = 1.0,
+        burst: float = 2.0,
+        min_rate: float = 0.1,
+        max_rate: float = 8.0,
+        rate_step: float = 0.05,
+        base_delay: float = 1.0,
+        max_delay: float = 120.0,
+        max_retries: int = 5,
+    ):
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.rate_step = rate_step
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_retries = max_retries
+        self._hosts: Dict[str, HostState] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def host(url: str) -> str:
+        return urlsplit(url).netloc or url
+
+    def _state(self, host: str) -> HostState:
+        state = self._hosts.get(host)
+        if state is None:
+            state = self._hosts[host] = HostState(self.rate, self.burst)
+        return state
+
+    def _reserve(self, url: str) -> float:
+        with self._lock:
+            state = self._state(self.host(url))
+            now = time.monotonic()
+            delay = max(state.bucket.reserve(now), state.blocked_until - now)
+            state.requests += 1
+            state.wait_time += delay
+            if state.first_request_at is None:
+                state.first_request_at = now
+            return delay
+
+    def wait(self, url: str):
+        """
+        Block until a request to url's host is allowed.
+        """
+        delay = self._reserve(url)
+        if delay > 0:
+            time.sleep(delay)
+
+    async def wait_async(self, url: str):
+        delay = self._reserve(url)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def backoff_delay(self, attempt: int) -> float:
+        delay = min(self.max_delay, self.base_delay * 2 ** attempt)
+        return delay * random.uniform(0.5, 1.0)
+
+    def record_success(self, url: str):
+        with self._lock:
+            state = self._state(self.host(url))
+            state.failures = 0
+            bucket = state.bucket
+            bucket.rate = min(self.max_rate, bucket.rate + self.rate_step)
+
+    def record_throttle(self, url: str, retry_after: Optional[float] = None) -> float:
+        """
+        Register a 429/503 answer for url. Slows the host down, blocks it for
+        Retry-After (or an exponential backoff) and returns that delay.
+        """
+        with self._lock:
+            state = self._state(self.host(url))
+            state.throttled += 1
+            delay = retry_after if retry_after is not None else self.backoff_delay(state.failures)
+            delay = min(delay, self.max_delay)
+            state.failures += 1
+            bucket = state.bucket
+            bucket.rate = max(self.min_rate, bucket.rate / 2)
+            state.blocked_until = max(state.blocked_until, time.monotonic() + delay)
+            return delay
+
+    def metrics(self) -> Dict[str, Dict]:
+        now = time.monotonic()
+        with self._lock:
+            metrics = {}
+            for host, state in self._hosts.items():
+                elapsed = now - state.first_request_at if state.first_request_at else 0
+                metrics[host] = {
+                    "requests": state.requests,
+                    "throttled": state.throttled,
+                    "requests_per_second": state.requests / elapsed if elapsed else 0.0,
+                    "wait_time": state.wait_time,
+                    "rate": state.bucket.rate,
+                }
+            return metrics
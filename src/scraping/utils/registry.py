@@ -0,0 +1,34 @@
+from typing import Dict, Type
+
+from utils.base import BaseScraper
+
+# Scraper implementations by source name
+SCRAPERS: Dict[str, Type[BaseScraper]] = {}
+
+
+def register_scraper(name: str, max_concurrency: int = 1):
+    """
+    Class decorator registering a BaseScraper implementation under `name`.
+    `max_concurrency` caps how many topics of that source may be scraped
+    at the same time by the orchestrator.
+    """
+    if max_concurrency < 1:
+        raise ValueError(f"max_concurrency of {name!r} must be at least 1, got {max_concurrency}")
+
+    def decorator(cls):
+        if not issubclass(cls, BaseScraper):
+            raise TypeError(f"{cls.__name__} is not a BaseScraper")
+        if name in SCRAPERS and SCRAPERS[name] is not cls:
+            raise ValueError(f"Scraper {name!r} is already registered")
+        cls.source_name = name
+        cls.max_concurrency = max_concurrency
+        SCRAPERS[name] = cls
+        return cls
+    return decorator
+
+
+def get_scraper(name: str) -> Type[BaseScraper]:
+    try:
+        return SCRAPERS[name]
+    except KeyError:
+        raise KeyError(f"Unknown source {name!r}, available: {sorted(SCRAPERS)}") from None
@@ -1,23 +1,24 @@
 import os
 import logging
 import json
-import csv
-import time
-import locale
-from datetime import datetime
-from bs4 import BeautifulSoup
+import weakref
 import tqdm
-from typing import List, Dict
+from itertools import islice
+from typing import List, Dict, Optional
 
-from selenium import webdriver
-from selenium.webdriver.firefox.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 
 from utils.base import BaseScraper
-from utils.article import Article
 from utils.db import Database
+from utils.fetching import HttpFetcher
+from utils.state import CrawlState, content_hash
+from utils.webdriver_pool import WebDriverPool
+from utils.ratelimit import RateLimiter
+from utils.registry import register_scraper
+from utils.parsing import decode_html
+from utils.dates import normalize_date, normalize_dates
 
 # Setup logging
 logging.basicConfig(
@@ -26,183 +27,369 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+FETCH_MODES = ("selenium", "http")
 
+
+@register_scraper("lecourrier", max_concurrency=2)
 class LeCourrierScraper(BaseScraper):
+    selectors = {
+        "card": "article.c-Card.c-Card--search",
+        "fields": {
+            "title": ("span", "text"),
+            "abstract": ("div.c-Card-content", "text"),
+            "topic": ("span.c-Card-tag", "text"),
+            "link": ("a", "href"),
+            "author": ("span.c-Card-author", "text"),
+            "published_date": ("span.c-Card-date", "text"),
+        },
+        "content": "article",
+    }
+
     def __init__(
         self,
         topic: str,
         save_path: str,
         save: List[str],
-        headless: bool = False
+        headless: bool = False,
+        fetch_mode: str = "selenium",
+        concurrency: int = 8,
+        cookies_path: str = os.path.join(
+            "../../../data/cookies", "lecourrier_cookies.json"
+        ),
+        incremental: bool = True,
+        known_pages_to_stop: int = 3,
+        chunk_size: int = 200,
+        state_path: Optional[str] = None,
+        compress: bool = False,
+        driver_pool: Optional[WebDriverPool] = None,
+        pool_size: Optional[int] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        parser_backend: Optional[str] = None,
     ):
+        if fetch_mode not in FETCH_MODES:
+            raise ValueError(
+                f"Unknown fetch_mode {fetch_mode!r}, expected one of {FETCH_MODES}"
+            )
         self.topic = topic
         self.base_url = "https://lecourrier.ch"
         self.url = f"{self.base_url}/?s={self.topic}"
-        options = Options()
-        if headless:
-            options.add_argument("--headless")
-        self.driver = webdriver.Firefox(options=options)
+        # Browsers are borrowed from a pool, shared or owned by this scraper
+        self._owns_pool = driver_pool is None
+        self.driver_pool = driver_pool or WebDriverPool(
+            size=pool_size, headless=headless
+        )
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.parser_backend = parser_backend
         self.save_path = save_path
         self.save = save
+        self.fetch_mode = fetch_mode
+        self.concurrency = concurrency
+        self.cookies_path = cookies_path
+        self.incremental = incremental
+        # Search results are not strictly ordered by date (pinned or updated
+        # articles), a single known page doesn't mean the rest is known too
+        self.known_pages_to_stop = known_pages_to_stop
+        self.chunk_size = chunk_size
+        self.compress = compress
+        self.state = CrawlState(
+            state_path or os.path.join(save_path, "crawl_state.sqlite")
+        )
+        self._authenticated = weakref.WeakSet()
+        self.stats = {"scraped": 0, "indexed": 0, "unchanged": 0}
+        self._validators = {}
 
-    def scrap_articles(self, soup) -> List[Dict]:
-        article_tags = soup.find_all("article", class_="c-Card c-Card--search")
+    def scrap_articles(self, document) -> List[Dict]:
+        cards = self.extract_cards(document)
+        dates = normalize_dates(card["published_date"] for card in cards)
         articles = []
-        for article in article_tags:
-            try:
-                articles.append({
-                    "source": self.base_url,
-                    "title": article.span.text.strip(),
-                    "abstract": article.find(
-                        "div", class_="c-Card-content"
-                    ).text.strip(),
-                    "topic": article.find(
-                        "span", class_="c-Card-tag"
-                    ).text.strip(),
-                    "link": article.a["href"],
-                    "author": article.find(
-                        "span", class_="c-Card-author"
-                    ).text.strip(),
-                    "published_date": self.convert_timestamp(
-                        article.find("span", class_="c-Card-date").text.strip()
-                    ),
-                })
-            except Exception as e:
-                logger.error(f"Error scraping article: {e}")
+        for card, published_date in zip(cards, dates):
+            if published_date is None:
+                logger.error(f"Error scraping article: unrecognized date {card['published_date']!r}")
+                continue
+            card["published_date"] = published_date
+            articles.append({"source": self.base_url, **card})
         return articles
 
-    def paginate(self):
+    def paginate(self, driver):
         try:
-            time.sleep(2)
-            next_button = WebDriverWait(self.driver, 10).until(
+            self.throttle(self.base_url)
+            next_button = WebDriverWait(driver, 10).until(
                 EC.element_to_be_clickable(
                     (By.CSS_SELECTOR, "a.next.page-numbers")
                 )
             )
             next_button.click()
-            WebDriverWait(self.driver, 10).until(EC.staleness_of(next_button))
+            WebDriverWait(driver, 10).until(EC.staleness_of(next_button))
+            self.record_status(driver, self.base_url)
         except Exception as e:
             logger.info(f"No more pages or error occurred during pagination: {e}")
-            self.driver.quit()
             raise StopIteration
 
     def convert_timestamp(self, date_string: str) -> str:
-        # Set the locale to French
-        locale.setlocale(locale.LC_TIME, "fr_FR.UTF-8")
-        # Convert the string to a datetime object
-        date_object = datetime.strptime(date_string, "%A %d %B %Y")
-        return date_object.isoformat()
+        return normalize_date(date_string)
+
+    def wait_for_results(self, driver):
+        # Wait for the result cards to render instead of sleeping blindly
+        try:
+            WebDriverWait(driver, 10).until(
+                EC.presence_of_element_located(
+                    (By.CSS_SELECTOR, "article.c-Card--search")
+                )
+            )
+        except Exception as e:
+            logger.info(f"No search results rendered: {e}")
 
     def run_article_scraping(self):
-        scraped_articles = []
-        self.driver.get(self.url)
+        self.truncate_jsonl("articles")
 
-        while True:
-            try:
-                time.sleep(3)
-                soup = BeautifulSoup(
-                    self.driver.page_source, features="html.parser"
-                )
-                articles = self.scrap_articles(soup)
-                scraped_articles.extend(articles)
-                logger.info(f"Scraped {len(articles)} articles from current page.")
+        # Search pagination is stateful, it runs on a single browser
+        with self.borrow_driver() as driver:
+            self.browse(driver, self.url)
 
-                self.paginate()
-            except StopIteration:
-                break
-            except Exception as e:
-                logger.error(f"Error during scraping: {e}")
-                break
+            known_pages = 0
+            while True:
+                try:
+                    self.wait_for_results(driver)
+                    articles = self.scrap_articles(
+                        self.parse_html(driver.page_source)
+                    )
+                    links = [article["link"] for article in articles]
+                    if (
+                        self.incremental
+                        and links
+                        and len(self.state.fetched_links(links)) == len(set(links))
+                    ):
+                        known_pages += 1
+                        if known_pages >= self.known_pages_to_stop:
+                            logger.info(
+                                f"Last {known_pages} pages only contain known articles, stopping."
+                            )
+                            break
+                        self.paginate(driver)
+                        continue
+                    known_pages = 0
+                    self.state.mark_seen(links)
+                    self.append_jsonl(articles, filename="articles")
+                    self.stats["scraped"] += len(articles)
+                    logger.info(f"Scraped {len(articles)} articles from current page.")
 
-        # Save after scraping all pages
+                    self.paginate(driver)
+                except StopIteration:
+                    break
+                except Exception as e:
+                    logger.error(f"Error during scraping: {e}")
+                    break
+
+        # Export after scraping all pages
         if "json" in self.save:
-            self.save_json(scraped_articles, filename="articles")
+            self.save_json(self.read_jsonl("articles"), filename="articles")
 
         if "csv" in self.save:
-            self.save_csv(scraped_articles, filename="articles")
+            self.save_csv(self.read_jsonl("articles"), filename="articles")
 
-    def authenticate(self):
-        self.driver.get(self.base_url)
-        cookies_path = os.path.join(
-            "../../../data/cookies", "lecourrier_cookies.json"
+    def load_cookies(self) -> List[Dict]:
+        with open(self.cookies_path, "r") as file:
+            return json.load(file)
+
+    def authenticate(self, driver):
+        self.browse(driver, self.base_url)
+        for cookie in self.load_cookies():
+            driver.add_cookie(cookie)
+        self._authenticated.add(driver)
+
+    def scrap_article_content(self, document):
+        return self.extract_content(document)
+
+    def conditional_headers(self, article_list) -> Dict[str, Dict]:
+        headers = {}
+        for article in article_list:
+            page = self.state.get(article["link"])
+            if not page or page["fetched_at"] is None:
+                continue
+            validators = {}
+            if page["etag"]:
+                validators["If-None-Match"] = page["etag"]
+            if page["last_modified"]:
+                validators["If-Modified-Since"] = page["last_modified"]
+            if validators:
+                headers[article["link"]] = validators
+        return headers
+
+    def fetch_content_http(self, article_list):
+        """
+        Fetch article pages without a browser. Returns the articles whose
+        content could be extracted, the ones that need the Selenium fallback
+        (HTTP errors or content rendered client-side) and the links that were
+        answered with 304 Not Modified.
+        """
+        fetcher = HttpFetcher(
+            cookies=self.load_cookies(),
+            concurrency=self.concurrency,
+            rate_limiter=self.rate_limiter,
+        )
+        headers = self.conditional_headers(article_list) if self.incremental else {}
+        results = fetcher.fetch_all(
+            (article["link"] for article in article_list), headers=headers
+        )
+
+        fetched_articles = []
+        fallback_articles = []
+        not_modified = []
+        for article, result in zip(article_list, results):
+            if result.status == 304:
+                not_modified.append(article["link"])
+                continue
+            if result.error is not None or result.status != 200:
+                logger.info(
+                    f"HTTP fetch failed ({result.status or result.error}) "
+                    f"for {article['link']}, falling back to Selenium"
+                )
+                fallback_articles.append(article)
+                continue
+
+            article_text = self.scrap_article_content(self.parse_html(result.body))
+            if not article_text:
+                fallback_articles.append(article)
+                continue
+
+            article["text"] = article_text
+            # Store the page as received, not re-serialized
+            article["html"] = decode_html(result.body, result.headers.get("Content-Type"))
+            self._validators[article["link"]] = (
+                result.headers.get("ETag"), result.headers.get("Last-Modified")
+            )
+            fetched_articles.append(article)
+
+        logger.info(
+            f"Fetched {len(fetched_articles)} articles over HTTP, "
+            f"{len(not_modified)} not modified, "
+            f"{len(fallback_articles)} left for Selenium."
         )
-        with open(cookies_path, "r") as file:
-            cookies = json.load(file)
-        for cookie in cookies:
-            self.driver.add_cookie(cookie)
+        return fetched_articles, fallback_articles, not_modified
+
+    def fetch_page_selenium(self, driver, article):
+        if driver not in self._authenticated:
+            self.authenticate(driver)
+        self.browse(driver, article["link"])
+        page_source = driver.page_source
+        article["text"] = self.scrap_article_content(self.parse_html(page_source))
+        article["html"] = page_source
+        return article
 
-    def scrap_article_content(self, soup):
-        article = soup.find("article")
-        return article.get_text(strip=True) if article else ""
+    def fetch_content_selenium(self, article_list):
+        fetched_articles = []
+        results = self.driver_pool.map(self.fetch_page_selenium, article_list)
+        for article, result, error in tqdm.tqdm(results, total=len(article_list)):
+            if error is not None:
+                logger.info(
+                    f"Error {error} scraping article: {article['link']}"
+                )
+                continue
+            fetched_articles.append(result)
+        return fetched_articles
 
     def run_content_scraping(self):
-        self.authenticate()
+        # Stream articles metadata
+        article_list = self.read_jsonl("articles")
 
-        # Load articles metadata
-        file_path = os.path.join(self.save_path, f"articles_{self.topic}.json")
-        with open(file_path, "r", encoding="utf-8") as file:
-            article_list = json.load(file)
+        # Resume an interrupted run: skip what it already fetched and indexed
+        checkpoint = self.state.get_checkpoint(self.topic)
+        resuming = checkpoint is not None and checkpoint["stage"] == "content"
+        if not resuming:
+            self.truncate_jsonl("aug_content")
 
-        augmented_articles = []
+        while True:
+            chunk = list(islice(article_list, self.chunk_size))
+            if not chunk:
+                break
 
-        for article in tqdm.tqdm(article_list):
-            time.sleep(2)
-            try:
-                self.driver.get(article["link"])
-                soup = BeautifulSoup(
-                    self.driver.page_source, features="html.parser"
+            if resuming:
+                done = self.state.fetched_since(
+                    (article["link"] for article in chunk),
+                    checkpoint["started_at"],
                 )
-                article_text = self.scrap_article_content(soup)
-                article["text"] = article_text
-                article["html"] = str(soup)
-                augmented_articles.append(article)
-            except Exception as e:
-                logger.info(
-                    f"Error {e} scraping article: {article['link']}"
+                chunk = [a for a in chunk if a["link"] not in done]
+                if done:
+                    logger.info(f"Resuming content scraping, skipping {len(done)} articles already done.")
+
+            if self.fetch_mode == "http":
+                fetched, chunk, unchanged = self.fetch_content_http(chunk)
+            else:
+                fetched, unchanged = [], []
+            if chunk:
+                fetched.extend(self.fetch_content_selenium(chunk))
+
+            changed = []
+            hashes = {}
+            for article in fetched:
+                text_hash = content_hash(article["text"])
+                page = self.state.get(article["link"])
+                if self.incremental and page and page["content_hash"] == text_hash:
+                    unchanged.append(article["link"])
+                else:
+                    hashes[article["link"]] = text_hash
+                    changed.append(article)
+
+            # Upsert to database, then checkpoint the chunk
+            if changed:
+                self.index(changed)
+                self.append_jsonl(changed, filename="aug_content")
+            for article in changed:
+                etag, last_modified = self._validators.pop(article["link"], (None, None))
+                self.state.record_fetch(
+                    article["link"],
+                    content_hash=hashes[article["link"]],
+                    etag=etag,
+                    last_modified=last_modified,
                 )
+            for link in unchanged:
+                etag, last_modified = self._validators.pop(link, (None, None))
+                self.state.record_fetch(link, etag=etag, last_modified=last_modified)
+
+            self.stats["indexed"] += len(changed)
+            self.stats["unchanged"] += len(unchanged)
+            logger.info(
+                f"Indexed {len(changed)} new or changed articles, "
+                f"skipped {len(unchanged)} unchanged."
+            )
 
-        # Save augmented articles
+        for host, metrics in self.rate_limiter.metrics().items():
+            logger.info(f"Rate limiter metrics for {host}: {metrics}")
+
+        # Export augmented articles
         if "json" in self.save:
-            self.save_json(augmented_articles, filename="aug_content")
+            self.save_json(self.read_jsonl("aug_content"), filename="aug_content")
 
         if "csv" in self.save:
-            self.save_csv(augmented_articles, filename="aug_content")
-
-        # Upsert to database
-        self.index(augmented_articles)
-        self.driver.quit()
+            self.save_csv(self.read_jsonl("aug_content"), filename="aug_content")
 
-    def index(self, articles):
+    def index(self, articles=None):
+        # Default to streaming the augmented articles of the last run
+        if articles is None:
+            articles = self.read_jsonl("aug_content")
         db = Database()
-        for article in articles:
-            Article(
-                source=article["source"],
-                link=article["link"],
-                author=article["author"],
-                title=article["title"],
-                html=article["html"],
-                text=article["text"],
-                published_date=article["published_date"],
-                topic=article["topic"],
-                abstract=article["abstract"],
-            ).upsert(db.db)
-        db.close()
+        try:
+            db.bulk_upsert_articles(articles)
+        finally:
+            db.close()
 
     def run(self):
-        self.run_article_scraping()
-        self.run_content_scraping()
-        self.driver.quit()
-
-    """
-    def save_json(self, articles, filename):
-        file_path = os.path.join(self.save_path, f"{filename}_{self.topic}.json")
-        with open(file_path, "w", encoding="utf-8") as fp:
-            json.dump(articles, fp, ensure_ascii=False, indent=4)
-
-    def save_csv(self, articles, filename):
-        file_path = os.path.join(self.save_path, f"{filename}_{self.topic}.csv")
-        with open(file_path, "w", newline="", encoding="utf-8") as fp:
-            writer = csv.DictWriter(fp, fieldnames=articles[0].keys())
-            writer.writeheader()
-            writer.writerows(articles)
-    """
+        try:
+            checkpoint = self.state.get_checkpoint(self.topic)
+            if checkpoint and checkpoint["stage"] == "content":
+                logger.info(f"Resuming interrupted run for topic {self.topic}.")
+            else:
+                self.state.set_checkpoint(self.topic, "articles")
+                self.run_article_scraping()
+                self.state.set_checkpoint(self.topic, "content")
+            self.run_content_scraping()
+            self.state.clear_checkpoint(self.topic)
+        finally:
+            # Release the browsers and the crawl state whether the run succeeded or not
+            self.close()
+        return {**self.stats, "rate_limiter": self.rate_limiter.metrics()}
+
+    def close(self):
+        self.state.close()
+        if self._owns_pool:
+            self.driver_pool.close()
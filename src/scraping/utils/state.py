@@ -0,0 +1,134 @@
+import sqlite3
+import hashlib
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Optional, Set
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class CrawlState():
+    """
+    Persistent crawl state shared by scraper runs, stored in a local SQLite file.
+
+    `pages` is keyed by link and holds when the link was last seen in search
+    results, the HTTP validators (ETag / Last-Modified) and the hash of the
+    extracted text of the last successful fetch. `checkpoints` holds the stage
+    reached by an unfinished run for each topic, so a crashed run can resume.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        # Topics of the same source may run in parallel processes
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript("""
+        CREATE TABLE IF NOT EXISTS pages (
+            link TEXT PRIMARY KEY,
+            first_seen TEXT NOT NULL,
+            last_seen TEXT NOT NULL,
+            etag TEXT,
+            last_modified TEXT,
+            content_hash TEXT,
+            fetched_at TEXT
+        );
+        CREATE TABLE IF NOT EXISTS checkpoints (
+            topic TEXT PRIMARY KEY,
+            stage TEXT NOT NULL,
+            started_at TEXT NOT NULL
+        );
+        """)
+
+    @staticmethod
+    def _now() -> str:
+        return datetime.now(timezone.utc).isoformat()
+
+    def get(self, link: str) -> Optional[Dict]:
+        row = self.conn.execute("SELECT * FROM pages WHERE link = ?", (link,)).fetchone()
+        return dict(row) if row else None
+
+    def _select_links(self, query: str, links: Iterable[str], *params) -> Set[str]:
+        links = list(links)
+        found = set()
+        # Stay below SQLite's bound parameter limit
+        for start in range(0, len(links), 500):
+            chunk = links[start:start + 500]
+            placeholders = ", ".join("?" * len(chunk))
+            rows = self.conn.execute(query.format(placeholders=placeholders), (*chunk, *params))
+            found.update(row["link"] for row in rows)
+        return found
+
+    def fetched_links(self, links: Iterable[str]) -> Set[str]:
+        """
+        Links whose content has already been fetched and indexed once.
+        """
+        return self._select_links(
+            "SELECT link FROM pages WHERE link IN ({placeholders}) AND fetched_at IS NOT NULL",
+            links,
+        )
+
+    def fetched_since(self, links: Iterable[str], since: str) -> Set[str]:
+        return self._select_links(
+            "SELECT link FROM pages WHERE link IN ({placeholders}) AND fetched_at >= ?",
+            links,
+            since,
+        )
+
+    def mark_seen(self, links: Iterable[str]):
+        now = self._now()
+        with self.conn:
+            self.conn.executemany(
+                """
+                INSERT INTO pages (link, first_seen, last_seen) VALUES (?, ?, ?)
+                ON CONFLICT (link) DO UPDATE SET last_seen = excluded.last_seen
+                """,
+                [(link, now, now) for link in links],
+            )
+
+    def record_fetch(
+        self,
+        link: str,
+        content_hash: Optional[str] = None,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+    ):
+        """
+        Record a successful fetch. Arguments left to None keep their stored
+        value (e.g. a 304 response only refreshes fetched_at).
+        """
+        now = self._now()
+        with self.conn:
+            self.conn.execute(
+                """
+                INSERT INTO pages (link, first_seen, last_seen, etag, last_modified, content_hash, fetched_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (link) DO UPDATE SET
+                    etag = COALESCE(excluded.etag, etag),
+                    last_modified = COALESCE(excluded.last_modified, last_modified),
+                    content_hash = COALESCE(excluded.content_hash, content_hash),
+                    fetched_at = excluded.fetched_at
+                """,
+                (link, now, now, etag, last_modified, content_hash, now),
+            )
+
+    def get_checkpoint(self, topic: str) -> Optional[Dict]:
+        row = self.conn.execute("SELECT * FROM checkpoints WHERE topic = ?", (topic,)).fetchone()
+        return dict(row) if row else None
+
+    def set_checkpoint(self, topic: str, stage: str):
+        with self.conn:
+            self.conn.execute(
+                """
+                INSERT INTO checkpoints (topic, stage, started_at) VALUES (?, ?, ?)
+                ON CONFLICT (topic) DO UPDATE SET stage = excluded.stage, started_at = excluded.started_at
+                """,
+                (topic, stage, self._now()),
+            )
+
+    def clear_checkpoint(self, topic: str):
+        with self.conn:
+            self.conn.execute("DELETE FROM checkpoints WHERE topic = ?", (topic,))
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,177 @@
+import os
+import time
+import queue
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator, Optional, Tuple
+
+from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.firefox.options import Options
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+def firefox_driver(headless: bool = True):
+    options = Options()
+    if headless:
+        options.add_argument("--headless")
+    return webdriver.Firefox(options=options)
+
+
+class WebDriverPool():
+    """
+    A bounded pool of WebDriver instances shared by scrapers.
+
+    Drivers are started lazily, up to `size`. A borrowed driver is health
+    checked before it is handed out and is recycled (quit and replaced) when
+    it crashed, failed its health check, or served `max_uses` pages, which
+    keeps long runs from accumulating leaking browser processes.
+    """
+
+    def __init__(
+        self,
+        size: Optional[int] = None,
+        headless: bool = True,
+        max_uses: int = 100,
+        factory: Optional[Callable] = None,
+    ):
+        self.size = size or os.cpu_count() or 1
+        self.max_uses = max_uses
+        self.factory = factory or (lambda: firefox_driver(headless))
+        self._idle = deque()
+        # Guards _idle, _created, _uses and _closed, notified when a driver
+        # is released or recycled
+        self._lock = threading.Lock()
+        self._available = threading.Condition(self._lock)
+        self._created = 0
+        self._uses = {}
+        self._closed = False
+
+    def _create(self):
+        try:
+            driver = self.factory()
+        except Exception:
+            self._discard()
+            raise
+        with self._lock:
+            self._uses[id(driver)] = 0
+        return driver
+
+    def _discard(self, driver=None):
+        # Frees the driver's slot and wakes a thread waiting for one
+        with self._available:
+            if driver is not None:
+                self._uses.pop(id(driver), None)
+            self._created -= 1
+            self._available.notify()
+
+    def _recycle(self, driver):
+        try:
+            driver.quit()
+        except Exception as e:
+            logger.info(f"Error quitting driver: {e}")
+        self._discard(driver)
+
+    @staticmethod
+    def is_healthy(driver) -> bool:
+        try:
+            return driver.execute_script("return 1;") == 1
+        except WebDriverException:
+            return False
+
+    def acquire(self, timeout: Optional[float] = None):
+        """
+        Borrow an idle driver, or start one while fewer than `size` exist.
+        Otherwise wait up to timeout seconds (forever when None) for one to
+        be released or recycled, and raise queue.Empty past it.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._available:
+                while True:
+                    if self._closed:
+                        raise RuntimeError("WebDriverPool is closed")
+                    if self._idle:
+                        driver = self._idle.popleft()
+                        break
+                    if self._created < self.size:
+                        self._created += 1
+                        driver = None
+                        break
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        raise queue.Empty
+                    self._available.wait(remaining)
+
+            if driver is None:
+                return self._create()
+            if self.is_healthy(driver):
+                return driver
+            logger.info("Recycling unhealthy driver.")
+            self._recycle(driver)
+
+    def release(self, driver, broken: bool = False):
+        with self._available:
+            uses = self._uses.get(id(driver), 0) + 1
+            self._uses[id(driver)] = uses
+            recycle = broken or self._closed or uses >= self.max_uses
+            if not recycle:
+                self._idle.append(driver)
+                self._available.notify()
+        if recycle:
+            self._recycle(driver)
+
+    @contextmanager
+    def driver(self, timeout: Optional[float] = None):
+        """
+        Borrow a driver for the duration of the with block. A WebDriverException
+        escaping the block marks the driver as broken.
+        """
+        driver = self.acquire(timeout=timeout)
+        broken = False
+        try:
+            yield driver
+        except WebDriverException:
+            broken = True
+            raise
+        finally:
+            self.release(driver, broken=broken)
+
+    def map(self, fn: Callable, items: Iterable) -> Iterator[Tuple[object, object, Optional[Exception]]]:
+        """
+        Run fn(driver, item) for every item on up to `size` drivers in
+        parallel. Yields (item, result, error) tuples in input order.
+        """
+        def work(item):
+            try:
+                with self.driver() as driver:
+                    return item, fn(driver, item), None
+            except Exception as e:
+                return item, None, e
+
+        with ThreadPoolExecutor(max_workers=self.size) as executor:
+            yield from executor.map(work, items)
+
+    def close(self):
+        with self._available:
+            self._closed = True
+            idle, self._idle = list(self._idle), deque()
+            # Waiting threads raise instead of waiting for a driver forever
+            self._available.notify_all()
+        for driver in idle:
+            self._recycle(driver)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()